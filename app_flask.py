@@ -1,4 +1,5 @@
 # app_flask.py
+import os
 from flask import Flask
 from flask_cors import CORS
 from config import config
@@ -21,6 +22,19 @@ with app.app_context():
 
 init_routes(app)
 
+# Opt-in background warm-up. Under the debug reloader only the child process
+# (WERKZEUG_RUN_MAIN=true) serves requests, so the parent must not load the model.
+if config.MODEL_WARMUP_ON_START and not config.INFERENCE_SERVER_ADDRESS:
+    if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from utils.inference_client import get_inference_backend
+        get_inference_backend().start_warm_up()
+
+# Output garbage collection, in the serving process only (same reloader rule)
+if config.OUTPUT_GC_ENABLED:
+    if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from utils.output_gc import get_output_gc
+        get_output_gc(app).start()
+
 if __name__ == '__main__':
     print(f"\n{'='*60}")
     print(f"{config.PROJECT_NAME} v{config.VERSION}")
@@ -0,0 +1,107 @@
+"""
+CPU inference benchmark for Zypher AI Logo Generator
+
+Compares load time, peak memory and seconds per image for each CPU weight format
+(CPU_WEIGHT_DTYPE). Every mode runs in a fresh subprocess so peak RSS is not
+carried over from the previous one.
+
+Usage:
+    python benchmark_cpu.py
+    python benchmark_cpu.py --modes float32,int8 --images 3 --steps 4 --size 512
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+def run_mode(args):
+    """Benchmark a single mode in this process and print the result as JSON"""
+    os.environ["USE_GPU"] = "false"
+    os.environ["CPU_WEIGHT_DTYPE"] = args.mode
+    os.environ["MODEL_WARMUP_ON_START"] = "false"
+    os.environ["PROMPT_EMBED_CACHE_MB"] = "0"  # Measure full text encoding every time
+
+    import resource
+    from utils.model_manager import ModelManager
+
+    manager = ModelManager()
+    start_time = time.perf_counter()
+    manager.load_base_model()
+    load_seconds = time.perf_counter() - start_time
+    load_peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    gen_params = {"num_steps": args.steps, "width": args.size, "height": args.size, "seed": 0}
+    # The first call includes one-off allocations; keep it out of the average
+    manager.generate_image(args.prompt, **gen_params)
+
+    image_seconds = []
+    for index in range(args.images):
+        start_time = time.perf_counter()
+        manager.generate_image(args.prompt, **dict(gen_params, seed=index))
+        image_seconds.append(time.perf_counter() - start_time)
+
+    result = {
+        "mode": args.mode,
+        "load_seconds": round(load_seconds, 1),
+        "load_peak_rss_mb": round(load_peak_rss_mb),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+        "seconds_per_image": round(sum(image_seconds) / len(image_seconds), 3),
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def run_all(args):
+    """Run every requested mode in its own subprocess and print a comparison table"""
+    results = []
+    for mode in args.modes.split(","):
+        print(f"\n🔄 Benchmarking CPU_WEIGHT_DTYPE={mode}...")
+        command = [
+            sys.executable, os.path.abspath(__file__), "--mode", mode,
+            "--images", str(args.images), "--steps", str(args.steps),
+            "--size", str(args.size), "--prompt", args.prompt
+        ]
+        process = subprocess.run(command, capture_output=True, text=True)
+        lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if process.returncode != 0 or not lines:
+            print(f"❌ {mode} failed:\n{process.stderr[-2000:]}")
+            continue
+        result = json.loads(lines[-1][len(RESULT_PREFIX):])
+        print(f"✓ {mode}: {result['seconds_per_image']}s/image, peak RSS {result['peak_rss_mb']} MB")
+        results.append(result)
+
+    if not results:
+        return
+
+    baseline = next((r for r in results if r["mode"] == "float32"), results[0])
+    print(f"\n{'='*78}")
+    print(f"{'mode':<10} {'load s':>8} {'load RSS MB':>12} {'peak RSS MB':>12} {'s/image':>9} {'speedup':>8} {'memory':>8}")
+    print(f"{'-'*78}")
+    for r in results:
+        speedup = baseline["seconds_per_image"] / r["seconds_per_image"] if r["seconds_per_image"] else 0
+        memory = r["peak_rss_mb"] / baseline["peak_rss_mb"] if baseline["peak_rss_mb"] else 0
+        print(f"{r['mode']:<10} {r['load_seconds']:>8} {r['load_peak_rss_mb']:>12} {r['peak_rss_mb']:>12} "
+              f"{r['seconds_per_image']:>9} {speedup:>7.2f}x {memory:>7.2f}x")
+    print(f"{'='*78}")
+    print(f"{args.images} image(s) per mode, {args.size}x{args.size}, {args.steps} steps; "
+          f"speedup and memory are relative to {baseline['mode']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark FLUX CPU inference per weight format")
+    parser.add_argument("--modes", default="float32,bfloat16,int8", help="Comma-separated CPU_WEIGHT_DTYPE values")
+    parser.add_argument("--images", type=int, default=2, help="Timed images per mode (after one untimed warm-up)")
+    parser.add_argument("--steps", type=int, default=4, help="Denoising steps per image")
+    parser.add_argument("--size", type=int, default=512, help="Image width and height")
+    parser.add_argument("--prompt", default="Minimalist logo of a mountain, flat vector, blue and white")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)  # Internal: benchmark one mode in this process
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+    else:
+        run_all(args)
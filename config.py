@@ -59,11 +59,172 @@ DEFAULT_GENERATION_PARAMS = {
 }
 LORA_SCALE = 0.8
 
+# Memory/offload profiles for the FLUX pipeline. MODEL_MEMORY_PROFILE picks one by
+# name; several can be combined with "+", e.g. "model-offload+vae-slicing".
+# Offload only applies on GPU; it trades per-step speed for lower VRAM.
+MEMORY_PROFILES = {
+    "full-resident": {"offload": None},  # Everything stays on the device: fastest, most VRAM
+    "model-offload": {"offload": "model"},  # Whole sub-models move to the GPU while they run
+    "sequential-offload": {"offload": "sequential"},  # Layer by layer: lowest VRAM, slowest
+    "vae-slicing": {"vae_slicing": True, "vae_tiling": True},  # Decode batches/large images in pieces
+    "attention-slicing": {"attention_slicing": True},  # Compute attention in chunks
+}
+MODEL_MEMORY_PROFILE = os.getenv("MODEL_MEMORY_PROFILE", "model-offload")
+
+# Weight format on CPU-only nodes: float32 (original), bfloat16, or int8 (weight-only
+# quantized transformer and T5 encoder; needs torchao). The int8 weights are converted
+# once and kept under CPU_QUANTIZED_CACHE_DIR so later boots skip re-quantization.
+CPU_WEIGHT_DTYPE = os.getenv("CPU_WEIGHT_DTYPE", "float32").lower()
+CPU_QUANTIZED_CACHE_DIR = os.getenv("CPU_QUANTIZED_CACHE_DIR", os.path.join(MODELS_DIR, "quantized"))
+
+# Opt-in torch.compile of the FLUX transformer and VAE decoder. Only the resolutions
+# listed here run compiled (compiled at load time); other sizes fall back to eager.
+# Inductor artifacts are kept in MODEL_COMPILE_CACHE_DIR so restarts reuse them.
+MODEL_COMPILE = os.getenv("MODEL_COMPILE", "false").lower() == "true"
+MODEL_COMPILE_MODE = os.getenv("MODEL_COMPILE_MODE", "max-autotune-no-cudagraphs")
+MODEL_COMPILE_RESOLUTIONS = [
+    tuple(int(side) for side in size.lower().split("x"))
+    for size in os.getenv("MODEL_COMPILE_RESOLUTIONS", "1024x1024").split(",")
+    if size.strip()
+]
+MODEL_COMPILE_CACHE_DIR = os.getenv("MODEL_COMPILE_CACHE_DIR", os.path.join(MODELS_DIR, "compile_cache"))
+# LoRA adapters kept loaded side by side; switching between them is a set_adapters call
+LORA_MAX_RESIDENT_ADAPTERS = int(os.getenv("LORA_MAX_RESIDENT_ADAPTERS", "3"))
+
+# CLIP/T5 prompt embeddings are reused for repeated prompts (re-rolls, agent templates).
+# Memory cap in MB; 0 disables the cache.
+PROMPT_EMBED_CACHE_MB = int(os.getenv("PROMPT_EMBED_CACHE_MB", "256"))
+
+# FLUX Redux embeddings cached by reference image content hash. Evicted entries
+# are spilled to REDUX_CACHE_SPILL_DIR as safetensors when it is set, keeping at
+# most REDUX_CACHE_SPILL_MB there (least recently used files are deleted first).
+REDUX_CACHE_MB = int(os.getenv("REDUX_CACHE_MB", "128"))
+REDUX_CACHE_SPILL_DIR = os.getenv("REDUX_CACHE_SPILL_DIR", "")
+REDUX_CACHE_SPILL_MB = int(os.getenv("REDUX_CACHE_SPILL_MB", "1024"))
+
+# Seeded generations are reproducible, so their images are cached on disk by a hash
+# of prompt, seed, steps, size, LoRA and Redux reference. Size cap in MB; 0 disables.
+RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", "512"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(OUTPUTS_DIR, "result_cache"))
+
+# -------------------------------------------------
+# Generation scheduling
+# -------------------------------------------------
+# Concurrent requests with the same size, steps and LoRA are collected for this
+# long and run as a single batched pipeline call
+GENERATION_BATCH_WINDOW_MS = int(os.getenv("GENERATION_BATCH_WINDOW_MS", "50"))
+GENERATION_MAX_BATCH_SIZE = int(os.getenv("GENERATION_MAX_BATCH_SIZE", "4"))
+# The queue serves runs of jobs with the same LoRA/size/steps back to back;
+# no job waits more than this many dispatches for its group to come up
+GENERATION_STARVATION_ROUNDS = int(os.getenv("GENERATION_STARVATION_ROUNDS", "3"))
+# Decode latents to images on a separate thread so the transformer can start the next
+# batch meanwhile. Only used when the pipeline is fully resident (no CPU offload).
+GENERATION_DECODE_STAGE = os.getenv("GENERATION_DECODE_STAGE", "true").lower() == "true"
+
+# Priority classes derived from User.is_pro. Each class gets a weighted fair share
+# of dispatches, at most max_concurrent requests per pipeline call, and at most
+# max_queue waiting requests; beyond that new requests get 429 with Retry-After.
+GENERATION_PRIORITY_CLASSES = {
+    "pro": {
+        "weight": int(os.getenv("GENERATION_PRO_WEIGHT", "3")),
+        "max_concurrent": int(os.getenv("GENERATION_PRO_MAX_CONCURRENT", "4")),
+        "max_queue": int(os.getenv("GENERATION_PRO_MAX_QUEUE", "50")),
+    },
+    "free": {
+        "weight": int(os.getenv("GENERATION_FREE_WEIGHT", "1")),
+        "max_concurrent": int(os.getenv("GENERATION_FREE_MAX_CONCURRENT", "2")),
+        "max_queue": int(os.getenv("GENERATION_FREE_MAX_QUEUE", "10")),
+    },
+}
+
+# Background job API (/api/generate-jobs): worker threads mostly wait on the
+# scheduler, so more workers than the batch size lets batches fill up
+GENERATION_JOB_WORKERS = int(os.getenv("GENERATION_JOB_WORKERS", "8"))
+GENERATION_JOB_TTL_SECONDS = int(os.getenv("GENERATION_JOB_TTL_SECONDS", "600"))
+# A job whose progress stream disconnects is cancelled unless the client polls
+# or reconnects within this many seconds
+GENERATION_ABANDON_GRACE_SECONDS = float(os.getenv("GENERATION_ABANDON_GRACE_SECONDS", "5"))
+# An idle progress stream writes a keep-alive comment this often. A disconnected
+# client is only noticed when a write fails, so this bounds how long an abandoned
+# job keeps running before its grace period starts.
+GENERATION_SSE_KEEPALIVE_SECONDS = float(os.getenv("GENERATION_SSE_KEEPALIVE_SECONDS", "2"))
+# Progressive jobs ("preview": true) first render on the same seed with the longest
+# side scaled down to this many pixels, then continue with the full-size render
+GENERATION_PREVIEW_SIZE = int(os.getenv("GENERATION_PREVIEW_SIZE", "512"))
+# num_candidates: variants of one prompt rendered in a single batched pipeline call
+# on consecutive seeds. Pro users pay one quota unit per request; free users pay
+# GENERATION_FREE_CANDIDATE_COST units per candidate (rounded up).
+GENERATION_MAX_CANDIDATES = int(os.getenv("GENERATION_MAX_CANDIDATES", "4"))
+GENERATION_FREE_CANDIDATE_COST = float(os.getenv("GENERATION_FREE_CANDIDATE_COST", "1"))
+
+# Opt-in background warm-up at startup: loads the base model (plus the default
+# LoRA / Redux), runs one tiny inference and flips /api/model/ready to 200
+MODEL_WARMUP_ON_START = os.getenv("MODEL_WARMUP_ON_START", "false").lower() == "true"
+MODEL_WARMUP_LORA = os.getenv("MODEL_WARMUP_LORA", "true").lower() == "true"
+MODEL_WARMUP_REDUX = os.getenv("MODEL_WARMUP_REDUX", "false").lower() == "true"
+
+# -------------------------------------------------
+# Inference server
+# -------------------------------------------------
+# When set ("host:port" or a unix socket path), web workers send generation to
+# inference_server.py instead of loading the model in-process
+INFERENCE_SERVER_ADDRESS = os.getenv("INFERENCE_SERVER_ADDRESS", "")
+INFERENCE_SERVER_DEFAULT_ADDRESS = "127.0.0.1:7870"
+# Shared secret for the connection handshake. Requests are pickled, so anyone who can
+# connect with it can run code on the inference host: there is no default, and the
+# server and the remote backend refuse to run without one.
+INFERENCE_SERVER_AUTHKEY = os.getenv("INFERENCE_SERVER_AUTHKEY", "")
+
+# Stub pipeline returns placeholder images without loading any weights
+INFERENCE_STUB_PIPELINE = os.getenv("INFERENCE_STUB_PIPELINE", "false").lower() == "true"
+INFERENCE_STUB_STEP_SECONDS = float(os.getenv("INFERENCE_STUB_STEP_SECONDS", "0"))
+INFERENCE_STUB_DECODE_SECONDS = float(os.getenv("INFERENCE_STUB_DECODE_SECONDS", "0"))
+
 # -------------------------------------------------
 # Image handling
 # -------------------------------------------------
 SAVE_GENERATED_IMAGES = True
 IMAGE_FORMAT = "PNG"
+# Generated images are encoded once, on this many worker threads. PNG stays lossless
+# at every level; higher levels (0-9) trade encode time for smaller files.
+IMAGE_ENCODE_WORKERS = int(os.getenv("IMAGE_ENCODE_WORKERS", "2"))
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", "6"))
+PNG_OPTIMIZE = os.getenv("PNG_OPTIMIZE", "false").lower() == "true"
+# Where generated images are stored: "local" writes content-addressed files sharded
+# under OUTPUTS_DIR (ab/cd/<sha256>.png); "s3" puts them in an S3-compatible bucket
+# (needs boto3; credentials from the usual AWS_* variables)
+OUTPUT_STORE_BACKEND = os.getenv("OUTPUT_STORE_BACKEND", "local").lower()
+OUTPUT_S3_BUCKET = os.getenv("OUTPUT_S3_BUCKET", "")
+OUTPUT_S3_PREFIX = os.getenv("OUTPUT_S3_PREFIX", "outputs")
+OUTPUT_S3_ENDPOINT_URL = os.getenv("OUTPUT_S3_ENDPOINT_URL", "")
+OUTPUT_S3_URL_EXPIRY = int(os.getenv("OUTPUT_S3_URL_EXPIRY", "3600"))
+# Content-addressed files never change, so browsers and CDNs may cache them this long
+OUTPUT_CACHE_MAX_AGE = int(os.getenv("OUTPUT_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+
+# Background garbage collection of outputs: files no ChatHistory row references
+# (deleted history, failed requests) are removed once older than the grace period,
+# and images of history entries older than their owner's tier retention (days,
+# 0 keeps them forever) are removed. Scans run in batches of OUTPUT_GC_BATCH_SIZE.
+# Off by default since it deletes files; enable it on one instance only (every
+# gunicorn worker that imports the app with it enabled starts its own collector).
+OUTPUT_GC_ENABLED = os.getenv("OUTPUT_GC_ENABLED", "false").lower() == "true"
+OUTPUT_GC_INTERVAL_SECONDS = int(os.getenv("OUTPUT_GC_INTERVAL_SECONDS", "3600"))
+OUTPUT_GC_BATCH_SIZE = int(os.getenv("OUTPUT_GC_BATCH_SIZE", "500"))
+OUTPUT_GC_GRACE_SECONDS = int(os.getenv("OUTPUT_GC_GRACE_SECONDS", "3600"))
+OUTPUT_RETENTION_DAYS = {
+    "pro": int(os.getenv("OUTPUT_RETENTION_DAYS_PRO", "0")),
+    "free": int(os.getenv("OUTPUT_RETENTION_DAYS_FREE", "0")),
+}
+
+# Renditions made in the background after each generation: the PNG stays the
+# lossless master, /outputs/<filename> serves the best display format the browser
+# accepts (most preferred first) and ?size=<px> serves a thumbnail
+OUTPUT_RENDITIONS = os.getenv("OUTPUT_RENDITIONS", "true").lower() == "true"
+OUTPUT_RENDITION_FORMATS = [f.strip().lower() for f in os.getenv("OUTPUT_RENDITION_FORMATS", "avif,webp").split(",") if f.strip()]
+OUTPUT_THUMBNAIL_SIZES = [int(s) for s in os.getenv("OUTPUT_THUMBNAIL_SIZES", "128,256").split(",") if s.strip()]
+OUTPUT_WEBP_QUALITY = int(os.getenv("OUTPUT_WEBP_QUALITY", "90"))
+OUTPUT_AVIF_QUALITY = int(os.getenv("OUTPUT_AVIF_QUALITY", "70"))
+OUTPUT_RENDITION_WORKERS = int(os.getenv("OUTPUT_RENDITION_WORKERS", "1"))
 
 # -------------------------------------------------
 # GPU
@@ -99,6 +260,24 @@ BRAVE_SEARCH_API_KEY = os.getenv("BRAVE_SEARCH_API_KEY", "")
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
 MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
 MISTRAL_API_ENDPOINT = "https://api.mistral.ai/v1/chat/completions"
+# Shared HTTP client for every Mistral call, with a keep-alive pool. Completions are
+# not idempotent, so only connect errors and 429/502/503/504 responses are retried,
+# with jittered exponential backoff.
+# HTTP/2 is used through httpx when "httpx[http2]" is installed and MISTRAL_HTTP2 is on.
+MISTRAL_POOL_SIZE = int(os.getenv("MISTRAL_POOL_SIZE", "10"))
+MISTRAL_MAX_RETRIES = int(os.getenv("MISTRAL_MAX_RETRIES", "2"))
+MISTRAL_RETRY_BACKOFF = float(os.getenv("MISTRAL_RETRY_BACKOFF", "0.5"))
+MISTRAL_CONNECT_TIMEOUT = float(os.getenv("MISTRAL_CONNECT_TIMEOUT", "5"))
+MISTRAL_HTTP2 = os.getenv("MISTRAL_HTTP2", "true").lower() == "true"
+# Router mode: each chat turn makes ONE JSON-mode completion returning intent,
+# search query, image prompt, acknowledgment and reply, instead of separate calls
+MISTRAL_ROUTER_MODE = os.getenv("MISTRAL_ROUTER_MODE", "true").lower() == "true"
+MISTRAL_ROUTER_TEMPERATURE = float(os.getenv("MISTRAL_ROUTER_TEMPERATURE", "0.5"))
+# Per-turn memo of router answers and intent classifications: always per request;
+# intent classifications also go in a process-wide cache for MISTRAL_TURN_CACHE_TTL
+# seconds (0 disables it), and at most MISTRAL_TURN_CACHE_SIZE entries are kept.
+MISTRAL_TURN_CACHE_TTL = int(os.getenv("MISTRAL_TURN_CACHE_TTL", "120"))
+MISTRAL_TURN_CACHE_SIZE = int(os.getenv("MISTRAL_TURN_CACHE_SIZE", "1024"))
 
 MISTRAL_SYSTEM_PROMPT = """You are Zypher AI, an intelligent AI assistant specialized in helping users create professional logos and images.
 
@@ -234,8 +413,64 @@ _config_values = {
     "LORA_WEIGHTS_FILE": LORA_WEIGHTS_FILE,
     "DEFAULT_GENERATION_PARAMS": DEFAULT_GENERATION_PARAMS,
     "LORA_SCALE": LORA_SCALE,
+    "MEMORY_PROFILES": MEMORY_PROFILES,
+    "MODEL_MEMORY_PROFILE": MODEL_MEMORY_PROFILE,
+    "CPU_WEIGHT_DTYPE": CPU_WEIGHT_DTYPE,
+    "CPU_QUANTIZED_CACHE_DIR": CPU_QUANTIZED_CACHE_DIR,
+    "MODEL_COMPILE": MODEL_COMPILE,
+    "MODEL_COMPILE_MODE": MODEL_COMPILE_MODE,
+    "MODEL_COMPILE_RESOLUTIONS": MODEL_COMPILE_RESOLUTIONS,
+    "MODEL_COMPILE_CACHE_DIR": MODEL_COMPILE_CACHE_DIR,
+    "LORA_MAX_RESIDENT_ADAPTERS": LORA_MAX_RESIDENT_ADAPTERS,
+    "PROMPT_EMBED_CACHE_MB": PROMPT_EMBED_CACHE_MB,
+    "REDUX_CACHE_MB": REDUX_CACHE_MB,
+    "REDUX_CACHE_SPILL_DIR": REDUX_CACHE_SPILL_DIR,
+    "REDUX_CACHE_SPILL_MB": REDUX_CACHE_SPILL_MB,
+    "RESULT_CACHE_MB": RESULT_CACHE_MB,
+    "RESULT_CACHE_DIR": RESULT_CACHE_DIR,
+    "GENERATION_BATCH_WINDOW_MS": GENERATION_BATCH_WINDOW_MS,
+    "GENERATION_MAX_BATCH_SIZE": GENERATION_MAX_BATCH_SIZE,
+    "GENERATION_STARVATION_ROUNDS": GENERATION_STARVATION_ROUNDS,
+    "GENERATION_DECODE_STAGE": GENERATION_DECODE_STAGE,
+    "GENERATION_PRIORITY_CLASSES": GENERATION_PRIORITY_CLASSES,
+    "GENERATION_JOB_WORKERS": GENERATION_JOB_WORKERS,
+    "GENERATION_JOB_TTL_SECONDS": GENERATION_JOB_TTL_SECONDS,
+    "GENERATION_ABANDON_GRACE_SECONDS": GENERATION_ABANDON_GRACE_SECONDS,
+    "GENERATION_SSE_KEEPALIVE_SECONDS": GENERATION_SSE_KEEPALIVE_SECONDS,
+    "GENERATION_PREVIEW_SIZE": GENERATION_PREVIEW_SIZE,
+    "GENERATION_MAX_CANDIDATES": GENERATION_MAX_CANDIDATES,
+    "GENERATION_FREE_CANDIDATE_COST": GENERATION_FREE_CANDIDATE_COST,
+    "MODEL_WARMUP_ON_START": MODEL_WARMUP_ON_START,
+    "MODEL_WARMUP_LORA": MODEL_WARMUP_LORA,
+    "MODEL_WARMUP_REDUX": MODEL_WARMUP_REDUX,
+    "INFERENCE_SERVER_ADDRESS": INFERENCE_SERVER_ADDRESS,
+    "INFERENCE_SERVER_DEFAULT_ADDRESS": INFERENCE_SERVER_DEFAULT_ADDRESS,
+    "INFERENCE_SERVER_AUTHKEY": INFERENCE_SERVER_AUTHKEY,
+    "INFERENCE_STUB_PIPELINE": INFERENCE_STUB_PIPELINE,
+    "INFERENCE_STUB_STEP_SECONDS": INFERENCE_STUB_STEP_SECONDS,
+    "INFERENCE_STUB_DECODE_SECONDS": INFERENCE_STUB_DECODE_SECONDS,
     "SAVE_GENERATED_IMAGES": SAVE_GENERATED_IMAGES,
     "IMAGE_FORMAT": IMAGE_FORMAT,
+    "IMAGE_ENCODE_WORKERS": IMAGE_ENCODE_WORKERS,
+    "PNG_COMPRESS_LEVEL": PNG_COMPRESS_LEVEL,
+    "PNG_OPTIMIZE": PNG_OPTIMIZE,
+    "OUTPUT_STORE_BACKEND": OUTPUT_STORE_BACKEND,
+    "OUTPUT_S3_BUCKET": OUTPUT_S3_BUCKET,
+    "OUTPUT_S3_PREFIX": OUTPUT_S3_PREFIX,
+    "OUTPUT_S3_ENDPOINT_URL": OUTPUT_S3_ENDPOINT_URL,
+    "OUTPUT_S3_URL_EXPIRY": OUTPUT_S3_URL_EXPIRY,
+    "OUTPUT_CACHE_MAX_AGE": OUTPUT_CACHE_MAX_AGE,
+    "OUTPUT_GC_ENABLED": OUTPUT_GC_ENABLED,
+    "OUTPUT_GC_INTERVAL_SECONDS": OUTPUT_GC_INTERVAL_SECONDS,
+    "OUTPUT_GC_BATCH_SIZE": OUTPUT_GC_BATCH_SIZE,
+    "OUTPUT_GC_GRACE_SECONDS": OUTPUT_GC_GRACE_SECONDS,
+    "OUTPUT_RETENTION_DAYS": OUTPUT_RETENTION_DAYS,
+    "OUTPUT_RENDITIONS": OUTPUT_RENDITIONS,
+    "OUTPUT_RENDITION_FORMATS": OUTPUT_RENDITION_FORMATS,
+    "OUTPUT_THUMBNAIL_SIZES": OUTPUT_THUMBNAIL_SIZES,
+    "OUTPUT_WEBP_QUALITY": OUTPUT_WEBP_QUALITY,
+    "OUTPUT_AVIF_QUALITY": OUTPUT_AVIF_QUALITY,
+    "OUTPUT_RENDITION_WORKERS": OUTPUT_RENDITION_WORKERS,
     "USE_GPU": USE_GPU,
     "GPU_DEVICE": GPU_DEVICE,
     "FIREBASE_CLIENT_CONFIG": FIREBASE_CLIENT_CONFIG,
@@ -243,6 +478,15 @@ _config_values = {
     "MISTRAL_API_KEY": MISTRAL_API_KEY,
     "MISTRAL_MODEL": MISTRAL_MODEL,
     "MISTRAL_API_ENDPOINT": MISTRAL_API_ENDPOINT,
+    "MISTRAL_POOL_SIZE": MISTRAL_POOL_SIZE,
+    "MISTRAL_MAX_RETRIES": MISTRAL_MAX_RETRIES,
+    "MISTRAL_RETRY_BACKOFF": MISTRAL_RETRY_BACKOFF,
+    "MISTRAL_CONNECT_TIMEOUT": MISTRAL_CONNECT_TIMEOUT,
+    "MISTRAL_HTTP2": MISTRAL_HTTP2,
+    "MISTRAL_ROUTER_MODE": MISTRAL_ROUTER_MODE,
+    "MISTRAL_ROUTER_TEMPERATURE": MISTRAL_ROUTER_TEMPERATURE,
+    "MISTRAL_TURN_CACHE_TTL": MISTRAL_TURN_CACHE_TTL,
+    "MISTRAL_TURN_CACHE_SIZE": MISTRAL_TURN_CACHE_SIZE,
     "MISTRAL_SYSTEM_PROMPT": MISTRAL_SYSTEM_PROMPT,
     "MAX_HISTORY_ITEMS": MAX_HISTORY_ITEMS,
     "HISTORY_FILE": HISTORY_FILE,
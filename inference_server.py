@@ -0,0 +1,130 @@
+# inference_server.py
+"""
+Standalone inference server for Zypher AI Logo Generator
+
+Owns the only ModelManager (and so the only copy of the FLUX weights) and serves
+generation requests from any number of web workers over a local socket. Point the
+web app at it with INFERENCE_SERVER_ADDRESS.
+
+Set INFERENCE_STUB_PIPELINE=true to run it without model weights.
+"""
+import os
+import threading
+import traceback
+from multiprocessing.connection import Listener
+from config import config
+from utils.cancellation import CancellationToken, GenerationCancelled
+from utils.inference_client import parse_inference_address, LocalInferenceBackend
+from utils.priority import GenerationQueueFull
+
+
+def watch_for_cancel(conn, cancel_token):
+    """Cancel the generation when the web worker sends 'cancel' or disconnects"""
+    try:
+        while not cancel_token.cancelled:
+            kind, *_ = conn.recv()
+            if kind == 'cancel':
+                cancel_token.cancel("cancelled by client")
+    except (EOFError, OSError):
+        cancel_token.cancel("abandoned by client")
+
+
+def handle_connection(conn, backend):
+    """Serve a single request from a web worker"""
+    # Progress is sent from the scheduler thread while this thread sends the final
+    # message and closes the connection: one lock keeps pickle frames from interleaving,
+    # and once the final message is out (or the connection is closing) progress is dropped
+    send_lock = threading.Lock()
+    closed = threading.Event()
+
+    def send(message, final=False):
+        with send_lock:
+            if closed.is_set():
+                return
+            if final:
+                closed.set()
+            conn.send(message)
+
+    with conn:
+        try:
+            kind, *payload = conn.recv()
+
+            if kind == 'generate':
+                prompt, params = payload
+                cancel_token = CancellationToken()
+                threading.Thread(target=watch_for_cancel, args=(conn, cancel_token), daemon=True).start()
+
+                def report_progress(step, total_steps):
+                    try:
+                        send(('progress', step, total_steps))
+                    except OSError:
+                        pass  # Disconnected: watch_for_cancel cancels the generation
+
+                try:
+                    result = backend.generate(
+                        prompt, progress_callback=report_progress, cancel_token=cancel_token, **params
+                    )
+                except GenerationCancelled as e:
+                    if cancel_token.reason != "abandoned by client":
+                        send(('cancelled', str(e)), final=True)
+                    return
+                except GenerationQueueFull as e:
+                    send(('busy', e.priority_class, e.retry_after), final=True)
+                    return
+            elif kind == 'model_info':
+                result = backend.get_model_info()
+            elif kind == 'scheduler_stats':
+                result = backend.get_scheduler_stats()
+            elif kind == 'lora_info':
+                result = backend.get_lora_info()
+            elif kind == 'readiness':
+                result = backend.get_readiness()
+            else:
+                raise ValueError(f"Unknown request: {kind}")
+
+            send(('result', result), final=True)
+        except (EOFError, ConnectionError, BrokenPipeError):
+            print("⚠️ Web worker disconnected before the request finished")
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                send(('error', str(e)), final=True)
+            except Exception:
+                pass
+        finally:
+            with send_lock:
+                closed.set()
+
+
+def serve(address=None):
+    address = address or config.INFERENCE_SERVER_ADDRESS or config.INFERENCE_SERVER_DEFAULT_ADDRESS
+    if not config.INFERENCE_SERVER_AUTHKEY:
+        # Requests are unpickled: without a secret anyone reaching the socket could run code here
+        raise SystemExit("❌ INFERENCE_SERVER_AUTHKEY is not set; refusing to start the inference server")
+    listener_address = parse_inference_address(address)
+    listener = Listener(listener_address, authkey=config.INFERENCE_SERVER_AUTHKEY.encode('utf-8'))
+    if isinstance(listener_address, str):
+        os.chmod(listener_address, 0o600)  # Unix socket: only this user may connect
+    backend = LocalInferenceBackend()
+    print(f"✓ Inference server listening on {address}")
+    if backend.model_manager.stub_pipeline:
+        print("⚠️  Stub pipeline mode: returning placeholder images")
+    if config.MODEL_WARMUP_ON_START:
+        backend.start_warm_up()
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            # Failed handshakes (e.g. wrong authkey) must not stop the server
+            print(f"⚠️ Rejected connection: {e}")
+            continue
+        threading.Thread(target=handle_connection, args=(conn, backend), daemon=True).start()
+
+
+if __name__ == '__main__':
+    print(f"\n{'='*60}")
+    print(f"{config.PROJECT_NAME} v{config.VERSION}")
+    print(f"Inference Server")
+    print(f"{'='*60}\n")
+    serve()
@@ -19,7 +19,9 @@ class ChatHistory(db.Model):
     
     # Image-related fields
     image_prompt = db.Column(db.Text, nullable=True)
-    image_path = db.Column(db.String(255), nullable=True)
+    image_path = db.Column(db.String(255), nullable=True, index=True)  # Indexed for the output GC
+    # JSON list of every candidate's path when one request produced several (image_path is the first)
+    candidate_paths = db.Column(db.Text, nullable=True)
     
     # Message type: 'text' or 'image'
     message_type = db.Column(db.String(20), default='text')
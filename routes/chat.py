@@ -1,11 +1,12 @@
 # routes/chat.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify
 from models.db import db
 from models.user import User
 from models.chat_history import ChatHistory
 from utils.firebase_auth import verify_firebase_token
 from utils.helpers import check_and_reset_daily_limit
 from utils.mistral_chat import MistralChatManager
+from utils.mistral_client import get_mistral_client
 from utils.logo_agent import LogoReferenceAgent
 from PIL import Image
 import requests
@@ -18,6 +19,14 @@ logo_agent = LogoReferenceAgent()
 # Store reference images for each user (in production, use Redis or database)
 user_reference_images = {}  # uid -> PIL.Image
 
+@chat_bp.after_request
+def record_mistral_calls(response):
+    """Count the Mistral calls each chat turn made (see the mistral stats in /api/model/status)"""
+    if request.endpoint == 'chat.chat_with_ai':
+        get_mistral_client().record_turn(g.get('mistral_calls', 0))
+    return response
+
+
 @chat_bp.route('/api/chat', methods=['POST'])
 @verify_firebase_token
 def chat_with_ai():
@@ -45,7 +54,7 @@ def chat_with_ai():
     # Check for photo search if web search is enabled
     if use_web_search:
         # Classify user intent first for better handling
-        intent_data = mistral_chat.classify_user_intent(user_message, data.get('conversation_history', []))
+        intent_data = mistral_chat.classify_user_intent(user_message, data.get('conversation_history', []), use_web_search=True)
         print(f"💭 Intent: {intent_data['intent']} (confidence: {intent_data['confidence']:.2f})")
         
         # Check if there's a pending photo request (confirmation/refinement)
@@ -196,7 +205,7 @@ def chat_with_ai():
                 mistral_chat.pending_photo_requests.pop(uid)
                 
                 # Check if user provided a new search query in their message
-                new_query = mistral_chat.extract_photo_search_query(user_message, data.get('conversation_history', []))
+                new_query = mistral_chat.extract_photo_search_query(user_message, data.get('conversation_history', []), use_web_search=True)
                 
                 if new_query and new_query.lower() != original_query.lower():
                     # User provided new search terms, search with those
@@ -235,7 +244,7 @@ def chat_with_ai():
         
         # Check if this is a NEW photo search request
         elif mistral_chat.is_photo_search_request(user_message):
-            search_query = mistral_chat.extract_photo_search_query(user_message, data.get('conversation_history', []))
+            search_query = mistral_chat.extract_photo_search_query(user_message, data.get('conversation_history', []), use_web_search=True)
             print(f"🔍 Extracted search query: {search_query}")
             print(f"📝 Conversation history length: {len(data.get('conversation_history', []))}")
             
@@ -268,7 +277,7 @@ def chat_with_ai():
 
     # Handle special case where chat returns None (user wants to search after rejecting logo)
     if response_text is None and use_web_search:
-        search_query = mistral_chat.extract_photo_search_query(user_message, data.get('conversation_history', []))
+        search_query = mistral_chat.extract_photo_search_query(user_message, data.get('conversation_history', []), use_web_search=True)
         if search_query:
             try:
                 photo_result = logo_agent.search_for_photo(search_query)
@@ -311,7 +320,7 @@ def chat_with_ai():
             db.session.commit()
             return jsonify({'success': True, 'response': limit_msg + " [Upgrade](/upgrade)", 'needs_upgrade': True})
 
-        friendly = mistral_chat.generate_acknowledgment(user_message)
+        friendly = mistral_chat.generate_acknowledgment(user_message, data.get('conversation_history', []), use_web_search=use_web_search)
         entry = ChatHistory(
             user_id=user.id, 
             user_message=user_message, 
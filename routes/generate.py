@@ -1,25 +1,389 @@
 # routes/generate.py
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, current_app, redirect, request, jsonify, send_from_directory
 from models.db import db
 from models.user import User
 from models.chat_history import ChatHistory
-from utils.model_manager import ModelManager
+from utils.inference_client import get_inference_backend
+from utils.generation_jobs import get_job_manager
+from utils.result_cache import get_result_cache
+from utils.image_encoder import get_image_encoder
+from utils.renditions import get_rendition_store, output_url, thumbnail_url
+from utils.output_store import content_hash, get_output_store
+from utils.priority import FREE, GenerationQueueFull, priority_class_for
 from utils.firebase_auth import verify_firebase_token
 from utils.helpers import check_and_reset_daily_limit
 from config import config
 from datetime import datetime
 import base64
 import io
+import json
+import math
 from PIL import Image
 import os
+import random
+import time
 
 generate_bp = Blueprint('generate', __name__)
-model_manager = ModelManager()
 
 # Import the shared user_reference_images from chat route
 # This is a temporary solution - in production, use Redis or database
 from routes.chat import user_reference_images
 
+def _fallback_conversation_id():
+    """Generate a conversation_id in the frontend format when the client sent none"""
+    import time
+    import random
+    import string
+    timestamp = int(time.time() * 1000)
+    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=9))
+    conversation_id = f"conv_{timestamp}_{random_suffix}"
+    print(f"⚠️  Warning: No conversation_id provided, generated fallback: {conversation_id}")
+    return conversation_id
+
+
+def _parse_seed(value):
+    """Validate the optional seed from the request body"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError('seed must be a non-negative integer')
+    try:
+        seed = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('seed must be a non-negative integer')
+    if seed < 0 or seed >= 2 ** 63:
+        raise ValueError('seed must be a non-negative integer')
+    return seed
+
+
+def _parse_num_candidates(value):
+    """Validate the optional num_candidates from the request body"""
+    if value is None or value == '':
+        return 1
+    message = f'num_candidates must be an integer between 1 and {config.GENERATION_MAX_CANDIDATES}'
+    if isinstance(value, bool):
+        raise ValueError(message)
+    try:
+        num_candidates = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(message)
+    if num_candidates < 1 or num_candidates > config.GENERATION_MAX_CANDIDATES:
+        raise ValueError(message)
+    return num_candidates
+
+
+def _quota_cost(user, gen_params):
+    """Daily-quota units a request costs: one for Pro, per candidate for free users"""
+    num_candidates = gen_params.get('num_candidates', 1)
+    if user.is_pro or num_candidates == 1:
+        return 1
+    return max(math.ceil(num_candidates * config.GENERATION_FREE_CANDIDATE_COST), 1)
+
+
+def _lock_user(user_id):
+    """Re-read a user row under a row lock (check_and_reset_daily_limit commits, releasing earlier locks)"""
+    return User.query.filter_by(id=user_id).with_for_update().populate_existing().first()
+
+
+def _refund_quota(user_id, cost):
+    """Give back quota reserved for a job that did not produce images"""
+    try:
+        user = _lock_user(user_id)
+        if user:
+            # A daily reset in the meantime already dropped the reservation
+            user.prompt_count = max((user.prompt_count or 0) - cost, 0)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Could not refund {cost} prompt(s) to user {user_id}: {e}")
+
+
+def _reserve_quota(user, data, uid):
+    """
+    Check the daily limit and take the request's cost under the user row lock
+
+    The reservation is committed right away, so the lock is only held for the check:
+    concurrent requests cannot all pass it, and a long generation does not block the
+    user's other requests. Callers refund it (_refund_quota) if no images are produced.
+
+    Returns:
+        tuple: (locked user, gen_params, cost, None), or (None, None, None, error response)
+    """
+    check_and_reset_daily_limit(user)
+    user = _lock_user(user.id)
+    if not user.is_pro and user.prompt_count >= 5:
+        db.session.rollback()
+        return None, None, None, (jsonify({'success': False, 'error': 'Limit reached', 'remaining_prompts': 0}), 403)
+
+    try:
+        gen_params = _build_generation_params(data, uid)
+    except ValueError as e:
+        db.session.rollback()
+        return None, None, None, (jsonify({'success': False, 'error': str(e)}), 400)
+    cost = _quota_cost(user, gen_params)
+    if not user.is_pro and user.prompt_count + cost > 5:
+        remaining = 5 - user.prompt_count
+        db.session.rollback()
+        return None, None, None, (jsonify({
+            'success': False,
+            'error': f"Not enough prompts left for {gen_params['num_candidates']} candidates",
+            'remaining_prompts': remaining
+        }), 403)
+    user.prompt_count += cost
+    db.session.commit()
+    return user, gen_params, cost, None
+
+
+def _build_generation_params(data, uid):
+    """Extract the generation parameters from the request body"""
+    # Check if user has a stored reference image from web search
+    reference_image = user_reference_images.get(uid)
+    use_ip_adapter_auto = reference_image is not None
+    ip_adapter_scale_auto = 0.6 if reference_image else 0.5  # Higher influence for web references
+    
+    # Extract only the parameters needed for generation
+    gen_params = {
+        'use_lora': data.get('use_lora', False),
+        'lora_filename': data.get('lora_filename'),
+        'num_steps': data.get('num_steps'),
+        'width': data.get('width'),
+        'height': data.get('height'),
+        'use_ip_adapter': data.get('use_ip_adapter', False) or use_ip_adapter_auto,
+        'ip_adapter_scale': ip_adapter_scale_auto if reference_image else data.get('ip_adapter_scale', 0.5),
+        'reference_image': reference_image if reference_image else data.get('reference_image'),
+        'seed': _parse_seed(data.get('seed'))
+    }
+    num_candidates = _parse_num_candidates(data.get('num_candidates'))
+    if num_candidates > 1:
+        gen_params['num_candidates'] = num_candidates
+        # Candidates use seed, seed + 1, ...; pick the base so every candidate can be reproduced
+        if gen_params['seed'] is None:
+            gen_params['seed'] = random.randrange(2 ** 32)
+    
+    # Remove None values
+    return {k: v for k, v in gen_params.items() if v is not None}
+
+
+def _queue_full_response(error):
+    """429 with Retry-After for a priority class whose generation queue is full"""
+    response = jsonify({'success': False, 'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _generate_images(image_prompt, gen_params, progress_callback=None, cancel_token=None, priority_class=FREE):
+    """
+    Generate the requested image (or num_candidates variants) through the inference backend
+
+    Seeded requests are reproducible, so they are served from the result cache when
+    an identical request ran before; candidate i is cached under seed + i. Fresh images
+    start encoding on the image encoder pool right away. Returns a list of
+    (encoding, cached_path) pairs, one per candidate: either a Future resolving to the
+    encoded file bytes, or the path of the cached file.
+    """
+    seed = gen_params.get('seed')
+    num_candidates = gen_params.get('num_candidates', 1)
+
+    def generate():
+        images = get_inference_backend().generate(
+            image_prompt, progress_callback=progress_callback, cancel_token=cancel_token,
+            priority_class=priority_class, **gen_params
+        )
+        return images if num_candidates > 1 else [images]
+
+    encoder = get_image_encoder()
+    result_cache = get_result_cache()
+    if seed is None or not result_cache.enabled:
+        return [(encoder.submit(image), None) for image in generate()]
+
+    cache_keys = [result_cache.make_key(image_prompt, seed + index, gen_params) for index in range(num_candidates)]
+    cached_paths = [result_cache.get(key) for key in cache_keys]
+    if all(cached_paths):
+        print(f"✓ Result cache hit for seed {seed}")
+        return [(None, path) for path in cached_paths]
+
+    def cache_encoded(key):
+        # The cache stores the same bytes as the output file
+        def done(encoding):
+            if encoding.exception() is None:
+                result_cache.put(key, encoding.result())
+        return done
+
+    results = []
+    for key, image in zip(cache_keys, generate()):
+        encoding = encoder.submit(image)
+        encoding.add_done_callback(cache_encoded(key))
+        results.append((encoding, None))
+    return results
+
+
+def _preview_params(gen_params):
+    """
+    Parameters for the quick preview of a progressive job: same seed and settings,
+    longest side scaled down to GENERATION_PREVIEW_SIZE. Only the first candidate is
+    previewed. Returns None when the full render is already that small.
+    """
+    width = gen_params.get('width', config.DEFAULT_GENERATION_PARAMS['width'])
+    height = gen_params.get('height', config.DEFAULT_GENERATION_PARAMS['height'])
+    scale = config.GENERATION_PREVIEW_SIZE / max(width, height)
+    if scale >= 1:
+        return None
+    # FLUX needs sides divisible by 16
+    preview_params = dict(
+        gen_params,
+        width=max(16, int(width * scale) // 16 * 16),
+        height=max(16, int(height * scale) // 16 * 16)
+    )
+    preview_params.pop('num_candidates', None)
+    return preview_params
+
+
+def _encode_preview(image):
+    """Encode a preview image as a compact JPEG data URI"""
+    buffered = io.BytesIO()
+    image.convert('RGB').save(buffered, format='JPEG', quality=80)
+    return f"data:image/jpeg;base64,{base64.b64encode(buffered.getvalue()).decode()}"
+
+
+def _save_image(encoding, cached_path, inline):
+    """
+    Put one encoded (or cached) image into the output store
+
+    Returns (name, image): the content-addressed store name (None when images are not
+    saved) and the image as a data URI when inline is set or nothing could serve its
+    URL (otherwise None).
+    """
+    if cached_path:
+        # Served from the result cache: reuse the stored file bytes as-is, so a
+        # repeated request maps onto the same stored output
+        with open(cached_path, 'rb') as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = encoding.result()
+    name = None
+    if config.SAVE_GENERATED_IMAGES:
+        name = get_output_store().put(image_bytes, config.IMAGE_FORMAT.lower())
+    if not inline and name:
+        return name, None
+    return name, f"data:image/{config.IMAGE_FORMAT.lower()};base64,{base64.b64encode(image_bytes).decode()}"
+
+
+def _save_generation_result(user, uid, results, image_prompt, gen_params, chat_entry_id, conversation_id,
+                            inline=False, reserved=False):
+    """
+    Save the generated (or cached) images, record them in chat history and count them against the user's quota
+
+    reserved means the quota was already taken when the job was submitted.
+
+    results holds one (encoding, cached_path) pair per candidate (see _generate_images);
+    all candidates share one ChatHistory entry whose image_path is the first candidate.
+    Files are named by content hash in the output store; filenames in the response are
+    only suggested download names. Images are returned as /outputs URLs, plus data URIs
+    when inline is set.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    extension = config.IMAGE_FORMAT.lower()
+    if len(results) == 1:
+        filenames = [f"logo_{timestamp}.{extension}"]
+    else:
+        filenames = [f"logo_{timestamp}_{index + 1}.{extension}" for index in range(len(results))]
+
+    if chat_entry_id:
+        entry = ChatHistory.query.get(chat_entry_id)
+        if entry and entry.user_id == user.id:
+            entry.image_prompt = image_prompt
+        else:
+            entry = ChatHistory(
+                user_id=user.id,
+                user_message="Generated image",
+                ai_response="Image",
+                image_prompt=image_prompt,
+                message_type='image',
+                conversation_id=conversation_id  # ✅ Add conversation_id
+            )
+            db.session.add(entry)
+    else:
+        entry = ChatHistory(
+            user_id=user.id,
+            user_message="Generated image",
+            ai_response="Image",
+            image_prompt=image_prompt,
+            message_type='image',
+            conversation_id=conversation_id  # ✅ Add conversation_id
+        )
+        db.session.add(entry)
+
+    if reserved:
+        old_count = user.prompt_count - _quota_cost(user, gen_params)
+    else:
+        old_count = user.prompt_count
+        user.prompt_count += _quota_cost(user, gen_params)
+
+    # Encoding ran on the encoder pool while the history entry was prepared
+    saved = [_save_image(encoding, cached_path, inline) for encoding, cached_path in results]
+    names = [name for name, _ in saved]
+    images = [image for _, image in saved]
+    store = get_output_store()
+    paths = [
+        store.stored_path(name) if name else os.path.join(config.OUTPUTS_DIR, filename)
+        for name, filename in zip(names, filenames)
+    ]
+    entry.image_path = paths[0]
+    entry.candidate_paths = json.dumps(paths) if len(paths) > 1 else None
+    image_urls = [output_url(name) if name else None for name in names]
+    db.session.commit()
+    for name in names:
+        if name:
+            get_rendition_store().submit(name)
+    
+    # Clear the reference image after successful generation to save memory
+    if uid in user_reference_images:
+        del user_reference_images[uid]
+
+    # Build metadata with LoRA info if used
+    metadata = {
+        'model': config.BASE_MODEL_ID,
+        'steps': gen_params.get('num_steps', config.DEFAULT_GENERATION_PARAMS['num_inference_steps']),
+        'dimensions': f"{gen_params.get('width', 1024)}x{gen_params.get('height', 1024)}",
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    
+    # Add LoRA info if used
+    if gen_params.get('use_lora') and gen_params.get('lora_filename'):
+        metadata['lora'] = gen_params.get('lora_filename')
+        metadata['model'] = f"{config.BASE_MODEL_ID} + LoRA"
+    
+    # Add FLUX Redux info if used
+    if gen_params.get('use_ip_adapter'):
+        metadata['redux_scale'] = gen_params.get('ip_adapter_scale', 0.5)
+        metadata['image_conditioning'] = 'FLUX Redux'
+    
+    if gen_params.get('seed') is not None:
+        metadata['seed'] = gen_params['seed']
+        metadata['cached'] = all(cached_path is not None for _, cached_path in results)
+    
+    response = {
+        'success': True,
+        'image_url': image_urls[0],
+        'thumbnail_url': thumbnail_url(names[0]) if names[0] else None,
+        'filename': filenames[0],
+        'remaining_prompts': None if user.is_pro else (5 - user.prompt_count),
+        'metadata': metadata,
+        'debug': {'old_count': old_count, 'new_count': user.prompt_count}
+    }
+    if images[0] is not None:
+        response['image'] = images[0]
+    if len(results) > 1:
+        response['candidates'] = []
+        for index, (image, image_url, filename) in enumerate(zip(images, image_urls, filenames)):
+            candidate = {'image_url': image_url, 'filename': filename, 'seed': gen_params['seed'] + index}
+            if image is not None:
+                candidate['image'] = image
+            response['candidates'].append(candidate)
+    return response
+
+
 @generate_bp.route('/api/generate-from-chat', methods=['POST'])
 @verify_firebase_token
 def generate_from_chat():
@@ -33,128 +397,214 @@ def generate_from_chat():
     
     # ✅ CRITICAL: Ensure conversation_id is never None
     if not conversation_id:
-        # Generate a fallback conversation_id if somehow missing
-        import time
-        import random
-        import string
-        timestamp = int(time.time() * 1000)
-        random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=9))
-        conversation_id = f"conv_{timestamp}_{random_suffix}"
-        print(f"⚠️  Warning: No conversation_id provided, generated fallback: {conversation_id}")
+        conversation_id = _fallback_conversation_id()
 
     uid = request.firebase_user['uid']
-    user = User.query.filter_by(firebase_uid=uid).with_for_update().first()
+    user = User.query.filter_by(firebase_uid=uid).first()
     if not user:
         return jsonify({'success': False, 'error': 'User not found'}), 404
 
-    check_and_reset_daily_limit(user)
-    if not user.is_pro and user.prompt_count >= 5:
-        return jsonify({'success': False, 'error': 'Limit reached', 'remaining_prompts': 0}), 403
+    user, gen_params, cost, error = _reserve_quota(user, data, uid)
+    if error:
+        return error
+    user_id = user.id
 
     try:
-        # Check if user has a stored reference image from web search
-        reference_image = user_reference_images.get(uid)
-        use_ip_adapter_auto = reference_image is not None
-        ip_adapter_scale_auto = 0.6 if reference_image else 0.5  # Higher influence for web references
+        # Generate image with explicit parameters only; the scheduler may batch it
+        # with concurrent requests that share size, steps and LoRA
+        results = _generate_images(image_prompt, gen_params, priority_class=priority_class_for(user))
         
-        # Extract only the parameters needed for generation
-        gen_params = {
-            'use_lora': data.get('use_lora', False),
-            'lora_filename': data.get('lora_filename'),
-            'num_steps': data.get('num_steps'),
-            'width': data.get('width'),
-            'height': data.get('height'),
-            'use_ip_adapter': data.get('use_ip_adapter', False) or use_ip_adapter_auto,
-            'ip_adapter_scale': ip_adapter_scale_auto if reference_image else data.get('ip_adapter_scale', 0.5),
-            'reference_image': reference_image if reference_image else data.get('reference_image')
-        }
-        
-        # Remove None values
-        gen_params = {k: v for k, v in gen_params.items() if v is not None}
-        
-        # Generate image with explicit parameters only
-        image = model_manager.generate_image(prompt=image_prompt, **gen_params)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"logo_{timestamp}.{config.IMAGE_FORMAT.lower()}"
-        path = os.path.join(config.OUTPUTS_DIR, filename)
-        if config.SAVE_GENERATED_IMAGES:
-            image.save(path, format=config.IMAGE_FORMAT)
-
-        buffered = io.BytesIO()
-        image.save(buffered, format=config.IMAGE_FORMAT)
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-
-        if chat_entry_id:
-            entry = ChatHistory.query.get(chat_entry_id)
-            if entry and entry.user_id == user.id:
-                entry.image_path = path
-                entry.image_prompt = image_prompt
-            else:
-                entry = ChatHistory(
-                    user_id=user.id,
-                    user_message="Generated image",
-                    ai_response="Image",
-                    image_path=path,
-                    image_prompt=image_prompt,
-                    message_type='image',
-                    conversation_id=conversation_id  # ✅ Add conversation_id
-                )
-                db.session.add(entry)
-        else:
-            entry = ChatHistory(
-                user_id=user.id,
-                user_message="Generated image",
-                ai_response="Image",
-                image_path=path,
-                image_prompt=image_prompt,
-                message_type='image',
-                conversation_id=conversation_id  # ✅ Add conversation_id
-            )
-            db.session.add(entry)
-
-        old_count = user.prompt_count
-        user.prompt_count += 1
-        db.session.commit()
-        
-        # Clear the reference image after successful generation to save memory
-        if uid in user_reference_images:
-            del user_reference_images[uid]
-
-        # Build metadata with LoRA info if used
-        metadata = {
-            'model': config.BASE_MODEL_ID,
-            'steps': gen_params.get('num_steps', config.DEFAULT_GENERATION_PARAMS['num_inference_steps']),
-            'dimensions': f"{gen_params.get('width', 1024)}x{gen_params.get('height', 1024)}",
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Add LoRA info if used
-        if gen_params.get('use_lora') and gen_params.get('lora_filename'):
-            metadata['lora'] = gen_params.get('lora_filename')
-            metadata['model'] = f"{config.BASE_MODEL_ID} + LoRA"
-        
-        # Add FLUX Redux info if used
-        if gen_params.get('use_ip_adapter'):
-            metadata['redux_scale'] = gen_params.get('ip_adapter_scale', 0.5)
-            metadata['image_conditioning'] = 'FLUX Redux'
-        
-        return jsonify({
-            'success': True,
-            'image': f"data:image/{config.IMAGE_FORMAT.lower()};base64,{img_str}",
-            'filename': filename,
-            'remaining_prompts': None if user.is_pro else (5 - user.prompt_count),
-            'metadata': metadata,
-            'debug': {'old_count': old_count, 'new_count': user.prompt_count}
-        })
+        return jsonify(_save_generation_result(
+            user, uid, results, image_prompt, gen_params, chat_entry_id, conversation_id,
+            inline=bool(data.get('inline_image')), reserved=True
+        ))
 
+    except GenerationQueueFull as e:
+        db.session.rollback()
+        _refund_quota(user_id, cost)
+        return _queue_full_response(e)
     except Exception as e:
         db.session.rollback()
+        _refund_quota(user_id, cost)
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@generate_bp.route('/outputs/<filename>')
+@generate_bp.route('/api/generate-jobs', methods=['POST'])
+@verify_firebase_token
+def create_generation_job():
+    """Queue a generation job and return its id immediately."""
+    data = request.json or {}
+    image_prompt = data.get('image_prompt', '').strip()
+    chat_entry_id = data.get('chat_entry_id')
+    conversation_id = data.get('conversation_id') or _fallback_conversation_id()
+
+    if not image_prompt:
+        return jsonify({'success': False, 'error': 'Prompt required'}), 400
+
+    uid = request.firebase_user['uid']
+    user = User.query.filter_by(firebase_uid=uid).first()
+    if not user:
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+
+    # The reservation is refunded if the job produces no images
+    user, gen_params, cost, error = _reserve_quota(user, data, uid)
+    if error:
+        return error
+    inline = bool(data.get('inline_image'))
+    preview_params = None
+    if data.get('preview'):
+        # The preview and the full render must share a seed to show the same concept
+        if gen_params.get('seed') is None:
+            gen_params['seed'] = random.randrange(2 ** 32)
+        preview_params = _preview_params(gen_params)
+    total_steps = gen_params.get('num_steps', config.DEFAULT_GENERATION_PARAMS['num_inference_steps'])
+    app = current_app._get_current_object()
+    user_id = user.id
+    priority_class = priority_class_for(user)
+
+    def run(job):
+        result_cache = get_result_cache()
+        if preview_params and not (
+            result_cache.enabled and result_cache.get(result_cache.make_key(image_prompt, gen_params['seed'], gen_params))
+        ):
+            job.update(stage='preview')
+            preview = get_inference_backend().generate(
+                image_prompt, progress_callback=job.report_progress,
+                cancel_token=job.cancel_token, priority_class=priority_class, **preview_params
+            )
+            # The client can reject the concept now (DELETE) before the full render finishes
+            job.update(stage='final', preview=_encode_preview(preview), step=0, total_steps=total_steps)
+
+        results = _generate_images(
+            image_prompt, gen_params, progress_callback=job.report_progress,
+            cancel_token=job.cancel_token, priority_class=priority_class
+        )
+        # Worker threads have no request context; save the result under the app context
+        with app.app_context():
+            try:
+                # The quota was reserved at submit, so saving needs no row lock
+                job_user = User.query.filter_by(id=user_id).first()
+                return _save_generation_result(
+                    job_user, uid, results, image_prompt, gen_params, chat_entry_id, conversation_id,
+                    inline=inline, reserved=True
+                )
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def refund(job):
+        with app.app_context():
+            _refund_quota(user_id, cost)
+
+    try:
+        job = get_job_manager().submit(uid, total_steps, run, priority_class=priority_class, on_abort=refund)
+    except GenerationQueueFull as e:
+        _refund_quota(user_id, cost)
+        return _queue_full_response(e)
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+
+
+def _get_user_job(job_id):
+    """Look up a job owned by the authenticated user"""
+    job = get_job_manager().get(job_id)
+    if job is None or job.owner_uid != request.firebase_user['uid']:
+        return None
+    job.last_seen = time.time()
+    return job
+
+
+@generate_bp.route('/api/generate-jobs/<job_id>', methods=['GET'])
+@verify_firebase_token
+def get_generation_job(job_id):
+    """Poll the state of a generation job."""
+    job = _get_user_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
+@generate_bp.route('/api/generate-jobs/<job_id>/events', methods=['GET'])
+@verify_firebase_token
+def stream_generation_job(job_id):
+    """Stream job state changes as server-sent events until the job finishes."""
+    job = _get_user_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    def events():
+        version = -1
+        try:
+            while True:
+                current = job.wait_for_update(version, timeout=config.GENERATION_SSE_KEEPALIVE_SECONDS)
+                if current == version:
+                    # Comment line keeps proxies from closing an idle stream, and its
+                    # failing write is how a disconnected client gets noticed
+                    yield ": keep-alive\n\n"
+                    continue
+                version = current
+                yield f"data: {json.dumps(job.to_dict())}\n\n"
+                if job.finished:
+                    break
+        finally:
+            # The client went away mid-job: cancel unless it comes back (e.g. falls back to polling)
+            if not job.finished:
+                get_job_manager().cancel_if_abandoned(job)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@generate_bp.route('/api/generate-jobs/<job_id>', methods=['DELETE'])
+@verify_firebase_token
+def cancel_generation_job(job_id):
+    """Cancel a queued or running generation job; it stops within one denoising step."""
+    job = _get_user_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if not job.cancel("cancelled by user"):
+        return jsonify({'success': False, 'error': 'Job already finished', 'job': job.to_dict()}), 409
+    return jsonify({'success': True, 'job': job.to_dict()}), 202
+
+
+@generate_bp.route('/outputs/<path:filename>')
 def serve_output(filename):
-    return send_from_directory(config.OUTPUTS_DIR, filename)
\ No newline at end of file
+    """
+    Serve an output image in the best rendition the client accepts
+
+    ?size=<px> asks for a thumbnail, ?original=1 for the lossless master (downloads).
+    Content-addressed files never change, so they get a strong ETag and an immutable
+    Cache-Control; conditional and Range requests are answered by send_file. Legacy
+    flat files (logo_<timestamp>.png) are served as before.
+    """
+    digest = content_hash(filename)
+    store = get_output_store()
+    if digest and store.backend != "local":
+        return redirect(store.url(filename))
+
+    renditions = get_rendition_store()
+    if request.args.get('original'):
+        name = filename
+    else:
+        name = renditions.negotiate(
+            filename, request.accept_mimetypes, size=request.args.get('size', type=int)
+        )
+    if not digest:
+        response = send_from_directory(config.OUTPUTS_DIR, name)
+    elif name != filename or request.args.get('original') or not renditions.enabled:
+        # The ETag names the exact bytes: the master's hash, or the rendition derived from it
+        etag = digest if name == filename else os.path.basename(name)
+        response = send_from_directory(
+            config.OUTPUTS_DIR, name, etag=etag, max_age=config.OUTPUT_CACHE_MAX_AGE
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # Master served while its renditions may still be rendering: cache briefly only
+        response = send_from_directory(config.OUTPUTS_DIR, name, etag=digest, max_age=60)
+    if not request.args.get('original'):
+        response.vary.add('Accept')
+    return response
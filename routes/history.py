@@ -4,11 +4,29 @@ from models.db import db
 from models.user import User
 from models.chat_history import ChatHistory
 from utils.firebase_auth import verify_firebase_token, get_request_uid
+from utils.renditions import output_url, thumbnail_url
 from sqlalchemy import func
+import json
 
 history_bp = Blueprint('history', __name__)
 
 
+def _candidate_paths(entry):
+    """Paths of all candidates recorded under an image entry ([image_path] for single images)"""
+    if entry.candidate_paths:
+        return json.loads(entry.candidate_paths)
+    return [entry.image_path] if entry.image_path else []
+
+
+def _image_urls(entry):
+    """Image URLs of an entry (stored paths may be sharded), with thumbnails so history views need not load full-size files"""
+    return {
+        'image_url': output_url(entry.image_path),
+        'thumbnail_url': thumbnail_url(entry.image_path),
+        'candidate_thumbnail_urls': [thumbnail_url(path) for path in _candidate_paths(entry)],
+    }
+
+
 @history_bp.route('/api/history', methods=['GET'])
 @verify_firebase_token
 def get_history():
@@ -80,7 +98,9 @@ def get_conversation(conversation_id):
         if msg.message_type == 'image':
             item.update({
                 'image_prompt': msg.image_prompt,
-                'image_path': msg.image_path
+                'image_path': msg.image_path,
+                'candidate_paths': _candidate_paths(msg),
+                **_image_urls(msg)
             })
         conversation_data.append(item)
     
@@ -168,7 +188,9 @@ def search_history():
         if e.message_type == 'image':
             item.update({
                 'image_prompt': e.image_prompt,
-                'image_path': e.image_path
+                'image_path': e.image_path,
+                'candidate_paths': _candidate_paths(e),
+                **_image_urls(e)
             })
         history.append(item)
     
@@ -230,6 +252,8 @@ def export_history():
             'prompt': e.prompt,
             'image_prompt': e.image_prompt,
             'image_path': e.image_path,
+            'candidate_paths': _candidate_paths(e),
+            **(_image_urls(e) if e.message_type == 'image' else {}),
             'message_type': e.message_type,
             'timestamp': e.created_at.isoformat() if e.created_at else None
         }
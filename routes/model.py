@@ -1,21 +1,31 @@
 # routes/model.py
 from flask import Blueprint, jsonify
-from utils.model_manager import ModelManager
+from utils.inference_client import get_inference_backend
+from utils.result_cache import get_result_cache
+from utils.image_encoder import get_image_encoder
+from utils.renditions import get_rendition_store
+from utils.output_gc import get_output_gc
+from utils.mistral_client import get_mistral_client
+from utils.turn_cache import get_turn_cache_stats
 
 model_bp = Blueprint('model', __name__, url_prefix='/api/model')
 
-# Global instance – shared across requests
-model_manager = ModelManager()
-
 
 @model_bp.route('/status', methods=['GET'])
 def model_status():
     """Return info about the loaded diffusion model."""
     try:
-        info = model_manager.get_model_info()
+        backend = get_inference_backend()
         return jsonify({
             'success': True,
-            'model': info
+            'model': backend.get_model_info(),
+            'scheduler': backend.get_scheduler_stats(),
+            'result_cache': get_result_cache().get_stats(),
+            'image_encoder': get_image_encoder().get_stats(),
+            'renditions': get_rendition_store().get_stats(),
+            'output_gc': get_output_gc().get_stats() if get_output_gc() else {'enabled': False},
+            'mistral': get_mistral_client().get_stats(),
+            'turn_caches': get_turn_cache_stats()
         })
     except Exception as e:
         return jsonify({
@@ -28,16 +38,32 @@ def model_status():
 def list_loras():
     """List all available LoRA files and the currently active one."""
     try:
-        loras = model_manager.get_available_loras()
-        current = model_manager.current_lora
+        lora_info = get_inference_backend().get_lora_info()
+        loras = lora_info['loras']
+        current = lora_info['current_lora']
         return jsonify({
             'success': True,
             'loras': loras,
             'current_lora': current,
-            'count': len(loras)
+            'count': len(loras),
+            'cache': lora_info['cache']
         })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@model_bp.route('/ready', methods=['GET'])
+def model_ready():
+    """Readiness probe: 200 once the engine is warm, 503 while warming up or after a failed warm-up."""
+    try:
+        readiness = get_inference_backend().get_readiness()
+        return jsonify({'success': True, **readiness}), 200 if readiness['ready'] else 503
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'ready': False,
+            'error': str(e)
+        }), 503
\ No newline at end of file
@@ -9,7 +9,9 @@ let currentSettings = {
     height: 1024,
     use_ip_adapter: false,
     ip_adapter_scale: 0.5,
-    reference_image: null
+    reference_image: null,
+    num_candidates: 1,
+    preview: true  // Show a quick low-resolution preview before the full render
 };
 
 let conversationHistory = [];
@@ -18,6 +20,7 @@ let availableLoras = [];
 let useWebSearch = false; // Web search toggle state
 let currentConversationId = null;
 let activeConversationState = null;
+let activeGenerationJob = null; // { id, authHeaders } of the generation job in progress
 
 // Generate new conversation ID
 function generateConversationId() {
@@ -136,6 +139,9 @@ function usePrompt(button) {
 
 // New chat
 function newChat() {
+    // The previous conversation's image is no longer wanted
+    cancelActiveGeneration();
+    
     // Save current conversation state before clearing
     if (currentConversationId && document.getElementById('messages').innerHTML.trim() !== '') {
         saveCurrentConversationState();
@@ -260,26 +266,19 @@ async function sendMessage() {
                 const generatingIndicator = addGeneratingIndicator();
 
                 try {
-                    const generateResponse = await fetch('/api/generate-from-chat', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                            ...authHeaders
-                        },
-                        body: JSON.stringify({
-                            image_prompt: chatData.image_prompt,
-                            conversation_id: currentConversationId,
-                            use_lora: currentSettings.use_lora,
-                            lora_filename: currentSettings.lora_filename,
-                            num_steps: currentSettings.num_steps,
-                            width: currentSettings.width,
-                            height: currentSettings.height,
-                            use_ip_adapter: currentSettings.use_ip_adapter,
-                            ip_adapter_scale: currentSettings.ip_adapter_scale
-                        })
-                    });
-
-                    const generateData = await generateResponse.json();
+                    const generateData = await runGenerationJob({
+                        image_prompt: chatData.image_prompt,
+                        conversation_id: currentConversationId,
+                        use_lora: currentSettings.use_lora,
+                        lora_filename: currentSettings.lora_filename,
+                        num_steps: currentSettings.num_steps,
+                        width: currentSettings.width,
+                        height: currentSettings.height,
+                        use_ip_adapter: currentSettings.use_ip_adapter,
+                        ip_adapter_scale: currentSettings.ip_adapter_scale,
+                        num_candidates: currentSettings.num_candidates,
+                        preview: currentSettings.preview
+                    }, authHeaders);
                     removeGeneratingIndicator();
 
                     if (generateData.success) {
@@ -303,9 +302,14 @@ async function sendMessage() {
                                         </div>
                                     </details>
                                 </div>
+                                ${generateData.candidates ? candidateGridHtml(generateData.candidates.map(candidate => ({
+                                    src: candidate.image || candidate.image_url,
+                                    filename: candidate.filename
+                                }))) : `
                                 <div class="message-image">
-                                    <img src="${generateData.image}" alt="Generated logo">
+                                    <img src="${generateData.image || generateData.image_url}" alt="Generated logo">
                                 </div>
+                                `}
                                 <div class="message-metadata">
                                     <div class="metadata-row">
                                         <span class="metadata-label">Model:</span>
@@ -335,7 +339,7 @@ async function sendMessage() {
                                         <span class="metadata-label">Generated:</span>
                                         <span>${generateData.metadata.timestamp}</span>
                                     </div>
-                                    <button class="download-btn" onclick="downloadImage('${generateData.image}', '${generateData.filename}')">
+                                    <button class="download-btn" onclick="downloadImage('${generateData.image || generateData.image_url}', '${generateData.filename}')">
                                         Download
                                     </button>
                                 </div>
@@ -351,7 +355,7 @@ async function sendMessage() {
                         // Reload history to show updated conversation
                         await loadHistory();
                         await updateUserInfo();
-                    } else {
+                    } else if (!generateData.cancelled) {
                         addErrorMessage(generateData.error || 'Failed to generate image.');
                     }
                 } catch (genError) {
@@ -407,6 +411,167 @@ async function sendMessage() {
         focusInput();
     }
 }
+// Run an image generation as a background job and wait for its result
+async function runGenerationJob(body, authHeaders) {
+    const submitResponse = await fetch('/api/generate-jobs', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            ...authHeaders
+        },
+        body: JSON.stringify(body)
+    });
+    const submitData = await submitResponse.json();
+    if (!submitData.success) {
+        return submitData;
+    }
+
+    const jobId = submitData.job_id;
+    activeGenerationJob = { id: jobId, authHeaders };
+    let job = null;
+    try {
+        try {
+            job = await streamGenerationJob(jobId, authHeaders);
+        } catch (streamError) {
+            console.warn('Progress stream unavailable, falling back to polling:', streamError);
+        }
+
+        // Poll if the stream was cut off (e.g. by a proxy) before the job finished
+        while (!job || !['done', 'failed', 'cancelled'].includes(job.status)) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const pollResponse = await fetch(`/api/generate-jobs/${jobId}`, { headers: authHeaders });
+            const pollData = await pollResponse.json();
+            if (!pollData.success) {
+                return pollData;
+            }
+            job = pollData.job;
+            updateGeneratingProgress(job);
+        }
+    } finally {
+        if (activeGenerationJob && activeGenerationJob.id === jobId) {
+            activeGenerationJob = null;
+        }
+    }
+
+    if (job.status === 'cancelled') {
+        return { success: false, cancelled: true, error: job.error };
+    }
+    if (job.status === 'failed') {
+        return { success: false, error: job.error };
+    }
+    return job.result;
+}
+
+// Stop the generation in progress so it frees the GPU within one step
+function cancelActiveGeneration(keepalive = false) {
+    if (!activeGenerationJob) return;
+    const { id, authHeaders } = activeGenerationJob;
+    activeGenerationJob = null;
+    // keepalive lets the request outlive the page when the tab is closing
+    fetch(`/api/generate-jobs/${id}`, { method: 'DELETE', headers: authHeaders, keepalive })
+        .catch(error => console.warn('Could not cancel generation:', error));
+}
+
+window.addEventListener('pagehide', () => cancelActiveGeneration(true));
+
+// Read the job's server-sent events through fetch so the auth header is sent
+async function streamGenerationJob(jobId, authHeaders) {
+    const response = await fetch(`/api/generate-jobs/${jobId}/events`, { headers: authHeaders });
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let job = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+            const dataLines = event.split('\n').filter(line => line.startsWith('data: '));
+            if (dataLines.length === 0) continue;
+            job = JSON.parse(dataLines.map(line => line.slice(6)).join('\n'));
+            updateGeneratingProgress(job);
+        }
+    }
+
+    return job;
+}
+
+// Show the job's real state in the generating indicator
+function updateGeneratingProgress(job) {
+    const textElement = document.querySelector('#generatingIndicator .generating-text');
+    if (!textElement || !job) return;
+
+    // Replacing the text also removes the dots span, which stops the dots animation
+    if (job.status === 'queued') {
+        textElement.textContent = 'Waiting for a free generator...';
+    } else if (job.status === 'running' && job.stage === 'preview') {
+        textElement.textContent = job.step > 0
+            ? `Sketching a preview (step ${job.step}/${job.total_steps})`
+            : 'Sketching a preview...';
+    } else if (job.status === 'running' && job.stage === 'final') {
+        textElement.textContent = job.step > 0
+            ? `Rendering full resolution (step ${job.step}/${job.total_steps})`
+            : 'Rendering full resolution...';
+    } else if (job.status === 'running' && job.step > 0) {
+        textElement.textContent = `Generating your logo (step ${job.step}/${job.total_steps})`;
+    }
+
+    if (job.preview) {
+        showGenerationPreview(job.preview);
+    }
+}
+
+// Show the low-resolution preview while the full render continues; discarding it cancels the job
+function showGenerationPreview(previewUrl) {
+    const content = document.querySelector('#generatingIndicator .message-content');
+    if (!content || content.querySelector('.generating-preview')) return;
+
+    const previewDiv = document.createElement('div');
+    previewDiv.className = 'generating-preview';
+    previewDiv.innerHTML = `
+        <img src="${previewUrl}" alt="Logo preview">
+        <button type="button" class="generating-preview-discard">Discard</button>
+    `;
+    previewDiv.querySelector('button').addEventListener('click', () => {
+        cancelActiveGeneration();
+        const textElement = document.querySelector('#generatingIndicator .generating-text');
+        if (textElement) textElement.textContent = 'Discarding...';
+    });
+    content.appendChild(previewDiv);
+    scrollToBottom();
+}
+
+// Grid of the candidates produced by one num_candidates request, each with its own download button
+function candidateGridHtml(candidates) {
+    return `
+        <div class="message-image candidate-grid">
+            ${candidates.map((candidate, index) => `
+                <div class="candidate">
+                    <img src="${candidate.src}" alt="Generated logo candidate ${index + 1}">
+                    <button class="download-btn" onclick="downloadImage('${candidate.src}', '${candidate.filename}')">
+                        Download #${index + 1}
+                    </button>
+                </div>
+            `).join('')}
+        </div>
+    `;
+}
+
+// Candidate for a /outputs thumbnail URL returned by the history API
+function outputImage(url) {
+    const filename = url.split('?')[0].split('/').pop();
+    return { src: url, filename };
+}
+
 // Add message to chat
 function addMessage(role, text, imageUrl = null, metadata = null, filename = null) {
     const messages = document.getElementById('messages');
@@ -639,7 +804,8 @@ function addErrorMessage(errorText) {
 // Download image
 function downloadImage(dataUrl, filename) {
     const link = document.createElement('a');
-    link.href = dataUrl;
+    // Output URLs negotiate WebP/AVIF or thumbnails; downloads get the lossless master
+    link.href = dataUrl.startsWith('/outputs/') ? `${dataUrl.split('?')[0]}?original=1` : dataUrl;
     link.download = filename;
     document.body.appendChild(link);
     link.click();
@@ -704,10 +870,13 @@ function toggleSettings() {
         if (stepsSlider) stepsSlider.value = currentSettings.num_steps;
         if (widthSlider) widthSlider.value = currentSettings.width;
         if (heightSlider) heightSlider.value = currentSettings.height;
+        const candidatesSlider = document.getElementById('candidatesSlider');
+        if (candidatesSlider) candidatesSlider.value = currentSettings.num_candidates;
 
         updateStepsValue(currentSettings.num_steps);
         updateWidthValue(currentSettings.width);
         updateHeightValue(currentSettings.height);
+        updateCandidatesValue(currentSettings.num_candidates);
 
         // Populate profile fields if available
         const fnameEl = document.getElementById('fnameInput');
@@ -741,6 +910,11 @@ function updateHeightValue(value) {
     currentSettings.height = parseInt(value);
 }
 
+function updateCandidatesValue(value) {
+    document.getElementById('candidatesValue').textContent = value;
+    currentSettings.num_candidates = parseInt(value);
+}
+
 function updateIpAdapterScale(value) {
     document.getElementById('ipAdapterScaleValueInline').textContent = value;
     currentSettings.ip_adapter_scale = parseFloat(value) / 100;
@@ -930,8 +1104,7 @@ async function loadConversation(conversationId) {
                 
                 // Show image if exists
                 if (msg.image_path && msg.message_type === 'image') {
-                    const imageName = msg.image_path.split('/').pop() || msg.image_path.split('\\').pop();
-                    const imageUrl = `/outputs/${imageName}`;
+                    const imageUrl = msg.image_url;
                     const fullPrompt = msg.image_prompt || '[No refined prompt available]';
                     
                     const messages = document.getElementById('messages');
@@ -952,10 +1125,12 @@ async function loadConversation(conversationId) {
                                     </div>
                                 </details>
                             </div>
+                            ${((msg.candidate_paths || []).length > 1) ? candidateGridHtml(msg.candidate_thumbnail_urls.map(outputImage)) : `
                             <div class="message-image">
                                 <img src="${imageUrl}" alt="Generated logo" 
                                     onerror="this.parentElement.innerHTML='<p style=\\'color: var(--text-secondary); padding: 20px; text-align: center;\\'>Image not found</p>'">
                             </div>
+                            `}
                             <div class="message-metadata">
                                 <div class="metadata-row">
                                     <span class="metadata-label">Generated:</span>
@@ -1043,8 +1218,7 @@ async function viewHistoryItem(historyId) {
 
             // 3. Show the generated image using the SAME structure as sendMessage()
             if (item.image_path && item.message_type === 'image') {
-                const imageName = item.image_path.split('/').pop() || item.image_path.split('\\').pop();
-                const imageUrl = `/outputs/${imageName}`;
+                const imageUrl = item.image_url;
                 const fullPrompt = item.image_prompt || '[No refined prompt available]';
                 
                 // Use the same format as in sendMessage() for consistency
@@ -1066,10 +1240,12 @@ async function viewHistoryItem(historyId) {
                                 </div>
                             </details>
                         </div>
+                        ${((item.candidate_paths || []).length > 1) ? candidateGridHtml(item.candidate_thumbnail_urls.map(outputImage)) : `
                         <div class="message-image">
                             <img src="${imageUrl}" alt="Generated logo" 
                                 onerror="this.parentElement.innerHTML='<p style=\\'color: var(--text-secondary); padding: 20px; text-align: center;\\'>Image not found</p>'">
                         </div>
+                        `}
                         <div class="message-metadata">
                             <div class="metadata-row">
                                 <span class="metadata-label">Generated:</span>
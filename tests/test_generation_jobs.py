@@ -0,0 +1,80 @@
+"""
+Tests for the generation job manager's fair-share scheduling
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.generation_jobs import GenerationJobManager
+from utils.priority import FREE, PRO, class_settings
+
+
+class FairShareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.started = []
+        self.started_lock = threading.Lock()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def _job(self, name, gate=None):
+        """run() that records its start order, then waits on gate (if any)"""
+        def run(job):
+            with self.started_lock:
+                self.started.append(name)
+            if gate is not None:
+                gate.wait(5)
+            return name
+        return run
+
+    def _wait_finished(self, jobs):
+        for job in jobs:
+            for _ in range(500):
+                if job.finished:
+                    break
+                threading.Event().wait(0.01)
+            self.assertTrue(job.finished, f"job {job.id} did not finish")
+
+    def test_free_job_runs_while_pro_jobs_are_queued(self):
+        manager = GenerationJobManager(max_workers=1)
+        # Occupy the only worker so the rest queue up
+        first = manager.submit("pro-user", 1, self._job("pro-0", self.release), priority_class=PRO)
+        pro_jobs = [
+            manager.submit("pro-user", 1, self._job(f"pro-{i}"), priority_class=PRO)
+            for i in range(1, 9)
+        ]
+        free_job = manager.submit("free-user", 1, self._job("free"), priority_class=FREE)
+        self.release.set()
+        self._wait_finished([first, free_job] + pro_jobs)
+
+        # Strict priority would run all eight queued Pro jobs first
+        self.assertLess(self.started.index("free"), len(self.started) - 1)
+        weight = class_settings(PRO)["weight"]
+        self.assertLessEqual(self.started.index("free"), weight + 1)
+
+    def test_running_jobs_stay_within_max_concurrent(self):
+        limit = class_settings(FREE)["max_concurrent"]
+        manager = GenerationJobManager(max_workers=limit + 2)
+        jobs = [
+            manager.submit("free-user", 1, self._job(f"free-{i}", self.release), priority_class=FREE)
+            for i in range(limit + 1)
+        ]
+        for _ in range(100):
+            if len(self.started) >= limit:
+                break
+            threading.Event().wait(0.01)
+        threading.Event().wait(0.1)
+        self.assertEqual(len(self.started), limit)
+
+        self.release.set()
+        self._wait_finished(jobs)
+        self.assertEqual(len(self.started), limit + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
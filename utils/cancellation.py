@@ -0,0 +1,55 @@
+"""
+Generation Cancellation for Zypher AI Logo Generator
+Cancellation tokens shared between the job API, the scheduler and the diffusion step callback
+"""
+import threading
+
+
+class GenerationCancelled(Exception):
+    """Raised when a generation is aborted through its cancellation token"""
+
+
+class CancellationToken:
+    """
+    Thread-safe flag for cooperatively cancelling one generation
+
+    The diffusers step callback polls `cancelled`; callbacks registered with
+    add_callback run once, on the thread that calls cancel().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """Request cancellation. Returns False if the token was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cancellation callback failed: {e}")
+        return True
+
+    def add_callback(self, callback):
+        """Run callback() on cancellation (immediately if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise GenerationCancelled(f"Generation {self.reason}")
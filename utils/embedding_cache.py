@@ -0,0 +1,216 @@
+"""
+Embedding Cache for Zypher AI Logo Generator
+Memory-bounded LRU cache for encoder outputs (dicts of tensors) reused across generations,
+with optional spill of evicted entries to safetensors files on disk
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+# Spill subdirectories are named by a digest of the cache identity
+_IDENTITY_DIR = re.compile(r"^[0-9a-f]{16}$")
+
+
+def tensor_nbytes(value):
+    """Bytes held by a tensor or a dict of tensors (non-tensor values count as zero)"""
+    if isinstance(value, dict):
+        return sum(tensor_nbytes(v) for v in value.values())
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):
+        return value.element_size() * value.nelement()
+    return 0
+
+
+def image_content_hash(image):
+    """SHA-256 of a normalized (RGB) PIL image's pixels, independent of file format or object identity"""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    digest = hashlib.sha256()
+    digest.update(f"{image.width}x{image.height}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    LRU cache of tensor dicts, evicting least recently used entries beyond max_bytes
+
+    With spill_dir set, evicted entries are written there as safetensors files and
+    loaded back on a later miss instead of being recomputed. Spilled files survive
+    restarts, so they live in a subdirectory named after identity (the models that
+    produced them); other identities' files are removed at start-up. The spill
+    directory is kept under spill_max_bytes by deleting the least recently used files.
+    """
+
+    def __init__(self, max_bytes, spill_dir=None, identity="", spill_max_bytes=0):
+        self.max_bytes = max(int(max_bytes), 0)
+        self.spill_max_bytes = max(int(spill_max_bytes), 0)
+        self.spill_dir = None
+        self._entries = OrderedDict()  # key -> (value, nbytes), oldest first
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.spills = 0
+        self.spill_evictions = 0
+        if spill_dir:
+            self.spill_dir = os.path.join(spill_dir, hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16])
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._remove_stale_spills(spill_dir)
+            with self._lock:
+                self._spill_bytes = sum(size for _, size, _ in self._spilled_files())
+                self._trim_spilled()
+
+    def _remove_stale_spills(self, root):
+        """Delete spills of other identities (and flat files from before identities)"""
+        for entry in os.scandir(root):
+            if entry.path == self.spill_dir:
+                continue
+            try:
+                if entry.is_dir() and _IDENTITY_DIR.match(entry.name):
+                    shutil.rmtree(entry.path)
+                elif entry.is_file() and entry.name.endswith(".safetensors"):
+                    os.remove(entry.path)
+            except OSError as e:
+                print(f"⚠️ Could not remove stale embedding spill {entry.path}: {e}")
+
+    def _spilled_files(self):
+        """(path, size, mtime) of every spilled file"""
+        files = []
+        for entry in os.scandir(self.spill_dir):
+            if entry.is_file() and entry.name.endswith(".safetensors"):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _trim_spilled(self):
+        """Delete least recently used spilled files beyond spill_max_bytes (called with the lock held)"""
+        if not self.spill_max_bytes or self._spill_bytes <= self.spill_max_bytes:
+            return
+        files = sorted(self._spilled_files(), key=lambda f: f[2])
+        self._spill_bytes = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._spill_bytes <= self.spill_max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._spill_bytes -= size
+                self.spill_evictions += 1
+            except FileNotFoundError:
+                self._spill_bytes -= size
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self._load_spilled(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self.put(key, value)
+        return value
+
+    def _spill_path(self, key):
+        name = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.safetensors")
+
+    def _spill(self, key, value):
+        """Write an evicted entry to disk (called with the lock held)"""
+        if not self.spill_dir or not isinstance(value, dict):
+            return
+        try:
+            from safetensors.torch import save_file
+            tensors = {name: t.detach().to("cpu").contiguous() for name, t in value.items() if tensor_nbytes(t)}
+            if tensors:
+                path = self._spill_path(key)
+                if os.path.exists(path):
+                    self._spill_bytes -= os.path.getsize(path)
+                save_file(tensors, path)
+                self._spill_bytes += os.path.getsize(path)
+                self.spills += 1
+                self._trim_spilled()
+        except Exception as e:
+            print(f"⚠️ Could not spill embedding cache entry to disk: {e}")
+
+    def _load_spilled(self, key):
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            from safetensors.torch import load_file
+            value = load_file(path)
+            os.utime(path)  # Recently used: trimmed last
+            return value
+        except FileNotFoundError:
+            return None  # Trimmed in the meantime
+        except Exception as e:
+            print(f"⚠️ Could not load spilled embedding cache entry, removing it: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def put(self, key, value):
+        nbytes = tensor_nbytes(value)
+        if not self.enabled or nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                evicted_key, (evicted_value, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+                self._spill(evicted_key, evicted_value)
+
+    def clear(self):
+        """Drop every entry, in memory and spilled"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self.spill_dir:
+                for path, _, _ in self._spilled_files():
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._spill_bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "memory_mb": round(self._bytes / (1024 * 1024), 2),
+                "max_memory_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "spills": self.spills,
+                "spill_mb": round(self._spill_bytes / (1024 * 1024), 2),
+                "spill_evictions": self.spill_evictions,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
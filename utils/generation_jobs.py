@@ -0,0 +1,289 @@
+"""
+Generation Job Manager for Zypher AI Logo Generator
+Runs image generation in a background worker pool and tracks job progress
+"""
+import math
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import config
+from utils.cancellation import CancellationToken, GenerationCancelled
+from utils.priority import FREE, GenerationQueueFull, class_settings
+
+
+class GenerationJob:
+    """State of a single asynchronous generation job"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+    def __init__(self, owner_uid, total_steps, priority_class=FREE):
+        self.id = uuid.uuid4().hex
+        self.owner_uid = owner_uid
+        self.priority_class = priority_class
+        self.status = self.QUEUED
+        self.step = 0
+        self.total_steps = total_steps
+        self.result = None
+        self.error = None
+        self.stage = None  # 'preview' or 'final' for progressive jobs
+        self.preview = None  # Data URI of the low-resolution preview, once rendered
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # Checked at every denoising step; set by DELETE or a disconnected client
+        self.cancel_token = CancellationToken()
+        self.last_seen = self.created_at  # Last time the owner polled or streamed this job
+
+        # Bumped on every state change so SSE streams can wait for updates
+        self.version = 0
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED_STATES
+
+    def update(self, **fields):
+        """Apply state changes and wake up anything waiting on this job"""
+        with self._condition:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            self.version += 1
+            self._condition.notify_all()
+
+    def cancel(self, reason="cancelled"):
+        """Request cancellation. Returns False if the job had already finished."""
+        with self._condition:
+            if self.finished:
+                return False
+            self.cancel_token.cancel(reason)
+            if self.status == self.QUEUED:
+                # Not picked up by a worker yet; report it as cancelled right away
+                self.update(status=self.CANCELLED, error=f"Generation {reason}")
+        return True
+
+    def start(self):
+        """Move a queued job to running. Returns False if it was cancelled first."""
+        with self._condition:
+            if self.cancel_token.cancelled:
+                return False
+            self.update(status=self.RUNNING)
+            return True
+
+    def report_progress(self, step, total_steps):
+        """Pipeline step callback hook: record the latest denoising step"""
+        self.update(status=self.RUNNING, step=step, total_steps=total_steps)
+
+    def wait_for_update(self, last_version, timeout=None):
+        """Block until the job changes past last_version. Returns the current version."""
+        with self._condition:
+            if self.version == last_version and not self.finished:
+                self._condition.wait(timeout)
+            return self.version
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'priority': self.priority_class,
+            'step': self.step,
+            'total_steps': self.total_steps,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+        if self.stage:
+            data['stage'] = self.stage
+        if self.preview and self.status != self.DONE:
+            data['preview'] = self.preview
+        if self.status == self.DONE:
+            data['result'] = self.result
+        if self.status in (self.FAILED, self.CANCELLED):
+            data['error'] = self.error
+        return data
+
+
+class GenerationJobManager:
+    """
+    Owns the worker pool that runs generation jobs and the registry of their state
+
+    Jobs waiting for a worker are started by weighted fair share, with the same
+    stride scheduling as GenerationScheduler: each class has a virtual pass that
+    advances by 1 / weight per started job, and the waiting class with the lowest pass
+    goes next, so Pro gets weight-times the free share without starving free jobs.
+    A class never has more than max_concurrent running jobs, and at most
+    max_queue + max_concurrent unfinished ones.
+    """
+
+    def __init__(self, max_workers=None, job_ttl_seconds=None, abandon_grace_seconds=None):
+        self.max_workers = max_workers or config.GENERATION_JOB_WORKERS
+        self.job_ttl_seconds = job_ttl_seconds or config.GENERATION_JOB_TTL_SECONDS
+        if abandon_grace_seconds is None:
+            abandon_grace_seconds = config.GENERATION_ABANDON_GRACE_SECONDS
+        self.abandon_grace_seconds = abandon_grace_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="generation-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._waiting = {}  # Priority class -> deque of (job, run, on_abort) waiting for a worker
+        self._classes = {}  # Priority class -> {"pass": virtual pass, "running": started jobs}
+        self._virtual_time = 0.0
+        self._job_seconds = None  # Moving average of job duration, for retry-after
+
+    def submit(self, owner_uid, total_steps, run, priority_class=FREE, on_abort=None):
+        """
+        Queue a generation job
+
+        Args:
+            owner_uid (str): Firebase uid of the user who owns the job
+            total_steps (int): Number of denoising steps, for progress reporting
+            run (callable): Called as run(job) on a worker thread; returns the job result
+            priority_class (str): 'pro' or 'free' (see utils.priority)
+            on_abort (callable): Called as on_abort(job) when the job ends without a result
+                (failed, or cancelled while queued or running), e.g. to refund its quota
+
+        Returns:
+            GenerationJob: The queued job
+
+        Raises:
+            GenerationQueueFull: The class already has its maximum of unfinished jobs
+        """
+        self._prune_finished()
+        settings = class_settings(priority_class)
+        with self._lock:
+            unfinished = [job for job in self._jobs.values() if not job.finished]
+            in_class = sum(1 for job in unfinished if job.priority_class == priority_class)
+            if in_class >= settings["max_queue"] + settings["max_concurrent"]:
+                job_seconds = self._job_seconds or 30
+                raise GenerationQueueFull(
+                    priority_class, job_seconds * (math.ceil(len(unfinished) / self.max_workers) + 1)
+                )
+            job = GenerationJob(owner_uid, total_steps, priority_class)
+            self._jobs[job.id] = job
+            waiting = self._waiting.setdefault(priority_class, deque())
+            state = self._class_state(priority_class)
+            if not waiting:
+                # A class that was idle joins at the current virtual time instead of
+                # cashing in the share it did not use
+                state["pass"] = max(state["pass"], self._virtual_time)
+            waiting.append((job, run, on_abort))
+            self._dispatch()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel_if_abandoned(self, job):
+        """
+        Cancel a job whose client disconnected, unless the client looks at it again
+        within the grace period (e.g. a proxy cut the event stream and it falls back to polling)
+        """
+        disconnected_at = time.time()
+
+        def check():
+            if job.last_seen <= disconnected_at and job.cancel("abandoned by client"):
+                print(f"⚠️ Cancelled generation job {job.id}: client disconnected")
+
+        timer = threading.Timer(self.abandon_grace_seconds, check)
+        timer.daemon = True
+        timer.start()
+
+    def _class_state(self, priority_class):
+        """Virtual pass and running count of a priority class (called with the lock held)"""
+        if priority_class not in self._classes:
+            self._classes[priority_class] = {"pass": self._virtual_time, "running": 0}
+        return self._classes[priority_class]
+
+    def _pick_class(self):
+        """
+        Weighted fair share over the classes that have waiting jobs and are below their
+        max_concurrent: the lowest virtual pass goes next (called with the lock held)
+        """
+        eligible = [
+            name for name, waiting in self._waiting.items()
+            if waiting and self._class_state(name)["running"] < class_settings(name)["max_concurrent"]
+        ]
+        if not eligible:
+            return None
+        return min(eligible, key=lambda name: (self._class_state(name)["pass"], -class_settings(name)["weight"]))
+
+    def _dispatch(self):
+        """Start waiting jobs while workers and class limits allow (called with the lock held)"""
+        while sum(state["running"] for state in self._classes.values()) < self.max_workers:
+            priority_class = self._pick_class()
+            if priority_class is None:
+                return
+            job, run, on_abort = self._waiting[priority_class].popleft()
+            state = self._class_state(priority_class)
+            state["running"] += 1
+            state["pass"] += 1.0 / max(class_settings(priority_class)["weight"], 1)
+            active = [name for name, waiting in self._waiting.items() if waiting]
+            if active:
+                self._virtual_time = min(self._classes[name]["pass"] for name in active)
+            self._executor.submit(self._run, job, run, on_abort)
+
+    def _run(self, job, run, on_abort):
+        try:
+            self._execute(job, run, on_abort)
+        finally:
+            with self._lock:
+                self._class_state(job.priority_class)["running"] -= 1
+                self._dispatch()
+
+    def _execute(self, job, run, on_abort=None):
+        if not job.start():
+            # Cancelled while waiting for a worker thread
+            self._abort(job, on_abort)
+            return
+        start_time = time.monotonic()
+        try:
+            result = run(job)
+            job.update(status=GenerationJob.DONE, result=result)
+            elapsed = time.monotonic() - start_time
+            self._job_seconds = elapsed if self._job_seconds is None else 0.8 * self._job_seconds + 0.2 * elapsed
+        except GenerationCancelled as e:
+            print(f"⚠️ Generation job {job.id} {job.cancel_token.reason or 'cancelled'}")
+            self._abort(job, on_abort)
+            job.update(status=GenerationJob.CANCELLED, error=str(e))
+        except Exception as e:
+            traceback.print_exc()
+            self._abort(job, on_abort)
+            job.update(status=GenerationJob.FAILED, error=str(e))
+
+    def _abort(self, job, on_abort):
+        if on_abort is None:
+            return
+        try:
+            on_abort(job)
+        except Exception as e:
+            print(f"⚠️ Abort hook of generation job {job.id} failed: {e}")
+
+    def _prune_finished(self):
+        """Forget finished jobs older than the TTL"""
+        cutoff = time.time() - self.job_ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.updated_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+# Process-wide job manager shared by every route
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Return the shared GenerationJobManager, creating it on first use"""
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                _job_manager = GenerationJobManager()
+    return _job_manager
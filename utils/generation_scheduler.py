@@ -0,0 +1,508 @@
+"""
+Generation Scheduler for Zypher AI Logo Generator
+Collects concurrent generation requests into micro-batches in front of ModelManager
+"""
+import math
+import threading
+import time
+from concurrent.futures import CancelledError, Future, InvalidStateError, ThreadPoolExecutor
+import config
+from utils.cancellation import GenerationCancelled
+from utils.embedding_cache import image_content_hash
+from utils.priority import FREE, GenerationQueueFull, WaitTimeHistogram, class_settings
+from utils.model_manager import get_model_manager
+
+
+class GenerationRequest:
+    """A single generation request waiting in the scheduler queue"""
+
+    def __init__(self, prompt, params, progress_callback=None, cancel_token=None, priority_class=FREE):
+        self.prompt = prompt
+        # Candidates are variants of the prompt on consecutive seeds, rendered in the same call
+        self.num_images = max(int(params.pop('num_candidates', 1) or 1), 1)
+        self.params = params
+        self.progress_callback = progress_callback
+        self.cancel_token = cancel_token
+        self.priority_class = priority_class
+        self.batch_key = GenerationScheduler.make_batch_key(params)
+        # Requests in the same affinity group run back to back without LoRA or shape changes
+        self.affinity_key = self.batch_key[:5]
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+        self.enqueued_round = 0
+
+    @property
+    def cancelled(self):
+        return self.cancel_token is not None and self.cancel_token.cancelled
+
+
+class BatchCancellation:
+    """Cancellation view of a running batch: the pipeline call stops once every request in it is cancelled"""
+
+    def __init__(self, batch):
+        self.batch = batch
+
+    @property
+    def cancelled(self):
+        return all(request.cancelled for request in self.batch)
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise GenerationCancelled("Generation cancelled")
+
+
+class GenerationScheduler:
+    """
+    Micro-batching scheduler for image generation
+
+    Requests that share resolution, step count and LoRA are collected for a short
+    window and run as one batched pipeline call; the images are then fanned back
+    out to the waiting requests. A request for num_candidates images takes that
+    many slots of the batch.
+
+    Batches are picked with LoRA affinity: while requests for the group that just
+    ran (same LoRA, size and steps) are pending they go next, so adapters are not
+    toggled back and forth. A request that has waited starvation_rounds dispatches
+    is served next regardless of group.
+
+    Pro and free requests form priority classes that share dispatches by weight
+    (stride scheduling): the class with the lowest virtual pass goes next, and
+    affinity and the starvation bound apply within that class. Each class caps its
+    requests per pipeline call and its queue length; a full queue raises
+    GenerationQueueFull with a retry-after estimate instead of queueing.
+
+    When the model manager allows it (decode_stage_active), a batch's VAE decode runs
+    on a separate decode thread, so the next batch starts denoising while the previous
+    one is still being decoded. At most DECODE_BACKLOG batches wait for decoding.
+    """
+
+    DECODE_BACKLOG = 2
+
+    def __init__(self, model_manager=None, batch_window_ms=None, max_batch_size=None, starvation_rounds=None):
+        self.model_manager = model_manager or get_model_manager()
+        if batch_window_ms is None:
+            batch_window_ms = config.GENERATION_BATCH_WINDOW_MS
+        self.batch_window = max(batch_window_ms, 0) / 1000.0
+        self.max_batch_size = max(max_batch_size or config.GENERATION_MAX_BATCH_SIZE, 1)
+        self.starvation_rounds = max(starvation_rounds or config.GENERATION_STARVATION_ROUNDS, 1)
+
+        self._pending = []  # GenerationRequest objects in arrival order
+        self._condition = threading.Condition()
+        self._worker = None
+        self._round = 0  # Number of batches dispatched so far
+        self._current_group = None
+        self._batch_seconds = None  # Moving average of pipeline call duration, for retry-after
+
+        # Per priority class: virtual pass (advances by 1/weight per dispatched request) and counters
+        self._classes = {}
+        self._virtual_time = 0.0
+
+        # Decode stage: one thread, fed with latents by the scheduler thread
+        self._decode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generation-decode")
+        self._decode_slots = threading.Semaphore(self.DECODE_BACKLOG)
+        self._decodes_in_flight = 0
+
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "batched_requests": 0,  # Requests that shared a pipeline call with another
+            "largest_batch": 0,  # Most images rendered by one pipeline call
+            "failed_batches": 0,
+            "group_switches": 0,  # Dispatches whose group differs from the previous one
+            "lora_switches": 0,  # Group switches that changed the active LoRA
+            "starvation_promotions": 0,  # Dispatches forced by the starvation bound
+            "cancelled_requests": 0,  # Requests cancelled while queued or running
+            "cancelled_batches": 0,  # Pipeline calls aborted because every request was cancelled
+            "rejected_requests": 0,  # Requests shed because their class queue was full
+            "decode_overlaps": 0,  # Batches that started denoising while an earlier one was decoding
+        }
+        self.group_switch_counts = {}  # Group label -> times the scheduler switched to it
+
+    @staticmethod
+    def make_batch_key(params):
+        """Build the key that decides which requests can share a pipeline call"""
+        defaults = config.DEFAULT_GENERATION_PARAMS
+        use_lora = bool(params.get('use_lora', False))
+        reference_image = params.get('reference_image')
+        return (
+            use_lora,
+            params.get('lora_filename') if use_lora else None,
+            params.get('width', defaults['width']),
+            params.get('height', defaults['height']),
+            params.get('num_steps', params.get('num_inference_steps', defaults['num_inference_steps'])),
+            # Redux conditioning is shared by the whole batch, so only identical references batch together
+            GenerationScheduler._reference_key(reference_image),
+            params.get('ip_adapter_scale') if reference_image is not None else None,
+        )
+
+    @staticmethod
+    def _reference_key(reference_image):
+        if reference_image is None:
+            return None
+        if isinstance(reference_image, str):
+            return reference_image
+        return image_content_hash(reference_image)
+
+    def submit(self, prompt, progress_callback=None, cancel_token=None, priority_class=FREE, **params):
+        """
+        Queue a generation request
+
+        Args:
+            prompt (str): Text description of the logo to generate
+            progress_callback (callable): Optional progress_callback(step, total_steps) hook
+            cancel_token (CancellationToken): Optional token; cancelling it drops the request
+                from the queue, or fails its future right away if it is already running
+            priority_class (str): 'pro' or 'free' (see utils.priority)
+            **params: Generation parameters accepted by ModelManager.generate_image,
+                plus num_candidates (variants on seeds seed, seed + 1, ...)
+
+        Returns:
+            concurrent.futures.Future: Resolves to the generated PIL.Image, or to a
+                list of images when num_candidates > 1
+
+        Raises:
+            GenerationQueueFull: The class already has max_queue requests waiting
+        """
+        request = GenerationRequest(prompt, params, progress_callback, cancel_token, priority_class)
+        with self._condition:
+            self._ensure_worker()
+            state = self._class_state(priority_class)
+            queued = sum(1 for r in self._pending if r.priority_class == priority_class)
+            if queued >= class_settings(priority_class)["max_queue"]:
+                state["rejected"] += 1
+                self.stats["rejected_requests"] += 1
+                raise GenerationQueueFull(priority_class, self._estimate_wait())
+            if queued == 0:
+                # A class that was idle joins at the current virtual time instead of
+                # cashing in the share it did not use
+                state["pass"] = max(state["pass"], self._virtual_time)
+            request.enqueued_round = self._round
+            self._pending.append(request)
+            self.stats["requests"] += 1
+            state["submitted"] += 1
+            self._condition.notify_all()
+        if cancel_token is not None:
+            cancel_token.add_callback(lambda: self._cancel(request))
+        return request.future
+
+    def generate(self, prompt, timeout=None, progress_callback=None, cancel_token=None, priority_class=FREE, **params):
+        """Queue a generation request and block until its image is ready"""
+        future = self.submit(
+            prompt, progress_callback=progress_callback, cancel_token=cancel_token,
+            priority_class=priority_class, **params
+        )
+        try:
+            return future.result(timeout=timeout)
+        except CancelledError:
+            # Dropped from the queue before it ever reached the pipeline
+            raise GenerationCancelled(f"Generation {cancel_token.reason if cancel_token else 'cancelled'}")
+
+    def _cancel(self, request):
+        """Cancellation token callback: release the caller without waiting for the batch"""
+        with self._condition:
+            if request in self._pending:
+                self._pending.remove(request)
+                request.future.cancel()
+                self.stats["cancelled_requests"] += 1
+                return
+        # Already running: the caller stops waiting now; the pipeline call itself stops at
+        # the next denoising step once every request in its batch is cancelled
+        try:
+            request.future.set_exception(GenerationCancelled(f"Generation {request.cancel_token.reason}"))
+            self.stats["cancelled_requests"] += 1
+        except InvalidStateError:
+            pass  # Finished in the meantime
+
+    @staticmethod
+    def group_label(affinity_key):
+        """Human-readable name for an affinity group, used in stats"""
+        use_lora, lora_filename, width, height, steps = affinity_key
+        model = f"lora:{lora_filename or config.LORA_WEIGHTS_FILE}" if use_lora else "base"
+        return f"{model} {width}x{height} {steps}steps"
+
+    def _class_state(self, priority_class):
+        """Counters and virtual pass of a priority class (called with the condition held)"""
+        if priority_class not in self._classes:
+            self._classes[priority_class] = {
+                "pass": self._virtual_time,
+                "submitted": 0,
+                "dispatched": 0,
+                "rejected": 0,
+                "wait_times": WaitTimeHistogram(),
+            }
+        return self._classes[priority_class]
+
+    def _estimate_wait(self):
+        """Rough seconds until the current queue drains, for Retry-After (called with the condition held)"""
+        batch_seconds = self._batch_seconds or self.model_manager.last_generation_seconds or 10
+        return batch_seconds * (math.ceil(len(self._pending) / self.max_batch_size) + 1)
+
+    def get_stats(self):
+        """Get scheduler counters, per-group queue depth and switch counts"""
+        with self._condition:
+            stats = dict(self.stats)
+            stats["queue_depth"] = len(self._pending)
+            group_depths = {}
+            for request in self._pending:
+                label = self.group_label(request.affinity_key)
+                group_depths[label] = group_depths.get(label, 0) + 1
+            stats["group_queue_depths"] = group_depths
+            stats["group_switch_counts"] = dict(self.group_switch_counts)
+            stats["current_group"] = self.group_label(self._current_group) if self._current_group else None
+            stats["classes"] = {
+                name: {
+                    **class_settings(name),
+                    "queue_depth": sum(1 for r in self._pending if r.priority_class == name),
+                    "submitted": state["submitted"],
+                    "dispatched": state["dispatched"],
+                    "rejected": state["rejected"],
+                    "wait_times": state["wait_times"].to_dict(),
+                }
+                for name, state in self._classes.items()
+            }
+        stats["batch_window_ms"] = int(self.batch_window * 1000)
+        stats["max_batch_size"] = self.max_batch_size
+        stats["starvation_rounds"] = self.starvation_rounds
+        stats["decode_stage"] = self.model_manager.decode_stage_active
+        return stats
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+            self._worker.start()
+
+    def _pick_class(self):
+        """Weighted fair share: the pending class with the lowest virtual pass goes next"""
+        pending_classes = {r.priority_class for r in self._pending}
+        return min(
+            pending_classes,
+            key=lambda name: (self._class_state(name)["pass"], -class_settings(name)["weight"])
+        )
+
+    def _pick_first(self):
+        """Choose the request that heads the next batch (called with the condition held)"""
+        priority_class = self._pick_class()
+        candidates = [r for r in self._pending if r.priority_class == priority_class]
+
+        # Starvation bound: the oldest request that has waited too many rounds goes first
+        for request in candidates:
+            if self._round - request.enqueued_round >= self.starvation_rounds:
+                # Only count it when affinity would otherwise have picked another group
+                if request.affinity_key != self._current_group and any(
+                    r.affinity_key == self._current_group for r in candidates
+                ):
+                    self.stats["starvation_promotions"] += 1
+                return request
+
+        # LoRA affinity: keep serving the group that just ran while it has work
+        for request in candidates:
+            if request.affinity_key == self._current_group:
+                return request
+
+        return candidates[0]
+
+    @staticmethod
+    def _batch_images(batch):
+        """Number of images a batch renders in one pipeline call"""
+        return sum(request.num_images for request in batch)
+
+    def _fill_batch(self, first):
+        """Requests that can share first's pipeline call, within each class's concurrency limit"""
+        batch = [first]
+        images = first.num_images
+        per_class = {first.priority_class: 1}
+        for request in self._pending:
+            if images >= self.max_batch_size:
+                break
+            if request is first or request.batch_key != first.batch_key:
+                continue
+            if images + request.num_images > self.max_batch_size:
+                continue
+            if per_class.get(request.priority_class, 0) >= class_settings(request.priority_class)["max_concurrent"]:
+                continue
+            per_class[request.priority_class] = per_class.get(request.priority_class, 0) + 1
+            images += request.num_images
+            batch.append(request)
+        return batch
+
+    def _record_dispatch(self, batch):
+        """Advance the scheduling round and count group switches (called with the condition held)"""
+        self._round += 1
+        now = time.monotonic()
+        for request in batch:
+            state = self._class_state(request.priority_class)
+            state["pass"] += 1.0 / max(class_settings(request.priority_class)["weight"], 1)
+            state["dispatched"] += 1
+            state["wait_times"].observe(now - request.submitted_at)
+        active = {r.priority_class for r in self._pending}
+        if active:
+            self._virtual_time = min(self._classes[name]["pass"] for name in active)
+
+        group = batch[0].affinity_key
+        if group != self._current_group:
+            if self._current_group is not None:
+                self.stats["group_switches"] += 1
+                if group[:2] != self._current_group[:2]:
+                    self.stats["lora_switches"] += 1
+            label = self.group_label(group)
+            self.group_switch_counts[label] = self.group_switch_counts.get(label, 0) + 1
+            self._current_group = group
+
+    def _next_batch(self):
+        """Wait for the batching window and take the next batch off the queue"""
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+
+            first = self._pick_first()
+            deadline = first.submitted_at + self.batch_window
+            while True:
+                if first not in self._pending:
+                    # Cancelled during the window: pick again
+                    while not self._pending:
+                        self._condition.wait()
+                    first = self._pick_first()
+                    deadline = first.submitted_at + self.batch_window
+                batch = self._fill_batch(first)
+                remaining = deadline - time.monotonic()
+                if self._batch_images(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            for request in batch:
+                self._pending.remove(request)
+            self._record_dispatch(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        # Drop requests whose callers have already given up
+        batch = [r for r in batch if self._start(r.future)]
+        if not batch:
+            return
+
+        batch_images = self._batch_images(batch)
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], batch_images)
+        if len(batch) > 1:
+            self.stats["batched_requests"] += len(batch)
+        if batch_images > 1:
+            print(f"📦 Running batched generation: {len(batch)} requests, {batch_images} images")
+
+        callbacks = [r.progress_callback for r in batch if r.progress_callback is not None]
+
+        def report_progress(step, total_steps):
+            # Every request in the batch advances together
+            for callback in callbacks:
+                try:
+                    callback(step, total_steps)
+                except Exception as e:
+                    print(f"⚠️ Progress callback failed: {e}")
+
+        # Seeds are per image and do not split batches; candidate i of a request uses seed + i
+        params = dict(batch[0].params)
+        params.pop('seed', None)
+        prompts = []
+        seeds = []
+        for request in batch:
+            seed = request.params.get('seed')
+            for index in range(request.num_images):
+                prompts.append(request.prompt)
+                seeds.append(None if seed is None else seed + index)
+        if any(seed is not None for seed in seeds):
+            params['seeds'] = seeds
+
+        decode_concurrently = self.model_manager.decode_stage_active
+        generate = self.model_manager.generate_latents if decode_concurrently else self.model_manager.generate_images
+        if self._decodes_in_flight:
+            self.stats["decode_overlaps"] += 1
+        start_time = time.monotonic()
+        try:
+            result = generate(
+                prompts,
+                progress_callback=report_progress if callbacks else None,
+                cancel_token=BatchCancellation(batch),
+                **params
+            )
+        except Exception as e:
+            if isinstance(e, GenerationCancelled):
+                self.stats["cancelled_batches"] += 1
+            else:
+                self.stats["failed_batches"] += 1
+            for request in batch:
+                self._resolve(request.future, exception=e)
+            return
+
+        elapsed = time.monotonic() - start_time
+        self._batch_seconds = elapsed if self._batch_seconds is None else 0.8 * self._batch_seconds + 0.2 * elapsed
+
+        if decode_concurrently:
+            # Hand the latents to the decode thread and go back for the next batch
+            self._decode_slots.acquire()
+            with self._condition:
+                self._decodes_in_flight += 1
+            self._decode_executor.submit(self._decode_batch, batch, result)
+        else:
+            self._deliver(batch, result)
+
+    def _decode_batch(self, batch, latent_batch):
+        """Decode stage: turn a batch's latents into images and resolve its futures"""
+        try:
+            images = self.model_manager.decode_latents(latent_batch)
+        except Exception as e:
+            print(f"❌ Decoding batch failed: {e}")
+            self.stats["failed_batches"] += 1
+            for request in batch:
+                self._resolve(request.future, exception=e)
+            return
+        finally:
+            with self._condition:
+                self._decodes_in_flight -= 1
+            self._decode_slots.release()
+        self._deliver(batch, images)
+
+    def _deliver(self, batch, images):
+        """Fan a batch's images back out to its requests"""
+        offset = 0
+        for request in batch:
+            request_images = images[offset:offset + request.num_images]
+            offset += request.num_images
+            self._resolve(request.future, result=request_images if request.num_images > 1 else request_images[0])
+
+    @staticmethod
+    def _start(future):
+        """Mark a future running; False if it was cancelled or already failed by its token"""
+        try:
+            return future.set_running_or_notify_cancel()
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _resolve(future, result=None, exception=None):
+        """Complete a running future unless cancellation already failed it"""
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+
+# Process-wide scheduler shared by every route
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_generation_scheduler():
+    """Return the shared GenerationScheduler, creating it on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = GenerationScheduler()
+    return _scheduler
@@ -51,6 +51,7 @@ def migrate_chat_history_schema():
                 ('ai_response', "ALTER TABLE chat_history ADD COLUMN ai_response TEXT"),
                 ('image_prompt', "ALTER TABLE chat_history ADD COLUMN image_prompt TEXT"),
                 ('message_type', "ALTER TABLE chat_history ADD COLUMN message_type TEXT DEFAULT 'text'"),
+                ('candidate_paths', "ALTER TABLE chat_history ADD COLUMN candidate_paths TEXT"),
             ]
             
             # Add missing columns
@@ -212,7 +213,19 @@ def migrate_chat_history_schema():
                 print(f"   ✗ Composite index creation failed: {e}")
                 conn.rollback()
             
-            # 5. Verify final schema
+            # 5. Index image_path so the output GC can look up referenced files
+            try:
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_chat_history_image_path 
+                    ON chat_history(image_path)
+                """))
+                conn.commit()
+                print(f"   ✓ Created index on image_path")
+            except Exception as e:
+                print(f"   ✗ image_path index creation failed: {e}")
+                conn.rollback()
+            
+            # 6. Verify final schema
             result = conn.execute(text("PRAGMA table_info('chat_history')"))
             final_cols = [row['name'] if isinstance(row, dict) else row[1] for row in result]
             
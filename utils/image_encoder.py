@@ -0,0 +1,82 @@
+"""
+Image Encoder for Zypher AI Logo Generator
+Encodes generated images to file bytes once, on a small worker pool, so the request
+thread can do its database work meanwhile and the same bytes serve every consumer
+(output file, result cache, optional inline data URI)
+"""
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+
+class ImageEncoder:
+    """Thread pool that encodes PIL images with the configured format and PNG settings"""
+
+    def __init__(self, max_workers=None, image_format=None, png_compress_level=None, png_optimize=None):
+        self.image_format = image_format or config.IMAGE_FORMAT
+        self.png_compress_level = config.PNG_COMPRESS_LEVEL if png_compress_level is None else png_compress_level
+        self.png_optimize = config.PNG_OPTIMIZE if png_optimize is None else png_optimize
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.IMAGE_ENCODE_WORKERS, thread_name_prefix="image-encode"
+        )
+        self._lock = threading.Lock()
+        self.images = 0
+        self.total_bytes = 0
+        self.total_seconds = 0.0
+
+    def _save_options(self):
+        if self.image_format.upper() == "PNG":
+            return {"compress_level": self.png_compress_level, "optimize": self.png_optimize}
+        return {}
+
+    def encode(self, image):
+        """
+        Encode an image on the calling thread
+
+        Args:
+            image (PIL.Image): Generated image
+
+        Returns:
+            bytes: The encoded file contents
+        """
+        start_time = time.perf_counter()
+        buffered = io.BytesIO()
+        image.save(buffered, format=self.image_format, **self._save_options())
+        data = buffered.getvalue()
+        with self._lock:
+            self.images += 1
+            self.total_bytes += len(data)
+            self.total_seconds += time.perf_counter() - start_time
+        return data
+
+    def submit(self, image):
+        """Encode an image on the pool. Returns a Future resolving to the encoded bytes."""
+        return self._executor.submit(self.encode, image)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "format": self.image_format,
+                "png_compress_level": self.png_compress_level,
+                "png_optimize": self.png_optimize,
+                "images": self.images,
+                "avg_kb": round(self.total_bytes / self.images / 1024, 1) if self.images else None,
+                "avg_seconds": round(self.total_seconds / self.images, 3) if self.images else None,
+            }
+
+
+# Process-wide encoder shared by every route
+_image_encoder = None
+_image_encoder_lock = threading.Lock()
+
+
+def get_image_encoder():
+    """Return the shared ImageEncoder, creating it on first use"""
+    global _image_encoder
+    if _image_encoder is None:
+        with _image_encoder_lock:
+            if _image_encoder is None:
+                _image_encoder = ImageEncoder()
+    return _image_encoder
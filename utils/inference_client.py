@@ -0,0 +1,129 @@
+"""
+Inference Backends for Zypher AI Logo Generator
+Routes reach the diffusion engine through get_inference_backend(): either in-process,
+or through a dedicated inference server process that owns the only ModelManager
+"""
+import threading
+from multiprocessing.connection import Client
+import config
+from utils.cancellation import GenerationCancelled
+from utils.priority import GenerationQueueFull
+
+
+def parse_inference_address(address):
+    """Turn INFERENCE_SERVER_ADDRESS into a multiprocessing address ('host:port' or a unix socket path)"""
+    if ':' in address and not address.startswith('/'):
+        host, port = address.rsplit(':', 1)
+        return (host, int(port))
+    return address
+
+
+class LocalInferenceBackend:
+    """Runs generation in this process through the shared scheduler and ModelManager"""
+
+    def __init__(self):
+        # Imported here so web workers using the remote backend never load torch/diffusers
+        from utils.model_manager import get_model_manager
+        from utils.generation_scheduler import get_generation_scheduler
+        self.model_manager = get_model_manager()
+        self.scheduler = get_generation_scheduler()
+
+    def generate(self, prompt, progress_callback=None, cancel_token=None, **params):
+        return self.scheduler.generate(prompt, progress_callback=progress_callback, cancel_token=cancel_token, **params)
+
+    def get_model_info(self):
+        return self.model_manager.get_model_info()
+
+    def get_scheduler_stats(self):
+        return self.scheduler.get_stats()
+
+    def get_readiness(self):
+        return self.model_manager.get_readiness()
+
+    def start_warm_up(self):
+        self.model_manager.start_warm_up()
+
+    def get_lora_info(self):
+        return {
+            'loras': self.model_manager.get_available_loras(),
+            'current_lora': self.model_manager.current_lora,
+            'cache': self.model_manager.lora_cache.get_stats()
+        }
+
+
+class RemoteInferenceBackend:
+    """Talks to inference_server.py over a local socket; one connection per call"""
+
+    def __init__(self, address=None, authkey=None):
+        self.address = parse_inference_address(address or config.INFERENCE_SERVER_ADDRESS)
+        authkey = authkey or config.INFERENCE_SERVER_AUTHKEY
+        if not authkey:
+            raise RuntimeError("INFERENCE_SERVER_ADDRESS needs INFERENCE_SERVER_AUTHKEY (the inference server's secret)")
+        self.authkey = authkey.encode('utf-8')
+
+    # How often a waiting call checks its cancellation token
+    CANCEL_POLL_SECONDS = 0.1
+
+    def _call(self, message, progress_callback=None, cancel_token=None):
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except (ConnectionRefusedError, FileNotFoundError) as e:
+            raise RuntimeError(f"Inference server unavailable at {config.INFERENCE_SERVER_ADDRESS}: {e}")
+
+        with conn:
+            conn.send(message)
+            cancel_sent = False
+            while True:
+                if cancel_token is not None and not conn.poll(self.CANCEL_POLL_SECONDS):
+                    if cancel_token.cancelled and not cancel_sent:
+                        # The server aborts at its next denoising step and replies 'cancelled'
+                        conn.send(('cancel',))
+                        cancel_sent = True
+                    continue
+                kind, *payload = conn.recv()
+                if kind == 'progress':
+                    if progress_callback is not None:
+                        progress_callback(*payload)
+                elif kind == 'result':
+                    return payload[0]
+                elif kind == 'cancelled':
+                    raise GenerationCancelled(payload[0])
+                elif kind == 'busy':
+                    raise GenerationQueueFull(*payload)
+                elif kind == 'error':
+                    raise RuntimeError(payload[0])
+                else:
+                    raise RuntimeError(f"Unexpected message from inference server: {kind}")
+
+    def generate(self, prompt, progress_callback=None, cancel_token=None, **params):
+        return self._call(('generate', prompt, params), progress_callback=progress_callback, cancel_token=cancel_token)
+
+    def get_model_info(self):
+        return self._call(('model_info',))
+
+    def get_scheduler_stats(self):
+        return self._call(('scheduler_stats',))
+
+    def get_lora_info(self):
+        return self._call(('lora_info',))
+
+    def get_readiness(self):
+        return self._call(('readiness',))
+
+
+# Process-wide backend shared by every route
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_inference_backend():
+    """Return the remote backend when INFERENCE_SERVER_ADDRESS is set, otherwise the in-process one"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if config.INFERENCE_SERVER_ADDRESS:
+                    _backend = RemoteInferenceBackend()
+                else:
+                    _backend = LocalInferenceBackend()
+    return _backend
@@ -0,0 +1,78 @@
+"""
+LoRA Adapter Cache for Zypher AI Logo Generator
+Tracks which LoRA adapters stay resident in the pipeline, in least-recently-used order
+"""
+import os
+import re
+from collections import OrderedDict
+
+
+class LoraAdapterCache:
+    """
+    LRU bookkeeping for LoRA adapters loaded side by side in one pipeline
+
+    The cache only decides names, hits and evictions; ModelManager performs the
+    actual load_lora_weights / delete_adapters calls on the pipeline.
+    """
+
+    def __init__(self, max_resident):
+        self.max_resident = max(int(max_resident), 1)
+        self._resident = OrderedDict()  # lora_filename -> adapter_name, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def adapter_name(lora_filename):
+        """PEFT adapter names end up in module paths, so keep them to [A-Za-z0-9_]"""
+        stem = os.path.splitext(os.path.basename(lora_filename))[0]
+        return re.sub(r'[^0-9A-Za-z_]', '_', stem) or "lora"
+
+    def lookup(self, lora_filename):
+        """Return the adapter name if resident (counting a hit), otherwise None (counting a miss)"""
+        adapter_name = self._resident.get(lora_filename)
+        if adapter_name is None:
+            self.misses += 1
+            return None
+        self._resident.move_to_end(lora_filename)
+        self.hits += 1
+        return adapter_name
+
+    def needs_eviction(self):
+        return len(self._resident) >= self.max_resident
+
+    def evict_lru(self):
+        """Drop the least recently used adapter. Returns (lora_filename, adapter_name)."""
+        lora_filename, adapter_name = self._resident.popitem(last=False)
+        self.evictions += 1
+        return lora_filename, adapter_name
+
+    def add(self, lora_filename):
+        adapter_name = self.adapter_name(lora_filename)
+        # Different filenames can sanitize to the same name; keep resident names unique
+        taken = set(self._resident.values())
+        suffix = 2
+        base_name = adapter_name
+        while adapter_name in taken:
+            adapter_name = f"{base_name}_{suffix}"
+            suffix += 1
+        self._resident[lora_filename] = adapter_name
+        return adapter_name
+
+    def discard(self, lora_filename):
+        """Forget an adapter that failed to load"""
+        self._resident.pop(lora_filename, None)
+
+    def clear(self):
+        self._resident.clear()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "max_resident": self.max_resident,
+            "resident": list(self._resident.keys()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
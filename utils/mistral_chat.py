@@ -3,12 +3,43 @@ Mistral AI Chat Manager for Zypher AI Logo Generator
 Handles conversations with Mistral AI and detects image generation requests
 Integrates with Logo Reference Agent for enhanced logo design workflow
 """
+import hashlib
 import json
 import re
 import requests
 from typing import Dict, Tuple, Optional, List
 import config
 from utils.logo_agent import LogoReferenceAgent
+from utils.mistral_client import get_mistral_client
+from utils.turn_cache import TurnCache
+
+INTENTS = ('search', 'generate', 'confirmation', 'refinement', 'conversation')
+
+# Appended to the system prompt in router mode: one JSON-mode completion answers
+# everything a chat turn needs (intent, search query, image prompt, acknowledgment, reply)
+ROUTER_PROMPT = """ROUTER MODE - respond with ONE JSON object and nothing else:
+{"intent": "search|generate|confirmation|refinement|conversation",
+ "confidence": 0.0-1.0,
+ "reasoning": "brief explanation",
+ "search_query": "logo/brand image search query with context from the conversation, or null",
+ "image_prompt": "detailed generation prompt under 300 characters, or null",
+ "acknowledgment": "1-2 sentence friendly confirmation naming what will be generated, with an emoji, or null",
+ "reply": "your normal plain-text answer to the user"}
+
+INTENTS:
+- "search": the user wants to FIND an existing logo/brand image ("show me the BMW logo")
+- "generate": the user wants to CREATE a new logo ("design a logo for my startup")
+- "confirmation": the user accepts a previous suggestion ("yes", "perfect", "use it")
+- "refinement": the user rejects or adjusts a previous result ("no", "make it more modern")
+- "conversation": anything else ("hello", "what can you do")
+
+FIELDS:
+- search_query: set whenever the user wants an existing logo found, combining refinements with
+  the brand from the conversation ("the red one" after "BMW logo" -> "BMW red logo"); else null
+- image_prompt: set ONLY when you would answer with the generate_image action right now
+  (same rules as above); else null. acknowledgment goes with it.
+- reply: always set; it is shown when no search or generation happens this turn"""
+_ROUTER_HISTORY = 10  # Messages of history the router sees, like the main completion
 
 
 class MistralChatManager:
@@ -19,6 +50,14 @@ class MistralChatManager:
         self.model = config.MISTRAL_MODEL
         self.endpoint = config.MISTRAL_API_ENDPOINT
         self.system_prompt = config.MISTRAL_SYSTEM_PROMPT
+        self.client = get_mistral_client()  # Pooled connections shared by every call
+        # Per-turn memos, so each turn is routed and classified once however many views
+        # ask. Router answers (reply, image prompt) are per request only: sharing them
+        # would hand one user's reply to another who sends the same opening message,
+        # and replay the same answer when a user retries. Intent labels carry nothing
+        # user-specific, so they also go in the short-TTL process-wide cache.
+        self._route_cache = TurnCache('mistral_router', ttl_seconds=0)
+        self._intent_cache = TurnCache('intent_classification')
         self.logo_agent = LogoReferenceAgent()
         
         # Track pending logo requests awaiting confirmation
@@ -31,6 +70,109 @@ class MistralChatManager:
             print("⚠️  WARNING: MISTRAL_API_KEY not set in .env file")
             print("   Get your API key from: https://console.mistral.ai/api-keys/")
     
+    def _turn_key(self, text: str, conversation_history: Optional[List[Dict]], use_web_search: bool) -> str:
+        """Hash of a turn: the message, the history the router sees and the web search flag"""
+        history = [
+            (msg.get('role', 'user'), msg.get('content', ''))
+            for msg in (conversation_history or [])[-_ROUTER_HISTORY:]
+        ]
+        return hashlib.sha256(json.dumps([text, history, bool(use_web_search)]).encode()).hexdigest()
+
+    def route_message(self, text: str, conversation_history: Optional[List[Dict]] = None, use_web_search: bool = False) -> Optional[Dict]:
+        """
+        Answer everything a chat turn needs in one JSON-mode completion (router mode)
+
+        classify_user_intent, extract_photo_search_query, generate_acknowledgment and the
+        main chat reply are views over this result, memoized per turn, instead of separate
+        Mistral calls.
+
+        Args:
+            text (str): User message
+            conversation_history (Optional[List[Dict]]): Recent conversation for context
+            use_web_search (bool): Whether web search is enabled for photos/logos
+
+        Returns:
+            Optional[Dict]: {intent, confidence, reasoning, search_query, image_prompt,
+            acknowledgment, reply}, or None when router mode is off or the call failed
+            (callers then use their regex fallbacks)
+        """
+        if not config.MISTRAL_ROUTER_MODE or not self.api_key or self.api_key == 'your_mistral_api_key_here':
+            return None
+
+        return self._route_cache.get_or_compute(
+            self._turn_key(text, conversation_history, use_web_search),
+            lambda: self._call_router(text, conversation_history, use_web_search)
+        )
+
+    def _call_router(self, text: str, conversation_history: Optional[List[Dict]], use_web_search: bool) -> Optional[Dict]:
+        """Make the router completion; None when it fails"""
+        print(f"🤖 Routing message with one Mistral call: '{text[:50]}...'")
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "system", "content": self._web_search_note(use_web_search)},
+            {"role": "system", "content": ROUTER_PROMPT},
+        ]
+        if conversation_history:
+            messages.extend(conversation_history[-_ROUTER_HISTORY:])
+        messages.append({"role": "user", "content": text})
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": config.MISTRAL_ROUTER_TEMPERATURE,
+            "max_tokens": 1000,
+            "response_format": {"type": "json_object"}
+        }
+
+        try:
+            response = self.client.post(payload, timeout=30, endpoint='router')
+            response.raise_for_status()
+            route = self._parse_route(response.json()['choices'][0]['message']['content'])
+            print(f"✅ Routed as: {route['intent']} (confidence: {route['confidence']})")
+            return route
+        except Exception as e:
+            # The failure is memoized for this request, so the other views of the turn don't retry
+            print(f"⚠️ Router call failed: {e}, falling back to regex")
+            return None
+
+    def _parse_route(self, content: str) -> Dict:
+        """Validate the router's JSON answer"""
+        data = json.loads(content.replace('```json', '').replace('```', '').strip())
+
+        def text_field(name):
+            value = data.get(name)
+            if not isinstance(value, str) or not value.strip() or value.strip().lower() in ('null', 'none'):
+                return None
+            return value.strip()
+
+        intent = data.get('intent') if data.get('intent') in INTENTS else 'conversation'
+        try:
+            confidence = min(max(float(data.get('confidence') or 0.0), 0.0), 1.0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        image_prompt = text_field('image_prompt')
+        return {
+            'intent': intent,
+            'confidence': confidence,
+            'reasoning': text_field('reasoning') or '',
+            'search_query': text_field('search_query'),
+            'image_prompt': self._truncate_prompt(image_prompt) if image_prompt else None,
+            'acknowledgment': text_field('acknowledgment'),
+            'reply': text_field('reply') or '',
+        }
+
+    def _web_search_note(self, use_web_search: bool) -> str:
+        if use_web_search:
+            return "Note: Web search is currently ENABLED. You can use the search_web action to find existing logos/images."
+        return "Note: Web search is currently DISABLED. If user requests to search for existing logos, inform them to enable web search."
+
+    def _route_reply(self, route: Dict, use_web_search: bool) -> str:
+        """The router result as the main completion would have answered (action JSON or plain text)"""
+        if route['image_prompt']:
+            return json.dumps({"action": "generate_image", "prompt": route['image_prompt']})
+        if use_web_search and route['intent'] == 'search' and route['search_query']:
+            return json.dumps({"action": "search_web", "query": route['search_query']})
+        return route['reply']
+
     def is_image_generation_request(self, text: str, conversation_history: Optional[List[Dict]] = None) -> bool:
         """
         Detect if the user message is requesting image/logo generation with context awareness
@@ -176,18 +318,31 @@ class MistralChatManager:
         
         return False
     
-    def extract_photo_search_query_with_ai(self, text: str, conversation_history: Optional[List[Dict]] = None) -> Optional[str]:
+    def extract_photo_search_query_with_ai(self, text: str, conversation_history: Optional[List[Dict]] = None, use_web_search: bool = False) -> Optional[str]:
         """
         Use Mistral AI to analyze context and extract the search query intelligently.
         This provides much better context understanding than regex patterns.
+        In router mode this is a view over the turn's route_message() result.
         
         Args:
             text (str): User message
             conversation_history (Optional[List[Dict]]): Recent conversation for context
+            use_web_search (bool): Whether web search is enabled (part of the turn in router mode)
             
         Returns:
             Optional[str]: Extracted search query or None
         """
+        if config.MISTRAL_ROUTER_MODE:
+            route = self.route_message(text, conversation_history, use_web_search)
+            ai_query = route['search_query'] if route else None
+            if not ai_query:
+                return None
+            ai_query = ai_query.split('\n')[0].strip().strip('"\'')
+            if 'logo' not in ai_query.lower():
+                ai_query = f"{ai_query} logo"
+            print(f"✅ Final AI query: '{ai_query}'")
+            return ai_query
+        
         print(f"🤖 Using Mistral AI to extract search query from: '{text}'")
         
         try:
@@ -232,11 +387,6 @@ EXAMPLES:
 Search query:"""
 
             # Call Mistral AI
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
             payload = {
                 'model': self.model,
                 'messages': [
@@ -246,12 +396,7 @@ Search query:"""
                 'max_tokens': 50  # Short response expected
             }
             
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
+            response = self.client.post(payload, timeout=10, endpoint='photo_query')
             
             response.raise_for_status()
             data = response.json()
@@ -280,7 +425,7 @@ Search query:"""
             print(f"⚠️ AI extraction failed: {e}, falling back to regex")
             return None
     
-    def extract_photo_search_query(self, text: str, conversation_history: Optional[List[Dict]] = None) -> Optional[str]:
+    def extract_photo_search_query(self, text: str, conversation_history: Optional[List[Dict]] = None, use_web_search: bool = False) -> Optional[str]:
         """
         Extract the subject/query for photo search from user message
         Uses Mistral AI first for intelligent context analysis, falls back to regex patterns
@@ -288,6 +433,7 @@ Search query:"""
         Args:
             text (str): User message
             conversation_history (Optional[List[Dict]]): Recent conversation for context
+            use_web_search (bool): Whether web search is enabled (part of the turn in router mode)
             
         Returns:
             Optional[str]: Extracted search query or None
@@ -296,7 +442,7 @@ Search query:"""
         print(f"📝 History available: {len(conversation_history) if conversation_history else 0} messages")
         
         # Try AI-powered extraction first (better context understanding)
-        ai_query = self.extract_photo_search_query_with_ai(text, conversation_history)
+        ai_query = self.extract_photo_search_query_with_ai(text, conversation_history, use_web_search)
         if ai_query:
             return ai_query
         
@@ -424,17 +570,29 @@ Search query:"""
         
         return None
     
-    def classify_user_intent_with_ai(self, text: str, conversation_history: Optional[List[Dict]] = None) -> Dict:
+    def classify_user_intent_with_ai(self, text: str, conversation_history: Optional[List[Dict]] = None, use_web_search: bool = False) -> Dict:
         """
         Use Mistral AI to classify user intent with better context understanding.
+        In router mode this is a view over the turn's route_message() result.
         
         Args:
             text (str): User message
             conversation_history (Optional[List[Dict]]): Recent conversation for context
+            use_web_search (bool): Whether web search is enabled (part of the turn in router mode)
             
         Returns:
             Dict: Intent classification result or None if AI fails
         """
+        if config.MISTRAL_ROUTER_MODE:
+            route = self.route_message(text, conversation_history, use_web_search)
+            if route is None:
+                return None
+            return {
+                'intent': route['intent'],
+                'confidence': route['confidence'],
+                'context': {'reasoning': route['reasoning'], 'ai_powered': True, 'router': True}
+            }
+        
         print(f"🤖 Using AI to classify intent for: '{text[:50]}...'")
         
         try:
@@ -485,11 +643,6 @@ RULES:
 Respond ONLY with this JSON format:
 {{"intent": "search|generate|confirmation|refinement|conversation", "confidence": 0.0-1.0, "reasoning": "brief explanation"}}"""
 
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
             payload = {
                 'model': self.model,
                 'messages': [
@@ -499,12 +652,7 @@ Respond ONLY with this JSON format:
                 'max_tokens': 100
             }
             
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
+            response = self.client.post(payload, timeout=10, endpoint='classify_intent')
             
             response.raise_for_status()
             data = response.json()
@@ -533,13 +681,14 @@ Respond ONLY with this JSON format:
             print(f"⚠️ AI intent classification failed: {e}, falling back to regex")
             return None
     
-    def classify_user_intent(self, text: str, conversation_history: Optional[List[Dict]] = None) -> Dict:
+    def classify_user_intent(self, text: str, conversation_history: Optional[List[Dict]] = None, use_web_search: bool = False) -> Dict:
         """
         Classify user intent with high accuracy using AI first, then multiple signals as fallback
         
         Args:
             text (str): User message
             conversation_history (Optional[List[Dict]]): Recent conversation for context
+            use_web_search (bool): Whether web search is enabled (part of the turn in router mode)
             
         Returns:
             Dict: {
@@ -548,8 +697,18 @@ Respond ONLY with this JSON format:
                 'context': Dict with additional context
             }
         """
+        # Memoized per turn: chat_with_ai and chat() both classify the same message
+        return self._intent_cache.get_or_compute(
+            self._turn_key(text, conversation_history, use_web_search),
+            lambda: self._classify_user_intent(text, conversation_history, use_web_search),
+            # Regex fallbacks stay per request, so the next request retries the AI
+            shareable=lambda result: result.get('context', {}).get('ai_powered', False)
+        )
+    
+    def _classify_user_intent(self, text: str, conversation_history: Optional[List[Dict]], use_web_search: bool) -> Dict:
+        """classify_user_intent without the per-turn memo"""
         # Try AI-powered classification first
-        ai_result = self.classify_user_intent_with_ai(text, conversation_history)
+        ai_result = self.classify_user_intent_with_ai(text, conversation_history, use_web_search)
         if ai_result:
             return ai_result
         
@@ -763,7 +922,7 @@ Respond ONLY with this JSON format:
             return ("⚠️ Mistral API key not configured. Please add MISTRAL_API_KEY to your .env file. Get your key from: https://console.mistral.ai/api-keys/", False, None, None)
         
         # === STEP 1: Classify user intent BEFORE processing ===
-        intent_data = self.classify_user_intent(user_message, conversation_history)
+        intent_data = self.classify_user_intent(user_message, conversation_history, use_web_search)
         user_intent = intent_data['intent']
         intent_confidence = intent_data['confidence']
         
@@ -853,57 +1012,43 @@ Respond ONLY with this JSON format:
                     )
         
         try:
-            # Build messages array
-            messages = [
-                {"role": "system", "content": self.system_prompt}
-            ]
-            
-            # Add web search status context to system message if needed
-            if use_web_search:
-                messages.append({
-                    "role": "system", 
-                    "content": "Note: Web search is currently ENABLED. You can use the search_web action to find existing logos/images."
-                })
+            # Router mode: the turn's single completion (already made by classify_user_intent
+            # above) carries the reply, so no further call is needed
+            route = self.route_message(user_message, conversation_history, use_web_search)
+            if route is not None:
+                assistant_message = self._route_reply(route, use_web_search)
             else:
-                messages.append({
-                    "role": "system",
-                    "content": "Note: Web search is currently DISABLED. If user requests to search for existing logos, inform them to enable web search."
-                })
-            
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history[-10:])  # Keep last 10 messages for context
-            
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
-            
-            # Call Mistral API
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1000
-            }
-            
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 401:
-                return ("⚠️ Invalid Mistral API key. Please check your MISTRAL_API_KEY in .env file.", False, None)
-            
-            response.raise_for_status()
-            
-            result = response.json()
-            assistant_message = result['choices'][0]['message']['content']
+                # Build messages array
+                messages = [
+                    {"role": "system", "content": self.system_prompt},
+                    # Web search status context
+                    {"role": "system", "content": self._web_search_note(use_web_search)}
+                ]
+                
+                # Add conversation history if provided
+                if conversation_history:
+                    messages.extend(conversation_history[-10:])  # Keep last 10 messages for context
+                
+                # Add current user message
+                messages.append({"role": "user", "content": user_message})
+                
+                # Call Mistral API
+                payload = {
+                    "model": self.model,
+                    "messages": messages,
+                    "temperature": 0.7,
+                    "max_tokens": 1000
+                }
+                
+                response = self.client.post(payload, timeout=30, endpoint='chat')
+                
+                if response.status_code == 401:
+                    return ("⚠️ Invalid Mistral API key. Please check your MISTRAL_API_KEY in .env file.", False, None, None)
+                
+                response.raise_for_status()
+                
+                result = response.json()
+                assistant_message = result['choices'][0]['message']['content']
             
             # Check if Mistral returned a web search action (when web search is enabled)
             if use_web_search:
@@ -912,7 +1057,7 @@ Respond ONLY with this JSON format:
                     # Mistral wants to search the web
                     # Fallback: if query is too short/generic, try extracting from user message
                     if len(web_search_query.split()) < 2:
-                        fallback_query = self.extract_photo_search_query(user_message, conversation_history)
+                        fallback_query = self.extract_photo_search_query(user_message, conversation_history, use_web_search)
                         if fallback_query:
                             web_search_query = fallback_query
                     
@@ -937,7 +1082,7 @@ Respond ONLY with this JSON format:
             
             # HIGH-CONFIDENCE SEARCH INTENT - Direct search without asking Mistral
             if user_intent == 'search' and intent_confidence >= 0.75 and use_web_search:
-                search_query = self.extract_photo_search_query(user_message, conversation_history)
+                search_query = self.extract_photo_search_query(user_message, conversation_history, use_web_search)
                 if search_query:
                     print(f"🔍 Direct search triggered: {search_query}")
                     try:
@@ -1031,11 +1176,6 @@ Original prompt: {basic_prompt}
 
 Enhanced prompt:"""
             
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
             payload = {
                 "model": self.model,
                 "messages": [
@@ -1045,12 +1185,7 @@ Enhanced prompt:"""
                 "max_tokens": 200
             }
             
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
-                timeout=15
-            )
+            response = self.client.post(payload, timeout=15, endpoint='enhance_prompt')
             
             if response.status_code == 200:
                 result = response.json()
@@ -1065,12 +1200,15 @@ Enhanced prompt:"""
             print(f"Error enhancing prompt: {e}")
             return basic_prompt
     
-    def generate_acknowledgment(self, user_message: str) -> str:
+    def generate_acknowledgment(self, user_message: str, conversation_history: Optional[List[Dict]] = None, use_web_search: bool = False) -> str:
         """
         Generate a friendly, personalized acknowledgment message for image generation requests
+        In router mode this is a view over the turn's route_message() result.
         
         Args:
             user_message (str): The user's original request
+            conversation_history (Optional[List[Dict]]): Recent conversation (identifies the turn in router mode)
+            use_web_search (bool): Whether web search is enabled (part of the turn in router mode)
             
         Returns:
             str: A friendly acknowledgment message
@@ -1078,6 +1216,11 @@ Enhanced prompt:"""
         if not self.api_key or self.api_key == 'your_mistral_api_key_here':
             return "Sure! I'll be generating that for you. This will just take a moment! ✨"
         
+        if config.MISTRAL_ROUTER_MODE:
+            route = self.route_message(user_message, conversation_history, use_web_search)
+            acknowledgment = route['acknowledgment'] if route else None
+            return acknowledgment.strip('"').strip("'") if acknowledgment else "Sure! I'll be generating that for you. This will just take a moment! ✨"
+        
         try:
             acknowledgment_request = f"""Based on this user request, generate a short, friendly acknowledgment message (1-2 sentences max) that:
 1. Says you'll generate what they asked for
@@ -1089,11 +1232,6 @@ User request: "{user_message}"
 
 Reply with ONLY the acknowledgment message, nothing else:"""
             
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
             payload = {
                 "model": self.model,
                 "messages": [
@@ -1103,12 +1241,7 @@ Reply with ONLY the acknowledgment message, nothing else:"""
                 "max_tokens": 100
             }
             
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
+            response = self.client.post(payload, timeout=10, endpoint='acknowledgment')
             
             if response.status_code == 200:
                 result = response.json()
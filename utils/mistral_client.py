@@ -0,0 +1,265 @@
+"""
+Mistral HTTP Client for Zypher AI Logo Generator
+One shared, pooled HTTP client for every Mistral API call, so chat, intent
+classification, query extraction, prompt enhancement and acknowledgments reuse
+keep-alive connections instead of paying a TCP + TLS handshake each. Uses httpx with
+HTTP/2 when installed (pip install "httpx[http2]"), a requests.Session otherwise.
+"""
+import random
+import threading
+import time
+import weakref
+import requests
+from flask import g, has_request_context
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+import config
+
+# Worth retrying: the request was rejected before the model ran (rate limiting, a
+# gateway that could not reach or hear back from the upstream). A 500 may come after
+# the completion was generated and billed, so it is not retried.
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class _ConnectError(requests.exceptions.ConnectionError):
+    """The connection could not be opened: nothing was sent, so retrying is safe"""
+
+
+class _HttpxResponse:
+    """Gives httpx responses the requests.Response surface MistralChatManager uses"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.text = response.text
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self._response.url}", response=self
+            )
+
+
+class MistralClient:
+    """
+    Pooled HTTP client for the Mistral chat completions API
+
+    Each call is labelled by its logical endpoint (chat, classify_intent, ...) for the
+    latency stats. Completions are not idempotent (a repeat is billed and generated
+    again), so only failures where the request cannot have been processed are retried:
+    errors opening the connection (refused, DNS, connect timeout) and 429/502/503/504
+    responses, up to MISTRAL_MAX_RETRIES times with jittered exponential backoff
+    (Retry-After is honoured when the server sends one). Read timeouts and connections
+    dropped after the request was sent are raised right away. Errors surface as requests
+    exceptions on both transports.
+    """
+
+    def __init__(self, api_key=None, endpoint=None, pool_size=None, max_retries=None,
+                 retry_backoff=None, connect_timeout=None, http2=None):
+        self.api_key = api_key or config.MISTRAL_API_KEY
+        self.endpoint = endpoint or config.MISTRAL_API_ENDPOINT
+        self.pool_size = pool_size or config.MISTRAL_POOL_SIZE
+        self.max_retries = config.MISTRAL_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = config.MISTRAL_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self.connect_timeout = connect_timeout or config.MISTRAL_CONNECT_TIMEOUT
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+        self._httpx = None
+        self._session = None
+        if config.MISTRAL_HTTP2 if http2 is None else http2:
+            try:
+                import httpx
+                import h2  # noqa: F401  httpx needs it for HTTP/2
+                self._httpx = httpx
+                self._client = httpx.Client(
+                    http2=True,
+                    headers=headers,
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+            except ImportError:
+                print("⚠️  HTTP/2 for Mistral needs httpx[http2]; using a pooled requests session")
+        if self._httpx is None:
+            # Retries are handled in post() so both transports behave alike
+            self._session = requests.Session()
+            self._session.headers.update(headers)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._endpoint_stats = {}
+        self._seen_streams = weakref.WeakSet()  # httpx connections seen, to count reused ones
+        self.retries = 0
+        self.requests = 0
+        self.new_connections = 0
+        # Calls made per /api/chat turn (counted in flask.g, recorded by the chat blueprint)
+        self.turns = 0
+        self.turn_calls = 0
+        self.max_turn_calls = 0
+        self.turns_by_calls = {}
+
+    @property
+    def transport(self):
+        return "httpx/h2" if self._httpx else "requests"
+
+    def post(self, payload, timeout, endpoint="chat"):
+        """
+        POST a chat completions payload
+
+        Args:
+            payload (dict): Request body
+            timeout (float): Read timeout in seconds for this call
+            endpoint (str): Logical endpoint name for stats
+
+        Returns:
+            The response (requests.Response, or an equivalent for httpx). Non-retryable
+            error statuses are returned as-is; the last response is returned when retries
+            run out on a retryable status.
+
+        Raises:
+            requests.exceptions.RequestException: Read timeouts and dropped connections right
+                away, connect errors after the last retry
+        """
+        if has_request_context():
+            g.mistral_calls = g.get('mistral_calls', 0) + 1
+        start_time = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self._send(payload, timeout)
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.max_retries or not self._connect_failed(e):
+                    self._record(endpoint, start_time, attempt, error=True)
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    self._record(endpoint, start_time, attempt, error=response.status_code >= 400)
+                    return response
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+
+    def _send(self, payload, timeout):
+        if self._httpx is None:
+            return self._session.post(self.endpoint, json=payload, timeout=(self.connect_timeout, timeout))
+        try:
+            response = self._client.post(
+                self.endpoint, json=payload,
+                timeout=self._httpx.Timeout(timeout, connect=self.connect_timeout)
+            )
+        except self._httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(str(e))
+        except self._httpx.ConnectError as e:
+            raise _ConnectError(str(e))
+        except self._httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except self._httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self.requests += 1
+            if stream is not None and stream not in self._seen_streams:
+                self._seen_streams.add(stream)
+                self.new_connections += 1
+        return _HttpxResponse(response)
+
+    @staticmethod
+    def _connect_failed(error):
+        """Whether a request failed while opening the connection, before anything was sent"""
+        if isinstance(error, (requests.exceptions.ConnectTimeout, _ConnectError)):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+            # requests wraps urllib3's MaxRetryError; refused and DNS failures are NewConnectionError
+            return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+        return False
+
+    def _backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry attempt + 1: Retry-After if given, else full-jitter exponential"""
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return random.uniform(0, self.retry_backoff * (2 ** attempt))
+
+    def _record(self, endpoint, start_time, retries, error=False):
+        elapsed = time.perf_counter() - start_time
+        with self._lock:
+            stats = self._endpoint_stats.setdefault(
+                endpoint, {"calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += retries
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def record_turn(self, calls):
+        """Record the number of upstream calls one chat turn made"""
+        with self._lock:
+            self.turns += 1
+            self.turn_calls += calls
+            self.max_turn_calls = max(self.max_turn_calls, calls)
+            self.turns_by_calls[calls] = self.turns_by_calls.get(calls, 0) + 1
+
+    def _connection_counts(self):
+        """(requests sent, new connections opened) on the current transport"""
+        if self._httpx is not None:
+            return self.requests, self.new_connections
+        adapter = self._session.get_adapter(self.endpoint)
+        pool = adapter.poolmanager.connection_from_url(self.endpoint)
+        return pool.num_requests, pool.num_connections
+
+    def get_stats(self):
+        sent, opened = self._connection_counts()
+        with self._lock:
+            endpoints = {
+                name: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "avg_seconds": round(stats["total_seconds"] / stats["calls"], 3) if stats["calls"] else None,
+                    "max_seconds": round(stats["max_seconds"], 3),
+                }
+                for name, stats in self._endpoint_stats.items()
+            }
+            return {
+                "transport": self.transport,
+                "pool_size": self.pool_size,
+                "requests": sent,
+                "new_connections": opened,
+                "reused_connections": max(sent - opened, 0),
+                "retries": self.retries,
+                "endpoints": endpoints,
+                "turns": {
+                    "count": self.turns,
+                    "avg_calls": round(self.turn_calls / self.turns, 2) if self.turns else None,
+                    "max_calls": self.max_turn_calls,
+                    "by_calls": {str(calls): count for calls, count in sorted(self.turns_by_calls.items())},
+                },
+            }
+
+
+# Process-wide client shared by every Mistral call
+_mistral_client = None
+_mistral_client_lock = threading.Lock()
+
+
+def get_mistral_client():
+    """Return the shared MistralClient, creating it on first use"""
+    global _mistral_client
+    if _mistral_client is None:
+        with _mistral_client_lock:
+            if _mistral_client is None:
+                _mistral_client = MistralClient()
+    return _mistral_client
@@ -5,13 +5,36 @@ Handles loading and managing Flux Schnell model with optional LoRA and FLUX Redu
 import torch
 from diffusers import FluxPipeline, FluxPriorReduxPipeline
 from PIL import Image
+import copy
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import config
+from utils.cancellation import GenerationCancelled
+from utils.embedding_cache import EmbeddingCache, image_content_hash
+from utils.lora_cache import LoraAdapterCache
+from utils.stub_pipeline import StubFluxPipeline, StubReduxPipeline
 
 # Load environment variables
 load_dotenv()
 
+REDUX_MODEL_ID = "black-forest-labs/FLUX.1-Redux-dev"
+
+
+class LatentBatch:
+    """Packed latents of one denoising call, waiting for the VAE decode stage"""
+
+    def __init__(self, latents, width, height, count, pipeline, denoise_seconds):
+        self.latents = latents
+        self.width = width
+        self.height = height
+        self.count = count
+        self.pipeline = pipeline  # Decode with the pipeline that denoised, even if a reload swapped it since
+        self.denoise_seconds = denoise_seconds
+
+
 class ModelManager:
     """Manages the Flux Schnell model, LoRA weights, and FLUX Redux"""
     
@@ -20,10 +43,69 @@ class ModelManager:
         self.redux_pipeline = None
         self.device = config.GPU_DEVICE if config.USE_GPU and torch.cuda.is_available() else "cpu"
         self.lora_loaded = False
-        self.current_lora = None  # Track which LoRA is currently loaded
+        self.current_lora = None  # Track which LoRA is currently active
+        self.lora_cache = LoraAdapterCache(config.LORA_MAX_RESIDENT_ADAPTERS)
+        self.prompt_embed_cache = EmbeddingCache(config.PROMPT_EMBED_CACHE_MB * 1024 * 1024)
         self.base_model_loaded = False
         self.redux_loaded = False
         self.hf_token = os.getenv("HUGGINGFACE_TOKEN")
+        self.stub_pipeline = config.INFERENCE_STUB_PIPELINE
+        # Spilled Redux embeddings outlive the process; a different Redux/base model,
+        # dtype or the stub pipeline gets its own spill directory
+        redux_dtype = "stub" if self.stub_pipeline else ("bfloat16" if self.device != "cpu" else "float32")
+        self.redux_cache = EmbeddingCache(
+            config.REDUX_CACHE_MB * 1024 * 1024,
+            spill_dir=config.REDUX_CACHE_SPILL_DIR,
+            identity=f"{REDUX_MODEL_ID}|{config.BASE_MODEL_ID}|{redux_dtype}",
+            spill_max_bytes=config.REDUX_CACHE_SPILL_MB * 1024 * 1024
+        )
+        self.cpu_weight_dtype = config.CPU_WEIGHT_DTYPE
+        try:
+            self.memory_profile = self._resolve_profile_name(config.MODEL_MEMORY_PROFILE)
+        except ValueError as e:
+            print(f"⚠️  {e}, using model-offload. Available: {', '.join(config.MEMORY_PROFILES)}")
+            self.memory_profile = "model-offload"
+        
+        # Pipelines are not thread-safe: loading, LoRA switching and inference
+        # all run under this lock so concurrent requests never interleave
+        self._lock = threading.RLock()
+        
+        # Seconds spent in each load stage, surfaced through get_model_info
+        self.load_times = {}
+        self.loaded_at = None
+        self.generation_count = 0
+        self.cancelled_generations = 0
+        self.last_generation_seconds = None
+        # Profile name -> load time, peak memory and per-image latency under that profile
+        self.memory_profile_stats = {}
+        
+        # torch.compile state: compiled callables per component and per-resolution timings
+        self._compiled = {}
+        self.compile_stats = {
+            "enabled": config.MODEL_COMPILE,
+            "mode": config.MODEL_COMPILE_MODE,
+            "resolutions": {},  # "WxH" -> compile_seconds, eager_seconds, compiled_seconds, speedup
+            "compiled_calls": 0,
+            "eager_fallbacks": 0,  # Calls at resolutions that were not compiled
+            "error": None
+        }
+        
+        # Generation runs as two stages: denoising (under _lock) returns latents, then VAE
+        # decode + postprocessing runs under its own lock so it can overlap the next batch
+        self._decode_lock = threading.Lock()
+        self.stage_stats = {"denoise": self._new_stage_stats(), "decode": self._new_stage_stats()}
+        # The two stages run on different threads; stage timings, generation counts and
+        # profile latencies are only changed and read under this lock
+        self._stats_lock = threading.Lock()
+        
+        # Background warm-up state, reported by /api/model/ready
+        self.warmup = {
+            "status": "disabled",  # disabled | pending | running | ready | failed
+            "stages": {},  # Stage name -> seconds
+            "error": None,
+            "started_at": None,
+            "finished_at": None
+        }
     
     def get_available_loras(self):
         """Get list of available LoRA files in the lora directory"""
@@ -39,35 +121,68 @@ class ModelManager:
         
     def load_base_model(self):
         """Load the base Flux Schnell model"""
+        with self._lock:
+            self._load_base_model()
+    
+    def _load_base_model(self):
         if self.base_model_loaded and self.pipeline is not None:
             print("Base model already loaded")
             return
             
         try:
             print(f"Loading Flux Schnell model on {self.device}...")
+            start_time = time.perf_counter()
             
-            # Check if token is available
-            if not self.hf_token or self.hf_token == "your_huggingface_token_here":
-                print("⚠️  WARNING: HUGGINGFACE_TOKEN not set in .env file")
-                print("   Get your token from: https://huggingface.co/settings/tokens")
-                print("   Attempting to download without authentication...")
+            if self.stub_pipeline:
+                print("⚠️  Stub pipeline mode: no model weights are loaded")
+                self.pipeline = StubFluxPipeline(
+                    step_seconds=config.INFERENCE_STUB_STEP_SECONDS,
+                    decode_seconds=config.INFERENCE_STUB_DECODE_SECONDS
+                )
             else:
-                print("✓ Using Hugging Face authentication token")
-            
-            self.pipeline = FluxPipeline.from_pretrained(
-                config.BASE_MODEL_ID,
-                dtype=torch.bfloat16 if self.device != "cpu" else torch.float32,
-                token=self.hf_token if self.hf_token and self.hf_token != "your_huggingface_token_here" else None
-            )
-            self.pipeline.to(self.device)
-            
-            # Enable memory optimizations
-            if self.device != "cpu":
-                self.pipeline.enable_model_cpu_offload()
+                # Check if token is available
+                if not self.hf_token or self.hf_token == "your_huggingface_token_here":
+                    print("⚠️  WARNING: HUGGINGFACE_TOKEN not set in .env file")
+                    print("   Get your token from: https://huggingface.co/settings/tokens")
+                    print("   Attempting to download without authentication...")
+                else:
+                    print("✓ Using Hugging Face authentication token")
+                
+                token = self.hf_token if self.hf_token and self.hf_token != "your_huggingface_token_here" else None
+                if self.device == "cpu" and self.cpu_weight_dtype == "int8":
+                    # Weight-only int8 transformer and T5 encoder; the rest runs in bfloat16
+                    self.pipeline = FluxPipeline.from_pretrained(
+                        config.BASE_MODEL_ID,
+                        dtype=torch.bfloat16,
+                        token=token,
+                        **self._load_quantized_cpu_components(token)
+                    )
+                else:
+                    self.pipeline = FluxPipeline.from_pretrained(
+                        config.BASE_MODEL_ID,
+                        dtype=self._pipeline_dtype(),
+                        token=token
+                    )
             
+            self._apply_memory_profile()
             self.base_model_loaded = True
             self.lora_loaded = False
-            print("✓ Base model loaded successfully")
+            self.current_lora = None
+            self.lora_cache.clear()
+            self.prompt_embed_cache.clear()
+            self.load_times['base_model'] = round(time.perf_counter() - start_time, 2)
+            with self._stats_lock:
+                self._profile_stats()["load_seconds"] = self.load_times['base_model']
+            print(f"✓ Base model loaded successfully ({self.load_times['base_model']}s, profile: {self.memory_profile})")
+            
+            # Compilation and its warm-up runs are timed as load_times['compile']
+            self._compiled = {}
+            if config.MODEL_COMPILE:
+                self._compile_pipeline()
+            self.loaded_at = time.time()
+            peak_memory = self._peak_memory()
+            with self._stats_lock:
+                self._profile_stats().update(peak_memory)
         except Exception as e:
             print(f"Error loading base model: {e}")
             if "gated" in str(e).lower() or "access" in str(e).lower():
@@ -78,6 +193,307 @@ class ModelManager:
                 print("   3. Accept the model's license at: https://huggingface.co/black-forest-labs/FLUX.1-schnell")
             raise
     
+    def _pipeline_dtype(self):
+        """Weight dtype for the pipeline: bfloat16 on GPU, CPU_WEIGHT_DTYPE on CPU"""
+        if self.device != "cpu":
+            return torch.bfloat16
+        if self.cpu_weight_dtype in ("bfloat16", "int8"):
+            return torch.bfloat16
+        if self.cpu_weight_dtype != "float32":
+            print(f"⚠️  Unknown CPU_WEIGHT_DTYPE {self.cpu_weight_dtype!r}, using float32")
+        return torch.float32
+    
+    def _load_quantized_cpu_components(self, token):
+        """
+        Load the FLUX transformer and T5 encoder with int8 weight-only quantization
+        
+        The first boot quantizes the bfloat16 weights and saves the result under
+        CPU_QUANTIZED_CACHE_DIR; later boots load the converted weights directly.
+        
+        Returns:
+            dict: transformer and text_encoder_2 keyword arguments for FluxPipeline.from_pretrained
+        """
+        from diffusers import FluxTransformer2DModel
+        from transformers import T5EncoderModel
+        try:
+            import torchao
+            from torchao.quantization import quantize_, int8_weight_only
+        except ImportError:
+            raise RuntimeError("CPU_WEIGHT_DTYPE=int8 requires torchao (pip install torchao)")
+        
+        cache_dir = os.path.join(
+            config.CPU_QUANTIZED_CACHE_DIR, config.BASE_MODEL_ID.replace("/", "--"), "int8"
+        )
+        manifest = {
+            "model_id": config.BASE_MODEL_ID,
+            "torch": torch.__version__,
+            "torchao": torchao.__version__
+        }
+        manifest_path = os.path.join(cache_dir, "manifest.json")
+        cache_valid = False
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                cache_valid = json.load(f) == manifest
+        
+        components = {}
+        for name, model_class in (("transformer", FluxTransformer2DModel), ("text_encoder_2", T5EncoderModel)):
+            weights_path = os.path.join(cache_dir, f"{name}.pt")
+            start_time = time.perf_counter()
+            if cache_valid and os.path.exists(weights_path):
+                # Build the module on the meta device and adopt the stored quantized tensors
+                if name == "transformer":
+                    model_config = model_class.load_config(config.BASE_MODEL_ID, subfolder=name, token=token)
+                    with torch.device("meta"):
+                        model = model_class.from_config(model_config)
+                else:
+                    model_config = model_class.config_class.from_pretrained(config.BASE_MODEL_ID, subfolder=name, token=token)
+                    with torch.device("meta"):
+                        model = model_class(model_config)
+                state_dict = torch.load(weights_path, map_location="cpu", mmap=True, weights_only=False)
+                model.load_state_dict(state_dict, assign=True)
+                model.eval()
+                print(f"✓ Loaded int8 {name} from cache ({time.perf_counter() - start_time:.1f}s)")
+            else:
+                model = model_class.from_pretrained(
+                    config.BASE_MODEL_ID, subfolder=name, torch_dtype=torch.bfloat16, token=token
+                )
+                quantize_(model, int8_weight_only())
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_path = f"{weights_path}.tmp"
+                torch.save(model.state_dict(), tmp_path)
+                os.replace(tmp_path, weights_path)
+                print(f"✓ Quantized {name} to int8 and cached it ({time.perf_counter() - start_time:.1f}s)")
+            components[name] = model
+        
+        if not cache_valid:
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f)
+        return components
+    
+    def _compile_pipeline(self):
+        """
+        Compile the transformer and VAE decoder for every MODEL_COMPILE_RESOLUTIONS size
+        
+        Each size is compiled right away (so the cost is paid at load, not by a user) and
+        timed against eager execution. Loading or toggling a LoRA changes the transformer's
+        modules and so the compiled graph's guards, so each size is compiled with the
+        default LoRA active (the default request path) as well as for the base model;
+        other adapters compile on their first request. Failures leave the pipeline running eagerly.
+        """
+        if not hasattr(self.pipeline, "transformer"):
+            print("⚠️  Skipping torch.compile: pipeline has no transformer (stub mode)")
+            return
+        
+        # Persistent Inductor caches: restarts load compiled kernels instead of recompiling
+        os.makedirs(config.MODEL_COMPILE_CACHE_DIR, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", config.MODEL_COMPILE_CACHE_DIR)
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+        os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+        
+        if self._memory_profile_options().get("offload") and self.device != "cpu":
+            print("⚠️  torch.compile with CPU offload gains little; consider MODEL_MEMORY_PROFILE=full-resident")
+        
+        compile_start = time.perf_counter()
+        try:
+            import torch._inductor.config as inductor_config
+            inductor_config.fx_graph_cache = True
+            
+            # Shapes are static per resolution; unknown sizes never reach the compiled code
+            self._compiled = {
+                "transformer": torch.compile(
+                    self.pipeline.transformer, mode=config.MODEL_COMPILE_MODE, dynamic=False
+                ),
+                "vae_decode": torch.compile(
+                    self.pipeline.vae.decode, mode=config.MODEL_COMPILE_MODE, dynamic=False
+                )
+            }
+            
+            lora_states = [None]
+            if os.path.exists(os.path.join(config.LORA_MODEL_PATH, config.LORA_WEIGHTS_FILE)):
+                # Last, so the pipeline is left in the default request state
+                lora_states.append(config.LORA_WEIGHTS_FILE)
+            
+            steps = config.DEFAULT_GENERATION_PARAMS["num_inference_steps"]
+            for lora_filename in lora_states:
+                self._ensure_lora_state(lora_filename is not None, lora_filename)
+                for width, height in config.MODEL_COMPILE_RESOLUTIONS:
+                    label = f"{width}x{height}" + (f" + {lora_filename}" if lora_filename else "")
+                    print(f"🔧 Compiling FLUX for {label}...")
+                    
+                    def run(compiled):
+                        start_time = time.perf_counter()
+                        pipeline = self._compiled_pipeline(width, height, enabled=compiled, count=False)
+                        with torch.inference_mode():
+                            result = pipeline(
+                                prompt="warm-up", num_inference_steps=steps,
+                                width=width, height=height, guidance_scale=0.0, output_type="latent"
+                            )
+                        self._decode_latents(
+                            LatentBatch(result.images, width, height, 1, self.pipeline, None), compiled=compiled
+                        )
+                        return time.perf_counter() - start_time
+                    
+                    eager_seconds = run(False)
+                    compile_seconds = run(True)  # First compiled call compiles (or loads from the cache)
+                    compiled_seconds = run(True)
+                    self.compile_stats["resolutions"][label] = {
+                        "compile_seconds": round(compile_seconds, 2),
+                        "eager_seconds": round(eager_seconds, 3),
+                        "compiled_seconds": round(compiled_seconds, 3),
+                        "speedup": round(eager_seconds / compiled_seconds, 2) if compiled_seconds else None
+                    }
+                    print(f"✓ Compiled {label} in {compile_seconds:.1f}s "
+                          f"(eager {eager_seconds:.2f}s → compiled {compiled_seconds:.2f}s per image)")
+        except Exception as e:
+            print(f"❌ torch.compile failed, running eagerly: {e}")
+            self._compiled = {}
+            self.compile_stats["error"] = str(e)
+        finally:
+            # Whole compile phase: eager, compiling and compiled warm-up runs for every size
+            self.load_times["compile"] = round(time.perf_counter() - compile_start, 2)
+    
+    def _compiled_pipeline(self, width, height, enabled=True, count=True):
+        """
+        Pipeline to denoise with: a shallow copy using the compiled transformer at a
+        compiled resolution, the shared pipeline otherwise
+
+        The shared pipeline is never modified, so the decode stage (which reads its VAE
+        on another thread, outside _lock) never sees a half-swapped pipeline, and LoRA
+        loading and offload hooks only ever see the eager modules. count=False keeps
+        compile warm-up runs out of compiled_calls / eager_fallbacks, which track traffic.
+        """
+        compiled_sizes = [tuple(size) for size in config.MODEL_COMPILE_RESOLUTIONS]
+        if not self._compiled or not enabled or (width, height) not in compiled_sizes:
+            if self._compiled and enabled and count:
+                self.compile_stats["eager_fallbacks"] += 1
+            return self.pipeline
+        
+        pipeline = copy.copy(self.pipeline)
+        pipeline.transformer = self._compiled["transformer"]
+        if count:
+            self.compile_stats["compiled_calls"] += 1
+        return pipeline
+    
+    @staticmethod
+    def _resolve_profile_name(profile_name):
+        """Normalize a memory profile name ("a" or "a+b"), raising ValueError for unknown names"""
+        names = [name.strip() for name in (profile_name or "").split("+") if name.strip()]
+        if not names or any(name not in config.MEMORY_PROFILES for name in names):
+            raise ValueError(f"Unknown memory profile: {profile_name!r}")
+        return "+".join(names)
+    
+    def _memory_profile_options(self):
+        options = {}
+        for name in self.memory_profile.split("+"):
+            options.update(config.MEMORY_PROFILES[name])
+        return options
+    
+    def _apply_memory_profile(self):
+        """Place the freshly loaded pipeline according to the active memory profile"""
+        options = self._memory_profile_options()
+        offload = options.get("offload") if self.device != "cpu" else None
+        
+        if offload == "model":
+            self.pipeline.enable_model_cpu_offload()
+        elif offload == "sequential":
+            self.pipeline.enable_sequential_cpu_offload()
+        else:
+            # Offload hooks manage device placement themselves; otherwise keep everything resident
+            self.pipeline.to(self.device)
+        
+        vae = getattr(self.pipeline, "vae", None)
+        if options.get("vae_slicing") and vae is not None:
+            vae.enable_slicing()
+        if options.get("vae_tiling") and vae is not None:
+            vae.enable_tiling()
+        if options.get("attention_slicing"):
+            try:
+                self.pipeline.enable_attention_slicing()
+            except Exception as e:
+                print(f"⚠️ Attention slicing not supported by this pipeline: {e}")
+        
+        print(f"✓ Memory profile: {self.memory_profile} ({options})")
+    
+    def set_memory_profile(self, profile_name):
+        """
+        Switch memory profile, reloading the base model if it is already loaded
+        
+        Args:
+            profile_name (str): Name from config.MEMORY_PROFILES, or several joined with "+"
+        """
+        profile_name = self._resolve_profile_name(profile_name)
+        with self._lock:
+            if profile_name == self.memory_profile:
+                return
+            self.memory_profile = profile_name
+            if self.base_model_loaded:
+                self.pipeline = None
+                self.base_model_loaded = False
+                self.lora_loaded = False
+                self.current_lora = None
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+                    # Peak VRAM is tracked per profile
+                    torch.cuda.reset_peak_memory_stats()
+                self._load_base_model()
+    
+    def _profile_stats(self):
+        """Stats record for the active memory profile"""
+        return self.memory_profile_stats.setdefault(self.memory_profile, {
+            "load_seconds": None,
+            "peak_rss_mb": None,
+            "peak_vram_mb": None,
+            "images": 0,
+            "avg_image_seconds": None,
+            "last_image_seconds": None
+        })
+    
+    def _peak_memory(self):
+        """Process peak RSS and device peak allocation in MB"""
+        peak = {}
+        try:
+            import resource
+            peak["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        except Exception:
+            pass
+        if self.device != "cpu" and torch.cuda.is_available():
+            peak["peak_vram_mb"] = round(torch.cuda.max_memory_allocated(self.device) / (1024 * 1024), 1)
+        return peak
+    
+    @staticmethod
+    def _new_stage_stats():
+        return {"calls": 0, "images": 0, "total_seconds": 0.0, "avg_image_seconds": None, "last_seconds": None}
+    
+    def _record_stage(self, stage, image_count, seconds):
+        """Fold one denoise or decode call into the per-stage timings"""
+        with self._stats_lock:
+            stats = self.stage_stats[stage]
+            stats["calls"] += 1
+            stats["images"] += image_count
+            stats["total_seconds"] = round(stats["total_seconds"] + seconds, 3)
+            stats["avg_image_seconds"] = round(stats["total_seconds"] / stats["images"], 3) if stats["images"] else None
+            stats["last_seconds"] = round(seconds, 3)
+    
+    @property
+    def decode_stage_active(self):
+        """Whether decode can run on its own thread alongside denoising"""
+        # Offload hooks move whole models between devices; decoding concurrently would race them
+        offload = self._memory_profile_options().get("offload") if self.device != "cpu" else None
+        return config.GENERATION_DECODE_STAGE and not offload
+    
+    def _record_generation(self, image_count, seconds):
+        """Fold one pipeline call into the active profile's latency and peak memory"""
+        peak_memory = self._peak_memory()
+        with self._stats_lock:
+            stats = self._profile_stats()
+            per_image = seconds / max(image_count, 1)
+            total = (stats["avg_image_seconds"] or 0) * stats["images"] + seconds
+            stats["images"] += image_count
+            stats["avg_image_seconds"] = round(total / stats["images"], 3)
+            stats["last_image_seconds"] = round(per_image, 3)
+            for key, value in peak_memory.items():
+                stats[key] = max(value, stats[key] or 0)
+    
     def load_lora(self, lora_filename=None):
         """
         Load LoRA weights on top of the base model
@@ -85,6 +501,10 @@ class ModelManager:
         Args:
             lora_filename (str): Specific LoRA file to load. If None, uses config default.
         """
+        with self._lock:
+            self._load_lora(lora_filename)
+    
+    def _load_lora(self, lora_filename=None):
         if not self.base_model_loaded:
             self.load_base_model()
         
@@ -101,27 +521,42 @@ class ModelManager:
             )
         
         try:
-            # Unload any existing LoRA first
-            if self.lora_loaded:
-                print(f"Unloading previous LoRA: {self.current_lora}")
-                self.pipeline.unload_lora_weights()
+            adapter_name = self.lora_cache.lookup(lora_filename)
+            if adapter_name is not None:
+                # Already resident: switch adapters without touching the safetensors file
+                print(f"Switching to resident LoRA adapter: {lora_filename}")
+            else:
+                # Make room by deleting the least recently used adapter from the pipeline
+                if self.lora_cache.needs_eviction():
+                    evicted_file, evicted_name = self.lora_cache.evict_lru()
+                    print(f"Evicting LoRA adapter: {evicted_file}")
+                    self.pipeline.delete_adapters(evicted_name)
+                
+                print(f"Loading LoRA weights: {lora_filename}...")
+                start_time = time.perf_counter()
+                adapter_name = self.lora_cache.add(lora_filename)
+                try:
+                    # Load new LoRA weights alongside any adapters already resident
+                    self.pipeline.load_lora_weights(lora_path, adapter_name=adapter_name)
+                except Exception:
+                    self.lora_cache.discard(lora_filename)
+                    raise
+                self.load_times['lora'] = round(time.perf_counter() - start_time, 2)
             
-            print(f"Loading LoRA weights: {lora_filename}...")
-            # Load new LoRA weights
-            self.pipeline.load_lora_weights(lora_path)
+            # Re-enable LoRA layers in case the base model was used last
+            if not self.lora_loaded:
+                self.pipeline.enable_lora()
             
-            # Set LoRA scale/strength for Flux models
-            # In newer diffusers, we can use set_adapters or fuse the LoRA
+            # Set LoRA scale/strength for Flux models; only the requested adapter is active
             try:
-                # Try to set the adapter scale
-                self.pipeline.set_adapters(["default"], adapter_weights=[config.LORA_SCALE])
-            except:
+                self.pipeline.set_adapters([adapter_name], adapter_weights=[config.LORA_SCALE])
+            except Exception:
                 # If that doesn't work, the scale might be applied automatically
                 print(f"Note: Using default LoRA scale (scale set during generation)")
             
             self.lora_loaded = True
             self.current_lora = lora_filename
-            print(f"✓ LoRA weights loaded successfully: {lora_filename} (scale: {config.LORA_SCALE})")
+            print(f"✓ LoRA active: {lora_filename} (scale: {config.LORA_SCALE})")
         except Exception as e:
             print(f"Error loading LoRA: {e}")
             self.lora_loaded = False
@@ -129,19 +564,31 @@ class ModelManager:
             raise
     
     def unload_lora(self):
-        """Unload LoRA weights to use base model only"""
-        if self.lora_loaded and self.pipeline is not None:
-            try:
-                print(f"Unloading LoRA weights: {self.current_lora}...")
-                self.pipeline.unload_lora_weights()
-                self.lora_loaded = False
-                self.current_lora = None
-                print("✓ LoRA weights unloaded, using base model")
-            except Exception as e:
-                print(f"Error unloading LoRA: {e}")
+        """Switch to the base model; resident adapters are disabled, not unloaded"""
+        with self._lock:
+            if self.lora_loaded and self.pipeline is not None:
+                try:
+                    print(f"Disabling LoRA adapter: {self.current_lora}...")
+                    self.pipeline.disable_lora()
+                    self.lora_loaded = False
+                    self.current_lora = None
+                    print("✓ LoRA disabled, using base model")
+                except Exception as e:
+                    print(f"Error disabling LoRA, unloading all adapters: {e}")
+                    try:
+                        self.pipeline.unload_lora_weights()
+                        self.lora_cache.clear()
+                        self.lora_loaded = False
+                        self.current_lora = None
+                    except Exception as e:
+                        print(f"Error unloading LoRA: {e}")
     
     def load_redux(self):
         """Load FLUX Redux for image-to-image conditioning"""
+        with self._lock:
+            self._load_redux()
+    
+    def _load_redux(self):
         if not self.base_model_loaded:
             self.load_base_model()
         
@@ -151,16 +598,21 @@ class ModelManager:
         
         try:
             print("Loading FLUX Redux adapter...")
-            # Load FLUX Redux - the official image conditioning adapter for FLUX models
-            self.redux_pipeline = FluxPriorReduxPipeline.from_pretrained(
-                "black-forest-labs/FLUX.1-Redux-dev",
-                torch_dtype=torch.bfloat16 if self.device != "cpu" else torch.float32,
-                token=self.hf_token if self.hf_token and self.hf_token != "your_huggingface_token_here" else None
-            )
-            self.redux_pipeline.to(self.device)
+            start_time = time.perf_counter()
+            if self.stub_pipeline:
+                self.redux_pipeline = StubReduxPipeline()
+            else:
+                # Load FLUX Redux - the official image conditioning adapter for FLUX models
+                self.redux_pipeline = FluxPriorReduxPipeline.from_pretrained(
+                    REDUX_MODEL_ID,
+                    torch_dtype=torch.bfloat16 if self.device != "cpu" else torch.float32,
+                    token=self.hf_token if self.hf_token and self.hf_token != "your_huggingface_token_here" else None
+                )
+                self.redux_pipeline.to(self.device)
             
             self.redux_loaded = True
-            print("✓ FLUX Redux loaded successfully")
+            self.load_times['redux'] = round(time.perf_counter() - start_time, 2)
+            print(f"✓ FLUX Redux loaded successfully ({self.load_times['redux']}s)")
         except Exception as e:
             print(f"Error loading FLUX Redux: {e}")
             print("Continuing without Redux support...")
@@ -182,12 +634,125 @@ class ModelManager:
             lora_filename (str): Specific LoRA file to use (if use_lora=True)
             reference_image (PIL.Image or str): Reference image for FLUX Redux
             ip_adapter_scale (float): Strength of Redux influence (0.0-1.0, default 0.5)
-            **kwargs: Additional generation parameters
+            **kwargs: Additional generation parameters. seed (int) makes the result reproducible.
             
         Returns:
             PIL.Image: Generated image
         """
-        # Ensure correct model is loaded
+        return self.generate_images(
+            [prompt],
+            use_lora=use_lora,
+            lora_filename=lora_filename,
+            reference_image=reference_image,
+            ip_adapter_scale=ip_adapter_scale,
+            **kwargs
+        )[0]
+    
+    def generate_images(self, prompts, use_lora=False, lora_filename=None, reference_image=None, ip_adapter_scale=0.5, **kwargs):
+        """
+        Generate one image per prompt in a single batched pipeline call
+        
+        All prompts share the same LoRA, reference image and generation parameters.
+        The generation scheduler uses this to run micro-batches of concurrent requests.
+        
+        Args:
+            prompts (list[str]): Text descriptions, one per image
+            use_lora (bool): Whether to use LoRA weights
+            lora_filename (str): Specific LoRA file to use (if use_lora=True)
+            reference_image (PIL.Image or str): Reference image for FLUX Redux
+            ip_adapter_scale (float): Strength of Redux influence (0.0-1.0, default 0.5)
+            **kwargs: Additional generation parameters. progress_callback(step, total_steps)
+                is called after every denoising step. seed (int) applies to every prompt,
+                seeds (list) gives one seed per prompt. cancel_token (CancellationToken)
+                aborts the run at the next denoising step with GenerationCancelled.
+            
+        Returns:
+            list[PIL.Image]: Generated images, in the same order as prompts
+        """
+        if self.decode_stage_active:
+            # Decode outside _lock so another caller can start denoising meanwhile
+            return self.decode_latents(
+                self.generate_latents(prompts, use_lora, lora_filename, reference_image, ip_adapter_scale, **kwargs)
+            )
+        
+        with self._lock:
+            latent_batch = self._generate_latents_locked(
+                prompts, use_lora, lora_filename, reference_image, ip_adapter_scale, **kwargs
+            )
+            return self.decode_latents(latent_batch)
+    
+    def generate_latents(self, prompts, use_lora=False, lora_filename=None, reference_image=None, ip_adapter_scale=0.5, **kwargs):
+        """
+        Run the denoising stage only: text encoding and the transformer steps
+        
+        Takes the same arguments as generate_images. The returned latents are turned into
+        images by decode_latents, which may run on another thread.
+        
+        Returns:
+            LatentBatch: Packed latents for every prompt, plus the denoising time
+        """
+        with self._lock:
+            return self._generate_latents_locked(
+                prompts, use_lora, lora_filename, reference_image, ip_adapter_scale, **kwargs
+            )
+    
+    def _generate_latents_locked(self, prompts, use_lora, lora_filename, reference_image, ip_adapter_scale, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            latent_batch = self._generate_images(
+                list(prompts), use_lora, lora_filename, reference_image, ip_adapter_scale, decode=False, **kwargs
+            )
+        except GenerationCancelled:
+            with self._stats_lock:
+                self.cancelled_generations += 1
+            raise
+        latent_batch.denoise_seconds = time.perf_counter() - start_time
+        self._record_stage("denoise", latent_batch.count, latent_batch.denoise_seconds)
+        return latent_batch
+    
+    def decode_latents(self, latent_batch):
+        """
+        Run the decode stage: VAE decode and conversion to PIL images
+        
+        Args:
+            latent_batch (LatentBatch): Output of generate_latents
+            
+        Returns:
+            list[PIL.Image]: One image per prompt of the denoising call
+        """
+        with self._decode_lock:
+            start_time = time.perf_counter()
+            images = self._decode_latents(latent_batch)
+            decode_seconds = time.perf_counter() - start_time
+        self._record_stage("decode", len(images), decode_seconds)
+        print(f"✓ {len(images)} image(s) generated successfully")
+        
+        elapsed = latent_batch.denoise_seconds + decode_seconds
+        with self._stats_lock:
+            self.last_generation_seconds = round(elapsed, 2)
+            self.generation_count += len(images)
+        self._record_generation(len(images), elapsed)
+        return images
+    
+    def _decode_latents(self, latent_batch, compiled=True):
+        """Unpack, unscale and VAE-decode FLUX latents (what FluxPipeline does after its last step)"""
+        pipeline = latent_batch.pipeline
+        width, height = latent_batch.width, latent_batch.height
+        compiled_sizes = [tuple(size) for size in config.MODEL_COMPILE_RESOLUTIONS]
+        compiled_decoders = self._compiled
+        if compiled and compiled_decoders and pipeline is self.pipeline and (width, height) in compiled_sizes:
+            decode = compiled_decoders["vae_decode"]
+        else:
+            decode = pipeline.vae.decode
+        
+        with torch.inference_mode():
+            latents = pipeline._unpack_latents(latent_batch.latents, height, width, pipeline.vae_scale_factor)
+            latents = (latents / pipeline.vae.config.scaling_factor) + pipeline.vae.config.shift_factor
+            image = decode(latents, return_dict=False)[0]
+            return list(pipeline.image_processor.postprocess(image, output_type="pil"))
+    
+    def _ensure_lora_state(self, use_lora, lora_filename):
+        """Load or unload LoRA weights to match the request. Returns whether LoRA is active."""
         if use_lora:
             # Determine which LoRA file to use
             lora_to_load = lora_filename if lora_filename else config.LORA_WEIGHTS_FILE
@@ -201,23 +766,27 @@ class ModelManager:
                 if self.lora_loaded:
                     self.unload_lora()
                 elif not self.base_model_loaded:
-                    self.load_base_model()
+                    self._load_base_model()
             else:
-                # Check if we need to load a different LoRA or load for first time
-                if not self.lora_loaded or (lora_filename and self.current_lora != lora_filename):
-                    self.load_lora(lora_filename)
+                # Check if we need to switch to a different LoRA or enable one for the first time
+                if not self.lora_loaded or self.current_lora != lora_to_load:
+                    self._load_lora(lora_to_load)
         
         # If not using LoRA, ensure we're using base model
         if not use_lora:
             if self.lora_loaded:
                 self.unload_lora()
             elif not self.base_model_loaded:
-                self.load_base_model()
+                self._load_base_model()
         
+        return use_lora
+    
+    def _process_reference_image(self, reference_image, ip_adapter_scale):
+        """Run the reference image through FLUX Redux. Returns the Redux output or None."""
         # Load FLUX Redux if reference image provided and not loaded
         if reference_image is not None and not self.redux_loaded:
             try:
-                self.load_redux()
+                self._load_redux()
             except Exception as e:
                 print(f"Warning: Could not load FLUX Redux: {e}")
                 print("Continuing with text-only generation...")
@@ -232,19 +801,164 @@ class ModelManager:
             elif not isinstance(reference_image, Image.Image):
                 raise ValueError("reference_image must be a PIL Image or file path")
             
-            # Generate Redux embeddings from reference image
+            # Generate Redux embeddings from reference image, reusing them for a reference
+            # we have already seen (e.g. repeat generations against the same brand logo)
             if self.redux_loaded:
                 try:
-                    print("Processing reference image with FLUX Redux...")
-                    print(f"Redux influence scale: {ip_adapter_scale}")
-                    with torch.inference_mode():
-                        # FLUX Redux processes the reference image into embeddings
-                        redux_output = self.redux_pipeline(reference_image)
-                    print("✓ Reference image processed")
+                    image_hash = image_content_hash(reference_image)
+                    redux_output = self.redux_cache.get(image_hash)
+                    if redux_output is not None:
+                        print("✓ Reusing cached FLUX Redux embeddings for reference image")
+                        redux_output = {name: t.to(self.device) for name, t in redux_output.items()}
+                    else:
+                        print("Processing reference image with FLUX Redux...")
+                        print(f"Redux influence scale: {ip_adapter_scale}")
+                        with torch.inference_mode():
+                            # FLUX Redux processes the reference image into embeddings
+                            redux_output = self.redux_pipeline(reference_image)
+                        print("✓ Reference image processed")
+                        self.redux_cache.put(image_hash, self._redux_tensors(redux_output))
                 except Exception as e:
                     print(f"Warning: Error processing reference image: {e}")
                     redux_output = None
         
+        return redux_output
+    
+    def _redux_tensors(self, redux_output):
+        """Tensor fields of a Redux output as a plain dict, suitable for caching"""
+        if isinstance(redux_output, dict):
+            items = redux_output.items()
+        else:
+            items = vars(redux_output).items()
+        return {name: value for name, value in items if isinstance(value, torch.Tensor)}
+    
+    def _truncate_prompt(self, prompt):
+        """Truncate a prompt to stay under the CLIP text encoder token limit"""
+        print(f"Original prompt length: {len(prompt)} chars")
+        
+        # CRITICAL: CLIP text encoder has a 77 token limit (~300-350 chars safe limit)
+        # Truncate prompt intelligently to avoid indexing errors
+        max_prompt_length = 300  # Conservative limit to stay under 77 tokens
+        
+        if len(prompt) > max_prompt_length:
+            print(f"⚠️ Prompt too long ({len(prompt)} chars), truncating to {max_prompt_length} chars")
+            # Truncate at word boundary to avoid cutting mid-word
+            truncated_prompt = prompt[:max_prompt_length].rsplit(' ', 1)[0]
+            # Add ellipsis to indicate truncation
+            if not truncated_prompt.endswith('.'):
+                truncated_prompt += '...'
+            prompt = truncated_prompt
+            print(f"✓ Truncated prompt: {prompt}")
+        
+        print(f"Final prompt: {prompt}")
+        return prompt
+    
+    def _apply_redux_output(self, gen_args, gen_params, redux_output, ip_adapter_scale):
+        """Add FLUX Redux embeddings and the adjusted guidance scale to the pipeline arguments"""
+        # FLUX Redux provides image embeddings that guide the generation
+        # We use BOTH the text prompt (what to create) and embeddings (style/reference)
+        
+        # Redux output is a namespace/dict-like object, not a regular dict
+        # Extract the pooled embeddings for visual guidance
+        try:
+            # Try different ways to access Redux embeddings
+            if hasattr(redux_output, 'pooled_image_embeds'):
+                gen_args["pooled_projections"] = redux_output.pooled_image_embeds
+                print(f"✓ Using Redux pooled_image_embeds with text prompt (influence: {ip_adapter_scale})")
+            elif hasattr(redux_output, 'image_embeds'):
+                gen_args["pooled_projections"] = redux_output.image_embeds
+                print(f"✓ Using Redux image_embeds with text prompt (influence: {ip_adapter_scale})")
+            elif isinstance(redux_output, dict):
+                # If it's a dict, try to get embeddings
+                if 'pooled_image_embeds' in redux_output:
+                    gen_args["pooled_projections"] = redux_output["pooled_image_embeds"]
+                    print(f"✓ Using Redux visual guidance (dict) with text prompt (influence: {ip_adapter_scale})")
+                elif 'image_embeds' in redux_output:
+                    gen_args["pooled_projections"] = redux_output["image_embeds"]
+                    print(f"✓ Using Redux visual guidance (dict) with text prompt (influence: {ip_adapter_scale})")
+            else:
+                print(f"⚠️ Redux output type: {type(redux_output)}")
+                print(f"⚠️ Redux output attributes: {dir(redux_output)}")
+                print("⚠️ Redux output format unexpected, using text prompt only")
+        except Exception as e:
+            print(f"⚠️ Error extracting Redux embeddings: {e}")
+            print("⚠️ Continuing with text prompt only")
+        
+        # Adjust guidance scale based on redux influence
+        # Higher ip_adapter_scale means more influence from reference image
+        base_guidance = gen_params.get("guidance_scale", 3.5)
+        gen_args["guidance_scale"] = base_guidance * (1.0 + ip_adapter_scale)
+        print(f"Adjusted guidance_scale: {gen_args['guidance_scale']:.2f} (base: {base_guidance}, scale: {ip_adapter_scale})")
+    
+    def _encode_prompts(self, prompts, max_sequence_length=None):
+        """
+        Encode prompts with the CLIP and T5 text encoders through the prompt embedding cache
+        
+        Args:
+            prompts (list[str]): Already truncated prompts
+            max_sequence_length (int): T5 sequence length the pipeline call uses (None for
+                the pipeline default); part of the cache key since it shapes the embeddings
+            
+        Returns:
+            dict: prompt_embeds and pooled_prompt_embeds for the whole batch, or None when
+                the cache is disabled or the pipeline cannot encode prompts on its own
+        """
+        if not self.prompt_embed_cache.enabled or not hasattr(self.pipeline, "encode_prompt"):
+            return None
+        
+        # A LoRA can patch the text encoders, so embeddings are cached per active adapter
+        active_lora = self.current_lora if self.lora_loaded else None
+        prompt_embeds = []
+        pooled_prompt_embeds = []
+        length_kwargs = {} if max_sequence_length is None else {"max_sequence_length": max_sequence_length}
+        for prompt in prompts:
+            key = (prompt, active_lora, max_sequence_length)
+            cached = self.prompt_embed_cache.get(key)
+            if cached is None:
+                with torch.inference_mode():
+                    embeds, pooled, _ = self.pipeline.encode_prompt(
+                        prompt=prompt,
+                        prompt_2=None,
+                        num_images_per_prompt=1,
+                        **length_kwargs
+                    )
+                cached = {"prompt_embeds": embeds, "pooled_prompt_embeds": pooled}
+                self.prompt_embed_cache.put(key, cached)
+            prompt_embeds.append(cached["prompt_embeds"])
+            pooled_prompt_embeds.append(cached["pooled_prompt_embeds"])
+        
+        return {
+            "prompt_embeds": torch.cat(prompt_embeds),
+            "pooled_prompt_embeds": torch.cat(pooled_prompt_embeds)
+        }
+    
+    def _make_generators(self, seeds):
+        """
+        Build one torch.Generator per prompt so each image depends only on its own seed
+        
+        CPU generators give the same initial noise on every device; prompts without a
+        seed get a random one.
+        """
+        generators = []
+        for seed in seeds:
+            generator = torch.Generator(device="cpu")
+            if seed is None:
+                generator.seed()
+            else:
+                generator.manual_seed(int(seed))
+            generators.append(generator)
+        return generators
+    
+    def _generate_images(self, prompts, use_lora, lora_filename, reference_image, ip_adapter_scale, progress_callback=None, cancel_token=None, decode=True, **kwargs):
+        """Generate images, or with decode=False stop after denoising and return a LatentBatch"""
+        # Cancelled while waiting for the lock: don't touch the device at all
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        
+        # Ensure correct model is loaded
+        use_lora = self._ensure_lora_state(use_lora, lora_filename)
+        redux_output = self._process_reference_image(reference_image, ip_adapter_scale)
+        
         # Merge default params with custom ones
         gen_params = config.DEFAULT_GENERATION_PARAMS.copy()
         
@@ -252,6 +966,12 @@ class ModelManager:
         if 'num_steps' in kwargs:
             kwargs['num_inference_steps'] = kwargs.pop('num_steps')
         
+        # One seed for every prompt, or a per-prompt list from the scheduler
+        seeds = kwargs.pop('seeds', None)
+        seed = kwargs.pop('seed', None)
+        if seeds is None and seed is not None:
+            seeds = [seed] * len(prompts)
+        
         # Remove custom parameters that shouldn't be passed to FluxPipeline
         # These are handled separately above
         custom_params = ['use_lora', 'lora_filename', 'use_ip_adapter', 'chat_entry_id']
@@ -259,6 +979,8 @@ class ModelManager:
             kwargs.pop(param, None)
         
         gen_params.update(kwargs)
+        if seeds is not None and any(s is not None for s in seeds):
+            gen_params["generator"] = self._make_generators(seeds)
         
         try:
             mode = []
@@ -268,92 +990,200 @@ class ModelManager:
                 mode.append(f"FLUX Redux (scale: {ip_adapter_scale})")
             mode_str = " + ".join(mode) if mode else "base model"
             
-            print(f"Generating image with {mode_str}...")
-            print(f"Original prompt length: {len(prompt)} chars")
-            
-            # CRITICAL: CLIP text encoder has a 77 token limit (~300-350 chars safe limit)
-            # Truncate prompt intelligently to avoid indexing errors
-            max_prompt_length = 300  # Conservative limit to stay under 77 tokens
-            
-            if len(prompt) > max_prompt_length:
-                print(f"⚠️ Prompt too long ({len(prompt)} chars), truncating to {max_prompt_length} chars")
-                # Truncate at word boundary to avoid cutting mid-word
-                truncated_prompt = prompt[:max_prompt_length].rsplit(' ', 1)[0]
-                # Add ellipsis to indicate truncation
-                if not truncated_prompt.endswith('.'):
-                    truncated_prompt += '...'
-                prompt = truncated_prompt
-                print(f"✓ Truncated prompt: {prompt}")
-            
-            print(f"Final prompt: {prompt}")
+            print(f"Generating {len(prompts)} image(s) with {mode_str}...")
+            prompts = [self._truncate_prompt(prompt) for prompt in prompts]
             
             # Prepare generation arguments
-            # ALWAYS include the text prompt - it describes what to create
-            gen_args = {
-                "prompt": prompt,
-                **gen_params
-            }
+            # ALWAYS include the text prompt - it describes what to create.
+            # Cached CLIP/T5 embeddings stand in for the raw text when available.
+            encoded_prompts = self._encode_prompts(prompts, gen_params.get("max_sequence_length"))
+            if encoded_prompts is not None:
+                gen_args = {**encoded_prompts, **gen_params}
+            else:
+                gen_args = {
+                    "prompt": prompts[0] if len(prompts) == 1 else prompts,
+                    **gen_params
+                }
             
             # Add Redux outputs if reference image was processed
             if redux_output is not None:
-                # FLUX Redux provides image embeddings that guide the generation
-                # We use BOTH the text prompt (what to create) and embeddings (style/reference)
-                
-                # Redux output is a namespace/dict-like object, not a regular dict
-                # Extract the pooled embeddings for visual guidance
-                try:
-                    # Try different ways to access Redux embeddings
-                    if hasattr(redux_output, 'pooled_image_embeds'):
-                        gen_args["pooled_projections"] = redux_output.pooled_image_embeds
-                        print(f"✓ Using Redux pooled_image_embeds with text prompt (influence: {ip_adapter_scale})")
-                    elif hasattr(redux_output, 'image_embeds'):
-                        gen_args["pooled_projections"] = redux_output.image_embeds
-                        print(f"✓ Using Redux image_embeds with text prompt (influence: {ip_adapter_scale})")
-                    elif isinstance(redux_output, dict):
-                        # If it's a dict, try to get embeddings
-                        if 'pooled_image_embeds' in redux_output:
-                            gen_args["pooled_projections"] = redux_output["pooled_image_embeds"]
-                            print(f"✓ Using Redux visual guidance (dict) with text prompt (influence: {ip_adapter_scale})")
-                        elif 'image_embeds' in redux_output:
-                            gen_args["pooled_projections"] = redux_output["image_embeds"]
-                            print(f"✓ Using Redux visual guidance (dict) with text prompt (influence: {ip_adapter_scale})")
-                    else:
-                        print(f"⚠️ Redux output type: {type(redux_output)}")
-                        print(f"⚠️ Redux output attributes: {dir(redux_output)}")
-                        print("⚠️ Redux output format unexpected, using text prompt only")
-                except Exception as e:
-                    print(f"⚠️ Error extracting Redux embeddings: {e}")
-                    print("⚠️ Continuing with text prompt only")
-                
-                # Adjust guidance scale based on redux influence
-                # Higher ip_adapter_scale means more influence from reference image
-                base_guidance = gen_params.get("guidance_scale", 3.5)
-                gen_args["guidance_scale"] = base_guidance * (1.0 + ip_adapter_scale)
-                print(f"Adjusted guidance_scale: {gen_args['guidance_scale']:.2f} (base: {base_guidance}, scale: {ip_adapter_scale})")
+                self._apply_redux_output(gen_args, gen_params, redux_output, ip_adapter_scale)
             
             # Note: For Flux models, LoRA scale is set during loading, not during generation
             
-            # Generate image
+            # Report denoising progress and honour cancellation through the diffusers
+            # step callback; raising from it aborts the run before the next step
+            if progress_callback is not None or cancel_token is not None:
+                total_steps = gen_params.get("num_inference_steps")
+                
+                def on_step_end(pipeline, step, timestep, callback_kwargs):
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    if progress_callback is not None:
+                        progress_callback(step + 1, total_steps)
+                    return callback_kwargs
+                
+                gen_args["callback_on_step_end"] = on_step_end
+            
+            # Denoise (compiled at MODEL_COMPILE_RESOLUTIONS, eager otherwise); the VAE
+            # decode is a separate stage, so the pipeline stops at packed latents
+            gen_args["output_type"] = "latent"
+            pipeline = self._compiled_pipeline(gen_params["width"], gen_params["height"])
             with torch.inference_mode():
-                result = self.pipeline(**gen_args)
+                result = pipeline(**gen_args)
             
-            image = result.images[0]
-            print("✓ Image generated successfully")
-            return image
+            latent_batch = LatentBatch(
+                result.images, gen_params["width"], gen_params["height"], len(prompts), self.pipeline, None
+            )
+            return self._decode_latents(latent_batch) if decode else latent_batch
             
+        except GenerationCancelled:
+            print(f"⚠️ Generation cancelled ({len(prompts)} prompt(s) aborted)")
+            raise
         except Exception as e:
             print(f"Error generating image: {e}")
             raise
     
+    def start_warm_up(self, load_lora=None, load_redux=None):
+        """
+        Warm the engine up on a background thread
+        
+        Args:
+            load_lora (bool): Also load the default LoRA (defaults to config.MODEL_WARMUP_LORA)
+            load_redux (bool): Also load FLUX Redux (defaults to config.MODEL_WARMUP_REDUX)
+        """
+        if self.warmup["status"] in ("pending", "running", "ready"):
+            return
+        load_lora = config.MODEL_WARMUP_LORA if load_lora is None else load_lora
+        load_redux = config.MODEL_WARMUP_REDUX if load_redux is None else load_redux
+        self.warmup.update(status="pending", stages={}, error=None, started_at=time.time(), finished_at=None)
+        threading.Thread(
+            target=self.warm_up,
+            args=(load_lora, load_redux),
+            name="model-warmup",
+            daemon=True
+        ).start()
+    
+    def warm_up(self, load_lora=True, load_redux=False):
+        """Load models and run one tiny inference so kernels and allocators are initialized"""
+        self.warmup["status"] = "running"
+        print("🔥 Warming up diffusion engine...")
+        try:
+            self._run_warmup_stage("base_model", self.load_base_model)
+            
+            if load_lora:
+                default_lora = os.path.join(config.LORA_MODEL_PATH, config.LORA_WEIGHTS_FILE)
+                if os.path.exists(default_lora):
+                    self._run_warmup_stage("lora", self.load_lora)
+                else:
+                    print(f"⚠️  Skipping LoRA warm-up, file not found: {default_lora}")
+            
+            if load_redux:
+                self._run_warmup_stage("redux", self.load_redux)
+            
+            def dummy_inference():
+                with self._lock:
+                    self._generate_images(
+                        ["warm-up"], self.lora_loaded, self.current_lora, None, 0.5,
+                        num_inference_steps=1, width=256, height=256
+                    )
+            
+            self._run_warmup_stage("dummy_inference", dummy_inference)
+            self.warmup["status"] = "ready"
+            print(f"✓ Warm-up complete: {self.warmup['stages']}")
+        except Exception as e:
+            self.warmup["status"] = "failed"
+            self.warmup["error"] = str(e)
+            print(f"❌ Warm-up failed: {e}")
+        finally:
+            self.warmup["finished_at"] = time.time()
+    
+    def _run_warmup_stage(self, name, stage):
+        start_time = time.perf_counter()
+        stage()
+        self.warmup["stages"][name] = round(time.perf_counter() - start_time, 2)
+    
+    def get_readiness(self):
+        """
+        Report whether this node should receive traffic
+        
+        With warm-up disabled the engine loads lazily and is always considered ready;
+        otherwise it is ready once warm-up has finished successfully.
+        """
+        ready = self.warmup["status"] in ("disabled", "ready")
+        return {"ready": ready, "warmup": dict(self.warmup, stages=dict(self.warmup["stages"]))}
+    
+    def get_memory_usage(self):
+        """Get current process and device memory usage in MB"""
+        memory = {"process_rss_mb": None}
+        try:
+            # /proc gives the current RSS on Linux; fall back to the peak from getrusage
+            with open("/proc/self/statm") as f:
+                rss_pages = int(f.read().split()[1])
+            memory["process_rss_mb"] = round(rss_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+        except (OSError, ValueError, IndexError):
+            try:
+                import resource
+                memory["process_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            except Exception:
+                pass
+        
+        if self.device != "cpu" and torch.cuda.is_available():
+            memory["gpu_allocated_mb"] = round(torch.cuda.memory_allocated(self.device) / (1024 * 1024), 1)
+            memory["gpu_reserved_mb"] = round(torch.cuda.memory_reserved(self.device) / (1024 * 1024), 1)
+            memory["gpu_peak_allocated_mb"] = round(torch.cuda.max_memory_allocated(self.device) / (1024 * 1024), 1)
+        return memory
+    
     def get_model_info(self):
         """Get information about the current model state"""
+        with self._stats_lock:
+            stage_stats = {name: dict(stats) for name, stats in self.stage_stats.items()}
+            memory_profile_stats = {name: dict(stats) for name, stats in self.memory_profile_stats.items()}
+            generation_count = self.generation_count
+            cancelled_generations = self.cancelled_generations
+            last_generation_seconds = self.last_generation_seconds
         return {
             "base_model_loaded": self.base_model_loaded,
             "lora_loaded": self.lora_loaded,
             "current_lora": self.current_lora,
             "available_loras": self.get_available_loras(),
+            "lora_cache": self.lora_cache.get_stats(),
+            "prompt_embedding_cache": self.prompt_embed_cache.get_stats(),
+            "redux_cache": self.redux_cache.get_stats(),
             "redux_loaded": self.redux_loaded,
             "ip_adapter_loaded": self.redux_loaded,  # Alias for backward compatibility
             "device": self.device,
-            "model_id": config.BASE_MODEL_ID if self.base_model_loaded else None
+            "model_id": config.BASE_MODEL_ID if self.base_model_loaded else None,
+            "stub_pipeline": self.stub_pipeline,
+            "memory_profile": self.memory_profile,
+            "cpu_weight_dtype": self.cpu_weight_dtype if self.device == "cpu" else None,
+            "compile": {**self.compile_stats, "resolutions": dict(self.compile_stats["resolutions"])},
+            "decode_stage": {
+                "enabled": config.GENERATION_DECODE_STAGE,
+                "concurrent": self.decode_stage_active,
+                "stages": stage_stats
+            },
+            "memory_profile_stats": memory_profile_stats,
+            "load_times": dict(self.load_times),
+            "loaded_at": self.loaded_at,
+            "generation_count": generation_count,
+            "cancelled_generations": cancelled_generations,
+            "last_generation_seconds": last_generation_seconds,
+            "memory": self.get_memory_usage()
         }
+
+
+# Process-wide engine registry: every route and utility resolves the diffusion
+# engine through get_model_manager() so only one FluxPipeline is ever loaded
+_model_manager = None
+_model_manager_lock = threading.Lock()
+
+
+def get_model_manager():
+    """Return the shared ModelManager, creating it on first use"""
+    global _model_manager
+    if _model_manager is None:
+        with _model_manager_lock:
+            if _model_manager is None:
+                _model_manager = ModelManager()
+    return _model_manager
@@ -0,0 +1,303 @@
+"""
+Output Garbage Collector for Zypher AI Logo Generator
+Deleting chat history leaves its images in the output store. A background thread
+periodically reconciles the store against ChatHistory in batches, removing files no
+row references, and applies per-tier retention (config.OUTPUT_RETENTION_DAYS) to the
+images of old history entries.
+
+Run the collector in one process only (OUTPUT_GC_ENABLED is off by default): under
+gunicorn every worker imports the app. Sweeps take an exclusive lock file, so extra
+workers on the same host skip a sweep another one is running; separate hosts sharing
+a store are not coordinated.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, not_, or_
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process sweep lock
+    fcntl = None
+import config
+from models.db import db
+from models.user import User
+from models.chat_history import ChatHistory
+from utils.output_store import get_output_store, output_name
+from utils.priority import PRO
+from utils.renditions import get_rendition_store
+
+# SQLite parses long OR chains recursively; keep suffix-match queries well below its depth limit
+_LIKE_CHUNK = 100
+
+
+class OutputGarbageCollector:
+    """
+    Daemon thread that removes orphaned and expired output files
+
+    Orphans: stored files older than OUTPUT_GC_GRACE_SECONDS that no ChatHistory row
+    references (as image_path or one of its candidate_paths). The grace period covers
+    images written before their history row is committed.
+
+    Retention: for each tier with a retention of N > 0 days, images of history entries
+    older than N days are deleted unless a row still within its retention references
+    the same (content-addressed) file. The rows stay, so the conversation keeps its text,
+    but their image references are cleared so history does not show missing images.
+    """
+
+    def __init__(self, app, interval=None, batch_size=None, grace_seconds=None, retention_days=None):
+        self.app = app
+        self.interval = interval or config.OUTPUT_GC_INTERVAL_SECONDS
+        self.batch_size = batch_size or config.OUTPUT_GC_BATCH_SIZE
+        self.grace_seconds = config.OUTPUT_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        self.retention_days = dict(config.OUTPUT_RETENTION_DAYS if retention_days is None else retention_days)
+        self.store = get_output_store()
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "runs": 0,
+            "failed_runs": 0,
+            "skipped_runs": 0,
+            "files_scanned": 0,
+            "rows_scanned": 0,
+            "orphans_deleted": 0,
+            "expired_deleted": 0,
+            "reclaimed_bytes": 0,
+            "last_run_at": None,
+            "last_run_seconds": None,
+            "last_scan_files_per_second": None,
+            "last_reclaimed_bytes": 0,
+        }
+
+    def start(self):
+        """Start the background thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="output-gc", daemon=True)
+            self._thread.start()
+        print(f"🔧 Output GC running every {self.interval}s (retention days: {self.retention_days})")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # First pass shortly after start-up, not in the middle of it
+        while not self._stop.wait(min(60, self.interval) if self.stats["runs"] == 0 else self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Output GC run failed: {e}")
+                with self._lock:
+                    self.stats["failed_runs"] += 1
+
+    def _acquire_sweep_lock(self):
+        """Open and lock the sweep lock file; None if another process holds it"""
+        root = getattr(self.store, 'root', None) or getattr(self.store, 'bucket', '')
+        path = os.path.join(
+            tempfile.gettempdir(), f"output-gc-{hashlib.sha256(root.encode()).hexdigest()[:16]}.lock"
+        )
+        lock_file = open(path, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return None
+        return lock_file
+
+    def run_once(self):
+        """Run one orphan scan and one retention pass. Returns the bytes reclaimed."""
+        lock_file = self._acquire_sweep_lock()
+        if lock_file is None:
+            with self._lock:
+                self.stats["skipped_runs"] += 1
+            return 0
+        start_time = time.perf_counter()
+        try:
+            with self.app.app_context():
+                try:
+                    files_scanned, orphans, orphan_bytes = self._collect_orphans()
+                    rows_scanned, expired, expired_bytes = self._apply_retention()
+                finally:
+                    db.session.remove()
+        finally:
+            lock_file.close()  # Releases the flock
+        elapsed = time.perf_counter() - start_time
+        reclaimed = orphan_bytes + expired_bytes
+
+        with self._lock:
+            self.stats["runs"] += 1
+            self.stats["files_scanned"] += files_scanned
+            self.stats["rows_scanned"] += rows_scanned
+            self.stats["orphans_deleted"] += orphans
+            self.stats["expired_deleted"] += expired
+            self.stats["reclaimed_bytes"] += reclaimed
+            self.stats["last_run_at"] = datetime.utcnow().isoformat()
+            self.stats["last_run_seconds"] = round(elapsed, 3)
+            self.stats["last_scan_files_per_second"] = round(files_scanned / elapsed, 1) if elapsed > 0 else None
+            self.stats["last_reclaimed_bytes"] = reclaimed
+        if orphans or expired:
+            print(f"🔄 Output GC removed {orphans} orphaned and {expired} expired file(s), "
+                  f"{reclaimed / 1024 / 1024:.1f} MB reclaimed in {elapsed:.1f}s")
+        return reclaimed
+
+    def _delete(self, name):
+        freed = self.store.delete(name)
+        if self.store.backend == "local":
+            freed += get_rendition_store().remove(name)
+        return freed
+
+    # --- Orphans ---
+
+    def _collect_orphans(self):
+        cutoff = time.time() - self.grace_seconds
+        scanned = deleted = freed = 0
+        batch = []
+        for name, size, mtime in self.store.iter_files():
+            scanned += 1
+            if mtime < cutoff:
+                batch.append(name)
+            if len(batch) >= self.batch_size:
+                deleted, freed = self._delete_orphans(batch, deleted, freed)
+                batch = []
+        if batch:
+            deleted, freed = self._delete_orphans(batch, deleted, freed)
+        return scanned, deleted, freed
+
+    def _delete_orphans(self, names, deleted, freed):
+        referenced = self._referenced(names)
+        for name in names:
+            if name not in referenced and not self._stop.is_set():
+                freed += self._delete(name)
+                deleted += 1
+        return deleted, freed
+
+    def _referenced(self, names, retained=None):
+        """
+        Subset of store names referenced by ChatHistory rows
+
+        Exact image_path matches use the image_path index; the rest (non-first candidates,
+        paths recorded under another OUTPUTS_DIR) fall back to suffix matches on the file
+        name. retained optionally restricts the rows considered (SQL clause on ChatHistory/User).
+        """
+        paths = {self.store.stored_path(name): name for name in names}
+        query = db.session.query(ChatHistory.image_path).filter(ChatHistory.image_path.in_(list(paths)))
+        if retained is not None:
+            query = query.join(User, ChatHistory.user_id == User.id).filter(retained)
+        referenced = {paths[path] for (path,) in query}
+
+        by_basename = {name.rsplit('/', 1)[-1]: name for name in names if name not in referenced}
+        basenames = list(by_basename)
+        for i in range(0, len(basenames), _LIKE_CHUNK):
+            chunk = basenames[i:i + _LIKE_CHUNK]
+            conditions = []
+            for basename in chunk:
+                conditions.append(ChatHistory.image_path.like(f"%{basename}"))
+                conditions.append(ChatHistory.candidate_paths.like(f"%{basename}%"))
+            query = db.session.query(ChatHistory.image_path, ChatHistory.candidate_paths).filter(or_(*conditions))
+            if retained is not None:
+                query = query.join(User, ChatHistory.user_id == User.id).filter(retained)
+            for image_path, candidate_paths in query:
+                # LIKE treats "_" as a wildcard, so confirm each match on the exact file name
+                for path in [image_path] + json.loads(candidate_paths or "[]"):
+                    basename = output_name(path).rsplit('/', 1)[-1] if path else None
+                    if basename in by_basename:
+                        referenced.add(by_basename[basename])
+        return referenced
+
+    # --- Retention ---
+
+    def _tier_clause(self, tier):
+        is_pro = func.coalesce(User.is_pro, False)
+        return is_pro.is_(True) if tier == PRO else is_pro.is_(False)
+
+    def _expired_clause(self, now):
+        """Rows past their owner's tier retention (None when no tier expires anything)"""
+        clauses = [
+            and_(self._tier_clause(tier), ChatHistory.created_at < now - timedelta(days=days))
+            for tier, days in self.retention_days.items() if days > 0
+        ]
+        return or_(*clauses) if clauses else None
+
+    def _apply_retention(self):
+        now = datetime.utcnow()
+        expired_clause = self._expired_clause(now)
+        if expired_clause is None:
+            return 0, 0, 0
+        retained = not_(expired_clause)
+        scanned = deleted = freed = 0
+        for tier, days in self.retention_days.items():
+            if days <= 0:
+                continue
+            cutoff = now - timedelta(days=days)
+            while not self._stop.is_set():
+                # Processed rows lose their image_path, so each batch (and run) picks up
+                # where the previous one stopped without keeping a marker
+                rows = (
+                    db.session.query(ChatHistory.id, ChatHistory.image_path, ChatHistory.candidate_paths)
+                    .join(User, ChatHistory.user_id == User.id)
+                    .filter(
+                        ChatHistory.image_path.isnot(None),
+                        ChatHistory.created_at < cutoff,
+                        self._tier_clause(tier)
+                    )
+                    .order_by(ChatHistory.id)
+                    .limit(self.batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                scanned += len(rows)
+                names = set()
+                for _, image_path, candidate_paths in rows:
+                    names.add(output_name(image_path))
+                    names.update(output_name(path) for path in json.loads(candidate_paths or "[]"))
+                names = list(names)
+                still_referenced = self._referenced(names, retained=retained)
+                # Clear the references before deleting: an interrupted run leaves orphans
+                # (collected by the next orphan scan), never history rows with missing images
+                db.session.query(ChatHistory).filter(ChatHistory.id.in_([row[0] for row in rows])).update(
+                    {ChatHistory.image_path: None, ChatHistory.candidate_paths: None}, synchronize_session=False
+                )
+                db.session.commit()
+                for name in names:
+                    if name not in still_referenced:
+                        size = self._delete(name)
+                        if size:
+                            deleted += 1
+                            freed += size
+        return scanned, deleted, freed
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "enabled": config.OUTPUT_GC_ENABLED,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "interval_seconds": self.interval,
+                "grace_seconds": self.grace_seconds,
+                "retention_days": dict(self.retention_days),
+                **self.stats,
+            }
+
+
+# Process-wide collector, created when the app starts it
+_output_gc = None
+_output_gc_lock = threading.Lock()
+
+
+def get_output_gc(app=None):
+    """Return the shared OutputGarbageCollector; the first call must pass the Flask app"""
+    global _output_gc
+    if _output_gc is None:
+        with _output_gc_lock:
+            if _output_gc is None:
+                if app is None:
+                    return None
+                _output_gc = OutputGarbageCollector(app)
+    return _output_gc
@@ -0,0 +1,217 @@
+"""
+Output Store for Zypher AI Logo Generator
+Generated images are stored under the SHA-256 of their bytes, sharded into
+subdirectories (ab/cd/<hash>.png), so names never collide, identical images are
+stored once and no directory grows without bound. Files are immutable, which lets
+/outputs serve them with strong ETags and long-lived cache headers.
+"""
+import hashlib
+import os
+import re
+import threading
+import config
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+# ab/cd/<64 hex chars>.<ext>: names produced by content_name()
+_CONTENT_NAME = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]+$")
+_SHARD = re.compile(r"^[0-9a-f]{2}$")
+# Flat files written by versions before the output store (logo_<timestamp>.png)
+_LEGACY_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def content_name(data, extension):
+    """Sharded, content-addressed name for encoded image bytes"""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension.lower()}"
+
+
+def content_hash(name):
+    """SHA-256 of a content-addressed name, or None for legacy flat names (logo_<timestamp>.png)"""
+    match = _CONTENT_NAME.match(name)
+    return match.group(1) if match else None
+
+
+def output_name(path):
+    """
+    Store name of an image path recorded in chat history
+
+    Handles absolute paths under OUTPUTS_DIR, store-relative names and legacy paths
+    written on other machines (e.g. Windows paths of flat outputs/ files).
+    """
+    normalized = path.replace('\\', '/')
+    root = config.OUTPUTS_DIR.replace('\\', '/').rstrip('/') + '/'
+    if normalized.startswith(root):
+        return normalized[len(root):]
+    if '/outputs/' in normalized:
+        return normalized.rsplit('/outputs/', 1)[1]
+    if os.path.isabs(path) or ':' in normalized:
+        return normalized.rsplit('/', 1)[-1]
+    return normalized
+
+
+class LocalOutputStore:
+    """Content-addressed image files on the local filesystem, under OUTPUTS_DIR"""
+
+    backend = "local"
+
+    def __init__(self, root=None):
+        self.root = root or config.OUTPUTS_DIR
+        os.makedirs(self.root, exist_ok=True)
+
+    def put(self, data, extension):
+        """
+        Store encoded image bytes
+
+        Args:
+            data (bytes): Encoded image
+            extension (str): File extension / format, e.g. "png"
+
+        Returns:
+            str: The store name (ab/cd/<hash>.<ext>)
+        """
+        name = content_name(data, extension)
+        path = self.local_path(name)
+        if os.path.exists(path):
+            # Same bytes already stored; refresh the mtime so the output GC's grace
+            # period covers the new reference until it is committed
+            try:
+                os.utime(path)
+                return name
+            except FileNotFoundError:
+                pass  # Collected in the meantime: write it again
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return name
+
+    def local_path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def stored_path(self, name):
+        """Value recorded as ChatHistory.image_path"""
+        return self.local_path(name)
+
+    def exists(self, name):
+        return os.path.exists(self.local_path(name))
+
+    def iter_files(self):
+        """Yield (name, size, mtime) of every stored file: sharded outputs and legacy flat files"""
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(_LEGACY_EXTENSIONS):
+                    stat = entry.stat()
+                    yield entry.name, stat.st_size, stat.st_mtime
+                elif entry.is_dir() and _SHARD.match(entry.name):
+                    with os.scandir(entry.path) as shards:
+                        for shard in shards:
+                            if not (shard.is_dir() and _SHARD.match(shard.name)):
+                                continue
+                            with os.scandir(shard.path) as files:
+                                for f in files:
+                                    if f.is_file():
+                                        stat = f.stat()
+                                        yield f"{entry.name}/{shard.name}/{f.name}", stat.st_size, stat.st_mtime
+
+    def delete(self, name):
+        """Remove a stored file. Returns the bytes freed (0 if it was already gone)."""
+        path = self.local_path(name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+
+class S3OutputStore:
+    """Content-addressed image objects in an S3-compatible bucket (needs boto3)"""
+
+    backend = "s3"
+
+    def __init__(self, bucket=None, prefix=None, endpoint_url=None, url_expiry=None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("OUTPUT_STORE_BACKEND=s3 needs boto3: pip install boto3")
+        self.bucket = bucket or config.OUTPUT_S3_BUCKET
+        if not self.bucket:
+            raise RuntimeError("OUTPUT_STORE_BACKEND=s3 needs OUTPUT_S3_BUCKET")
+        self.prefix = (config.OUTPUT_S3_PREFIX if prefix is None else prefix).strip('/')
+        self.url_expiry = url_expiry or config.OUTPUT_S3_URL_EXPIRY
+        # Credentials come from the usual AWS_* environment variables / config files
+        self.client = boto3.client('s3', endpoint_url=endpoint_url or config.OUTPUT_S3_ENDPOINT_URL or None)
+
+    def _key(self, name):
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def put(self, data, extension):
+        name = content_name(data, extension)
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(name),
+            Body=data,
+            ContentType=CONTENT_TYPES.get(extension.lower(), 'application/octet-stream'),
+            CacheControl=f"public, max-age={config.OUTPUT_CACHE_MAX_AGE}, immutable"
+        )
+        return name
+
+    def stored_path(self, name):
+        return name
+
+    def url(self, name):
+        """Presigned GET URL; the bucket handles ETag, conditional and Range requests itself"""
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._key(name)}, ExpiresIn=self.url_expiry
+        )
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+            return True
+        except Exception:
+            return False
+
+    def iter_files(self):
+        """Yield (name, size, mtime) of every stored object"""
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(prefix):], obj['Size'], obj['LastModified'].timestamp()
+
+    def delete(self, name):
+        """Remove a stored object. Returns the bytes freed (0 if it was already gone)."""
+        try:
+            size = self.client.head_object(Bucket=self.bucket, Key=self._key(name))['ContentLength']
+        except Exception:
+            return 0
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        return size
+
+
+# Process-wide output store shared by every route
+_output_store = None
+_output_store_lock = threading.Lock()
+
+
+def get_output_store():
+    """Return the configured output store (OUTPUT_STORE_BACKEND), creating it on first use"""
+    global _output_store
+    if _output_store is None:
+        with _output_store_lock:
+            if _output_store is None:
+                if config.OUTPUT_STORE_BACKEND == "s3":
+                    _output_store = S3OutputStore()
+                elif config.OUTPUT_STORE_BACKEND == "local":
+                    _output_store = LocalOutputStore()
+                else:
+                    raise ValueError(f"Unknown OUTPUT_STORE_BACKEND: {config.OUTPUT_STORE_BACKEND!r}")
+    return _output_store
@@ -0,0 +1,60 @@
+"""
+Priority Classes for Zypher AI Logo Generator
+Pro and free generations are queued as separate priority classes, each with a fair-share
+weight, a concurrency limit and a queue-length limit (config.GENERATION_PRIORITY_CLASSES)
+"""
+import math
+import config
+
+PRO = 'pro'
+FREE = 'free'
+
+
+def priority_class_for(user):
+    """Priority class of a User row"""
+    return PRO if user is not None and user.is_pro else FREE
+
+
+def class_settings(priority_class):
+    """Weight and limits of a priority class; unknown classes are treated as free"""
+    return config.GENERATION_PRIORITY_CLASSES.get(priority_class) or config.GENERATION_PRIORITY_CLASSES[FREE]
+
+
+class GenerationQueueFull(Exception):
+    """Raised when a priority class is at its queue limit; callers should retry after retry_after seconds"""
+
+    def __init__(self, priority_class, retry_after):
+        self.priority_class = priority_class
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+        super().__init__(
+            f"Image generation is busy for {priority_class} users, please retry in {self.retry_after}s"
+        )
+
+
+class WaitTimeHistogram:
+    """Per-bucket (non-cumulative) counts of queue wait times in seconds"""
+
+    BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # Last slot counts waits above the largest bucket
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(self.BUCKETS) if seconds <= bound), len(self.BUCKETS))
+        self.counts[index] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self):
+        buckets = {f"<={bound}s": count for bound, count in zip(self.BUCKETS, self.counts)}
+        buckets[f">{self.BUCKETS[-1]}s"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_seconds": round(self.total_seconds / self.count, 3) if self.count else None,
+            "max_seconds": round(self.max_seconds, 3),
+            "buckets": buckets,
+        }
@@ -0,0 +1,191 @@
+"""
+Output Renditions for Zypher AI Logo Generator
+After a generation is saved, the lossless master in outputs/ gets lighter display
+copies (WebP/AVIF) and small thumbnails; /outputs/<name> picks the best one the
+client accepts
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import config
+from utils.output_store import output_name
+
+MIMETYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+}
+
+
+def avif_supported():
+    """Whether Pillow can write AVIF (natively since Pillow 11.2, or through pillow-avif-plugin)"""
+    try:
+        import pillow_avif  # noqa: F401  Registers the AVIF plugin on older Pillow versions
+    except ImportError:
+        pass
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+class RenditionStore:
+    """
+    Builds and looks up the renditions of output images
+
+    Renditions live in outputs/renditions/ as <stem>.<format> (display copies) and
+    <stem>_<size>.<format> (thumbnails), keeping the master's shard directories.
+    Thumbnails are also kept in the master format for clients that accept none of the
+    display formats. Anything not rendered yet is served from the master instead.
+    """
+
+    def __init__(self, outputs_dir=None, formats=None, thumbnail_sizes=None, max_workers=None):
+        self.outputs_dir = outputs_dir or config.OUTPUTS_DIR
+        self.renditions_dir = os.path.join(self.outputs_dir, "renditions")
+        self.thumbnail_sizes = sorted(config.OUTPUT_THUMBNAIL_SIZES if thumbnail_sizes is None else thumbnail_sizes)
+        self.master_format = config.IMAGE_FORMAT.lower()
+
+        formats = list(config.OUTPUT_RENDITION_FORMATS if formats is None else formats)
+        if "avif" in formats and not avif_supported():
+            print("⚠️  AVIF renditions disabled: Pillow has no AVIF encoder (pip install pillow-avif-plugin)")
+            formats.remove("avif")
+        self.formats = formats  # Display formats, most preferred first
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.OUTPUT_RENDITION_WORKERS, thread_name_prefix="output-rendition"
+        )
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.failed = 0
+        if self.enabled:
+            os.makedirs(self.renditions_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        # Renditions are rendered from and next to local master files
+        return config.OUTPUT_RENDITIONS and config.OUTPUT_STORE_BACKEND == "local"
+
+    def _rendition_name(self, filename, image_format, size=None):
+        stem = os.path.splitext(filename)[0]
+        return f"{stem}_{size}.{image_format}" if size else f"{stem}.{image_format}"
+
+    def submit(self, filename):
+        """Render every rendition of outputs/<filename> on the background pool"""
+        if self.enabled:
+            self._executor.submit(self.render, filename)
+
+    def render(self, filename):
+        """Render the display copies and thumbnails of one master image"""
+        try:
+            with Image.open(os.path.join(self.outputs_dir, filename)) as master:
+                master.load()
+                for size in [None] + self.thumbnail_sizes:
+                    image = master
+                    if size:
+                        image = master.copy()
+                        image.thumbnail((size, size), Image.LANCZOS)
+                    formats = self.formats + [self.master_format] if size else self.formats
+                    for image_format in formats:
+                        self._save(image, self._rendition_name(filename, image_format, size), image_format)
+        except Exception as e:
+            print(f"⚠️ Could not render output renditions for {filename}: {e}")
+            with self._lock:
+                self.failed += 1
+            return
+        with self._lock:
+            self.rendered += 1
+
+    def _save(self, image, name, image_format):
+        path = os.path.join(self.renditions_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        options = {}
+        if image_format == "webp":
+            options = {"quality": config.OUTPUT_WEBP_QUALITY, "method": 4}
+        elif image_format == "avif":
+            options = {"quality": config.OUTPUT_AVIF_QUALITY}
+        # Written under a temporary name so a concurrent request never serves half a file
+        image.save(tmp_path, format=image_format.upper(), **options)
+        os.replace(tmp_path, path)
+
+    def remove(self, filename):
+        """Delete every rendition of a master (called when the output GC removes it). Returns the bytes freed."""
+        freed = 0
+        for size in [None] + self.thumbnail_sizes:
+            for image_format in MIMETYPES:
+                path = os.path.join(self.renditions_dir, self._rendition_name(filename, image_format, size))
+                try:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return freed
+
+    def negotiate(self, filename, accept_mimetypes, size=None):
+        """
+        Pick the file to serve for a request of outputs/<filename>
+
+        Only formats the client lists explicitly count: a bare */* says nothing about
+        AVIF/WebP support, so such clients get the master format.
+
+        Args:
+            filename (str): Store name of the master (ab/cd/<hash>.png, or a legacy flat name)
+            accept_mimetypes: The request's Accept header (werkzeug MIMEAccept)
+            size (int): Optional thumbnail size
+
+        Returns:
+            str: Path relative to outputs/ of the best available file
+        """
+        if not self.enabled:
+            return filename
+        if size is not None and size not in self.thumbnail_sizes:
+            # Smallest thumbnail that is at least as large as requested
+            size = next((s for s in self.thumbnail_sizes if s >= size), None)
+
+        accepted = {value.lower() for value, quality in accept_mimetypes if quality > 0}
+        candidates = [f for f in self.formats if MIMETYPES.get(f) in accepted]
+        if size:
+            candidates.append(self.master_format)
+        for image_format in candidates:
+            name = self._rendition_name(filename, image_format, size)
+            if os.path.exists(os.path.join(self.renditions_dir, name)):
+                return f"renditions/{name}"
+        return filename
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "formats": list(self.formats),
+                "thumbnail_sizes": list(self.thumbnail_sizes),
+                "rendered": self.rendered,
+                "failed": self.failed,
+            }
+
+
+def output_url(path, size=None):
+    """URL of an output image, or of its thumbnail when size is given"""
+    if not path:
+        return None
+    name = output_name(path)
+    return f"/outputs/{name}?size={size}" if size else f"/outputs/{name}"
+
+
+def thumbnail_url(path):
+    """URL of the largest configured thumbnail of an output image"""
+    return output_url(path, max(config.OUTPUT_THUMBNAIL_SIZES)) if config.OUTPUT_THUMBNAIL_SIZES else output_url(path)
+
+
+# Process-wide rendition store shared by every route
+_rendition_store = None
+_rendition_store_lock = threading.Lock()
+
+
+def get_rendition_store():
+    """Return the shared RenditionStore, creating it on first use"""
+    global _rendition_store
+    if _rendition_store is None:
+        with _rendition_store_lock:
+            if _rendition_store is None:
+                _rendition_store = RenditionStore()
+    return _rendition_store
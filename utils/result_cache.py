@@ -0,0 +1,181 @@
+"""
+Result Cache for Zypher AI Logo Generator
+Content-addressed cache of finished images for seeded generations: the same prompt,
+seed and settings always produce the same image, so it is served from disk instead
+of running the pipeline again
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import config
+from utils.embedding_cache import image_content_hash
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of generated images stored as files under cache_dir
+
+    Files are named by their cache key, so several web workers (and restarts) share
+    the same entries; each process keeps its own LRU index over the directory.
+    """
+
+    def __init__(self, cache_dir, max_bytes, image_format="PNG"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(int(max_bytes), 0)
+        self.extension = image_format.lower()
+        self.image_format = image_format
+        self._entries = OrderedDict()  # key -> nbytes, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(prompt, seed, params):
+        """
+        Hash everything that determines the output image
+
+        Args:
+            prompt (str): Image prompt
+            seed (int): Generation seed
+            params (dict): Generation parameters as passed to the inference backend
+
+        Returns:
+            str: Hex digest identifying the result
+        """
+        defaults = config.DEFAULT_GENERATION_PARAMS
+        use_lora = bool(params.get('use_lora', False))
+        reference_image = params.get('reference_image')
+        if reference_image is not None and not isinstance(reference_image, str):
+            reference_image = image_content_hash(reference_image)
+        payload = {
+            'model': config.BASE_MODEL_ID,
+            'prompt': prompt,
+            'seed': int(seed),
+            'steps': params.get('num_steps', params.get('num_inference_steps', defaults['num_inference_steps'])),
+            'width': params.get('width', defaults['width']),
+            'height': params.get('height', defaults['height']),
+            'lora': (params.get('lora_filename') or config.LORA_WEIGHTS_FILE) if use_lora else None,
+            'reference': reference_image,
+            'reference_scale': params.get('ip_adapter_scale') if reference_image is not None else None,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.{self.extension}")
+
+    def _load_index(self):
+        """Index files left by earlier runs or other workers, oldest access first"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            key, extension = os.path.splitext(name)
+            if extension != f".{self.extension}":
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            files.append((stat.st_mtime, key, stat.st_size))
+        for _, key, nbytes in sorted(files):
+            self._entries[key] = nbytes
+            self._bytes += nbytes
+        self._evict()
+
+    def get(self, key):
+        """Return the path of the cached image file, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                # Possibly evicted by another worker
+                if key in self._entries:
+                    self._bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                nbytes = os.path.getsize(path)
+                self._entries[key] = nbytes
+                self._bytes += nbytes
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            # The file's mtime is the LRU clock shared with other workers
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, data):
+        """Store an image under key, as encoded file bytes (see utils.image_encoder)"""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Could not store result cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        nbytes = os.path.getsize(path)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)
+            self._entries[key] = nbytes
+            self._bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used files beyond max_bytes (called with the lock held or during init)"""
+        while self._bytes > self.max_bytes and self._entries:
+            key, nbytes = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "size_mb": round(self._bytes / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+# Process-wide result cache shared by every route
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the shared ResultCache, creating it on first use"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    config.RESULT_CACHE_DIR,
+                    config.RESULT_CACHE_MB * 1024 * 1024,
+                    image_format=config.IMAGE_FORMAT
+                )
+    return _result_cache
@@ -0,0 +1,113 @@
+"""
+Stub diffusion pipelines for Zypher AI Logo Generator
+Stand-ins for FluxPipeline and FluxPriorReduxPipeline that need no model weights,
+used to run and test the inference server and generation queue end to end
+"""
+import hashlib
+import time
+from types import SimpleNamespace
+from PIL import Image, ImageDraw
+
+
+class StubLatents:
+    """Stands in for packed latents; carries the finished images through the stub decode path"""
+
+    def __init__(self, images):
+        self.images = images
+
+    def __truediv__(self, other):
+        return self
+
+    def __add__(self, other):
+        return self
+
+
+class StubFluxPipeline:
+    """Mimics the FluxPipeline calls ModelManager makes and returns solid-colour images"""
+
+    vae_scale_factor = 8
+
+    def __init__(self, step_seconds=0.0, decode_seconds=0.0):
+        self.step_seconds = step_seconds
+        self.decode_seconds = decode_seconds
+        self.adapters = []
+        self.active_adapters = []
+        self.vae = SimpleNamespace(
+            enable_slicing=lambda: None,
+            enable_tiling=lambda: None,
+            config=SimpleNamespace(scaling_factor=1.0, shift_factor=0.0),
+            decode=self._decode
+        )
+        self.image_processor = SimpleNamespace(postprocess=lambda image, output_type="pil": image.images)
+
+    @staticmethod
+    def _unpack_latents(latents, height, width, vae_scale_factor):
+        return latents
+
+    def _decode(self, latents, return_dict=True):
+        if self.decode_seconds:
+            time.sleep(self.decode_seconds)
+        return (latents,)
+
+    def to(self, device):
+        return self
+
+    def enable_model_cpu_offload(self):
+        pass
+
+    def enable_sequential_cpu_offload(self):
+        pass
+
+    def enable_attention_slicing(self):
+        pass
+
+    def load_lora_weights(self, path, adapter_name="default", **kwargs):
+        self.adapters.append(adapter_name)
+
+    def unload_lora_weights(self):
+        self.adapters = []
+
+    def set_adapters(self, adapter_names, adapter_weights=None):
+        self.active_adapters = list(adapter_names)
+
+    def delete_adapters(self, adapter_names):
+        names = [adapter_names] if isinstance(adapter_names, str) else adapter_names
+        self.adapters = [name for name in self.adapters if name not in names]
+
+    def enable_lora(self):
+        pass
+
+    def disable_lora(self):
+        pass
+
+    def __call__(self, prompt=None, num_inference_steps=4, width=1024, height=1024,
+                 num_images_per_prompt=1, callback_on_step_end=None, output_type="pil", **kwargs):
+        prompts = prompt if isinstance(prompt, list) else [prompt]
+
+        for step in range(num_inference_steps):
+            if self.step_seconds:
+                time.sleep(self.step_seconds)
+            if callback_on_step_end is not None:
+                callback_on_step_end(self, step, None, {})
+
+        images = []
+        for text in prompts:
+            # Colour derived from the prompt so different prompts are distinguishable
+            digest = hashlib.sha256((text or "").encode("utf-8")).digest()
+            for _ in range(num_images_per_prompt):
+                image = Image.new("RGB", (width, height), tuple(digest[:3]))
+                ImageDraw.Draw(image).text((10, 10), (text or "")[:60], fill=(255, 255, 255))
+                images.append(image)
+        if output_type == "latent":
+            return SimpleNamespace(images=StubLatents(images))
+        return SimpleNamespace(images=images)
+
+
+class StubReduxPipeline:
+    """Mimics FluxPriorReduxPipeline without running a vision encoder"""
+
+    def to(self, device):
+        return self
+
+    def __call__(self, image, **kwargs):
+        return SimpleNamespace(prompt_embeds=None, pooled_prompt_embeds=None)
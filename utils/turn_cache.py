@@ -0,0 +1,110 @@
+"""
+Turn Cache for Zypher AI Logo Generator
+Memoizes per-turn Mistral results (router answers, intent classifications) so each
+distinct turn is computed once: first in flask.g for the current request, then in a
+short-TTL process-wide cache for retries and concurrent requests of the same turn
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import g, has_request_context
+import config
+
+# Every TurnCache, by name, for /api/model/status
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class TurnCache:
+    """
+    Request-scoped plus TTL-bounded process-wide memo
+
+    None results (failed calls), and results the caller marks as not shareable
+    (fallbacks), are only memoized for the current request, so a later request for
+    the same turn tries again instead of getting the fallback.
+    """
+
+    def __init__(self, name, ttl_seconds=None, max_entries=None):
+        self.name = name
+        self.ttl_seconds = config.MISTRAL_TURN_CACHE_TTL if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or config.MISTRAL_TURN_CACHE_SIZE
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+        self.request_hits = 0
+        self.process_hits = 0
+        self.misses = 0
+        self.expired = 0
+        with _caches_lock:
+            _caches[name] = self
+
+    def get_or_compute(self, key, compute, shareable=None):
+        """
+        Return the memoized value for key, calling compute() on a miss
+
+        Args:
+            key (str): Hash identifying the turn
+            compute (callable): Produces the value; may return None
+            shareable (callable): Whether a computed value may go in the process-wide cache
+
+        Returns:
+            The cached or computed value
+        """
+        request_memo = None
+        if has_request_context():
+            request_memo = g.setdefault('turn_cache', {})
+            if (self.name, key) in request_memo:
+                with self._lock:
+                    self.request_hits += 1
+                return request_memo[(self.name, key)]
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is not None:
+                self.process_hits += 1
+                value = entry[1]
+            else:
+                self.misses += 1
+
+        if entry is None:
+            value = compute()
+            if value is not None and self.ttl_seconds > 0 and (shareable is None or shareable(value)):
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                    self._entries.move_to_end(key)
+                    self._evict(time.monotonic())
+        if request_memo is not None:
+            request_memo[(self.name, key)] = value
+        return value
+
+    def _evict(self, now):
+        # Same TTL for every entry, so insertion order is expiry order
+        while self._entries and next(iter(self._entries.values()))[0] <= now:
+            self._entries.popitem(last=False)
+            self.expired += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.request_hits + self.process_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "request_hits": self.request_hits,
+                "process_hits": self.process_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round((self.request_hits + self.process_hits) / lookups, 3) if lookups else None,
+            }
+
+
+def get_turn_cache_stats():
+    """Stats of every TurnCache, by name"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.get_stats() for cache in caches}